@@ -0,0 +1,114 @@
+import numpy as np
+
+from CompiledGridWorld import StateValues
+
+
+class BatchValueIteration:
+    """
+    Value Iteration over many GridWorlds and reward/discount settings at once.
+
+    The compiled grids (see ``GridWorld.compile``) are laid end to end in one state
+    vector, each grid's GAMEOVER state is mapped to a single shared slot, and every
+    setting gets its own row of values. One backup then updates all grids under all
+    settings with the same gather/max operations ``ValueIteration`` uses for a single
+    grid, so grids of different shapes can share a batch and solving one layout under
+    several rewards costs about as much as solving it once.
+
+    Attributes:
+        offsets (list): Index of the first state of each grid in the stacked vector.
+        values (numpy.ndarray): Stacked values of the last run, shape (B, N + 1) for B
+            settings and N stacked states.
+        iterations (int): Number of sweeps performed by the last run.
+        residual (numpy.ndarray): Final Bellman residual per setting and grid, shape (B, G).
+    """
+
+    def __init__(self):
+        """
+        Initializes the solver with empty results.
+        """
+        self.offsets = []
+        self.values = None
+        self.iterations = 0
+        self.residual = None
+
+    def valueIteration(self, mdps, settings, iterations=100, tolerance=None):
+        """
+        Performs value iteration for every grid under every setting.
+
+        Args:
+            mdps (list): GridWorld (or GridWorldAdditive) instances.
+            settings (list): (reward, discount) pairs. The reward replaces the reward of
+                every non-terminal state; None keeps each grid's own rewards.
+            iterations (int, optional): Number of iterations for the algorithm (default is 100).
+            tolerance (float, optional): Stop once every grid's Bellman residual under every
+                setting is below this value (default is None, which runs all iterations).
+
+        Returns:
+            list: One list per setting holding, for each grid, a StateValues view mapping
+            states to their value estimates.
+        """
+        compiled = [mdp.compile() for mdp in mdps]
+        sizes = [grid.gameover for grid in compiled]
+        self.offsets = np.concatenate([[0], np.cumsum(sizes)]).tolist()
+        total = self.offsets[-1]
+
+        turns = {len(grid.probs) for grid in compiled}
+        if len(turns) > 1:
+            raise ValueError("All grids must have the same number of turns")
+        # Moves never land on GAMEOVER, so shifting each grid by its offset is enough
+        next_states = np.concatenate(
+            [
+                grid.nextStates.astype(np.int64) + start
+                for grid, start in zip(compiled, self.offsets)
+            ]
+        )
+        probs = np.concatenate(
+            [
+                np.broadcast_to(grid.probs, (grid.gameover, len(grid.probs)))
+                for grid in compiled
+            ]
+        )
+        absorbing = np.concatenate([grid.absorbing for grid in compiled])
+        base = np.concatenate([grid.rewards for grid in compiled])
+
+        rewards = np.empty((len(settings), total))
+        discounts = np.empty((len(settings), 1))
+        for b, (reward, discount) in enumerate(settings):
+            rewards[b] = base if reward is None else np.where(absorbing, base, reward)
+            discounts[b] = discount
+
+        values = np.zeros((len(settings), total + 1))
+        starts = np.minimum(self.offsets[:-1], max(total - 1, 0))
+        empty = np.array(sizes) == 0
+        self.iterations = 0
+        for _ in range(iterations):
+            q_values = np.zeros((len(settings),) + next_states.shape[:2])
+            for k in range(next_states.shape[2]):
+                q_values += probs[None, :, k, None] * (
+                    rewards[:, :, None]
+                    + discounts[:, :, None] * values.take(next_states[:, :, k], axis=1)
+                )
+            next_values = np.zeros_like(values)
+            next_values[:, :-1] = np.where(
+                absorbing,
+                rewards + discounts * values[:, total, None],
+                q_values.max(axis=2),
+            )
+            diffs = np.abs(next_values - values)
+            values = next_values
+            self.iterations += 1
+            self.residual = np.maximum.reduceat(diffs, starts, axis=1)
+            self.residual[:, empty] = 0
+            if tolerance is not None and (self.residual < tolerance).all():
+                break
+
+        self.values = values
+        return [
+            [
+                StateValues(
+                    grid, np.append(values[b, start : start + grid.gameover], 0)
+                )
+                for grid, start in zip(compiled, self.offsets)
+            ]
+            for b in range(len(settings))
+        ]
@@ -0,0 +1,252 @@
+import argparse
+import csv
+import itertools
+import json
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from GridWorld import GridWorldAdditive
+from ValueIteration import ValueIteration
+from ModelFree import GridWorldFree
+from ModelBased import GridWorldBased
+from generateGrid import layout_cells, random_layout
+
+SOLVERS = ("MDP", "MBRL", "MFRL")
+KEY = ("solver", "width", "height", "p", "discount", "wall_density")
+
+
+def make_layout(w, h, wall_density, seed=0):
+    """
+    Builds a random benchmark layout.
+
+    Args:
+        w (int): Width of the grid.
+        h (int): Height of the grid.
+        wall_density (float): Probability of a cell being a wall.
+        seed (int, optional): Seed of the layout (default is 0).
+
+    Returns:
+        tuple: (walls, terminals) arrays of shape (h, w), see ``generateGrid.maze_layout``.
+    """
+    return random_layout(
+        w, h, np.random.default_rng(seed), wall_density, terminal_density=0.01
+    )
+
+
+def measure(function, repeat=1, memory=True):
+    """
+    Times a function and optionally measures its peak memory.
+
+    The timed runs are not traced, since tracemalloc slows allocation-heavy code
+    down; the peak is taken from one extra traced run.
+
+    Args:
+        function (callable): Function to run, called without arguments.
+        repeat (int, optional): Number of timed runs; the fastest counts (default is 1).
+        memory (bool, optional): Whether to measure peak memory (default is True).
+
+    Returns:
+        tuple: (result of the last timed run, seconds, peak bytes or None).
+    """
+    seconds = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        seconds = min(seconds, time.perf_counter() - start)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            function()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result, seconds, peak
+
+
+def run_case(solver, w, h, p, discount, wall_density, options):
+    """
+    Benchmarks one solver on one random layout.
+
+    Args:
+        solver (str): "MDP" (ValueIteration), "MBRL" (GridWorldBased) or "MFRL"
+            (GridWorldFree Q-learning).
+        w (int): Width of the grid.
+        h (int): Height of the grid.
+        p (float): Probability of moving in the intended direction.
+        discount (float): Discount factor for future rewards.
+        wall_density (float): Probability of a cell being a wall.
+        options (argparse.Namespace): reward, tolerance, iterations, episodes, seed,
+            repeat and memory settings.
+
+    Returns:
+        dict: One benchmark record.
+    """
+    walls, terminals = make_layout(w, h, wall_density, options.seed)
+    L = list(zip(*(column.tolist() for column in layout_cells(walls, terminals))))
+
+    if solver == "MDP":
+        gwa = GridWorldAdditive((h, w), p, [], {}, options.reward)
+        # GridWorld rows grow downwards while layout rows grow upwards
+        gwa.wallMask = walls[::-1].copy()
+        gwa.terminalMask = terminals[::-1] != 0
+        gwa.terminalRewards = terminals[::-1].copy()
+        gwa.invalidate()
+        vi = ValueIteration()
+
+        def run():
+            gwa.invalidate()
+            vi.valueIteration(
+                gwa, discount, options.iterations, tolerance=options.tolerance
+            )
+            return vi.iterations, vi.backups, 0, vi.residual
+
+    elif solver == "MBRL":
+
+        def run():
+            gwb = GridWorldBased(w, h, L, p, options.reward, discount)
+            gwb.value_iteration(options.iterations, tolerance=options.tolerance)
+            return gwb.iterations, gwb.backups, 0, gwb.residual
+
+    elif solver == "MFRL":
+
+        def run():
+            gwf = GridWorldFree(w, h, L, p, options.reward, discount, options.seed)
+            gwf.q_learning(episodes=options.episodes)
+            return None, 0, gwf.transitions, None
+
+    else:
+        raise ValueError(f"Unknown solver: {solver}")
+
+    (iterations, backups, transitions, residual), seconds, peak = measure(
+        run, options.repeat, options.memory
+    )
+    return {
+        "solver": solver,
+        "width": w,
+        "height": h,
+        "p": p,
+        "discount": discount,
+        "wall_density": wall_density,
+        "seconds": seconds,
+        "iterations": iterations,
+        "residual": residual,
+        "backups": backups,
+        "backups_per_sec": backups / seconds if seconds else None,
+        "transitions": transitions,
+        "transitions_per_sec": transitions / seconds if seconds else None,
+        "peak_mb": None if peak is None else peak / 2**20,
+    }
+
+
+def compare(records, baseline, threshold=0.2):
+    """
+    Flags records that are slower than their baseline counterpart.
+
+    Records are matched on solver, grid size, p, discount and wall density.
+
+    Args:
+        records (list): Benchmark records of this run.
+        baseline (list): Benchmark records of the baseline run.
+        threshold (float, optional): Allowed relative slowdown (default is 0.2).
+
+    Returns:
+        list: (record, baseline seconds) for every regression.
+    """
+    reference = {tuple(record[k] for k in KEY): record for record in baseline}
+    regressions = []
+    for record in records:
+        match = reference.get(tuple(record[k] for k in KEY))
+        if match is not None and record["seconds"] > match["seconds"] * (1 + threshold):
+            regressions.append((record, match["seconds"]))
+    return regressions
+
+
+def write_csv(records, filename):
+    """
+    Writes benchmark records to a CSV file.
+
+    Args:
+        records (list): Benchmark records.
+        filename (str): Path of the CSV file.
+    """
+    with open(filename, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(records[0]) if records else [])
+        writer.writeheader()
+        writer.writerows(records)
+
+
+def main(argv=None):
+    """
+    Benchmarks the solvers across grid sizes, noise, discount and wall density.
+
+    Every combination of the given solvers, sizes, p, discounts and wall densities is
+    run on a seeded random layout. Results are printed and can be written to JSON or
+    CSV; with a baseline JSON file, runs more than --threshold slower than their
+    baseline are reported and the exit status is 1.
+
+    Example:
+        To run:
+        python Benchmark.py --sizes 4x3 100x100 2000x2000 --json bench.json
+        python Benchmark.py --baseline bench.json
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__.splitlines()[1].strip())
+    parser.add_argument("--solvers", nargs="+", default=list(SOLVERS), choices=SOLVERS)
+    parser.add_argument("--sizes", nargs="+", default=["4x3", "50x50", "200x200"])
+    parser.add_argument("--p", nargs="+", type=float, default=[0.8])
+    parser.add_argument("--discounts", nargs="+", type=float, default=[0.9])
+    parser.add_argument("--wall-densities", nargs="+", type=float, default=[0.2])
+    parser.add_argument("--reward", type=float, default=-0.04)
+    parser.add_argument("--tolerance", type=float, default=1e-6)
+    parser.add_argument("--iterations", type=int, default=1000, help="sweep cap")
+    parser.add_argument("--episodes", type=int, default=200, help="Q-learning")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="timed runs per case")
+    parser.add_argument("--no-memory", dest="memory", action="store_false")
+    parser.add_argument("--json", default=None, help="write records to this file")
+    parser.add_argument("--csv", default=None, help="write records to this file")
+    parser.add_argument("--baseline", default=None, help="JSON records to compare to")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    sizes = [tuple(int(n) for n in size.split("x")) for size in args.sizes]
+    records = []
+    for solver, (w, h), p, discount, density in itertools.product(
+        args.solvers, sizes, args.p, args.discounts, args.wall_densities
+    ):
+        record = run_case(solver, w, h, p, discount, density, args)
+        records.append(record)
+        print(
+            f"{solver:5} {w}x{h} p={p} discount={discount} walls={density} | "
+            f"{record['seconds']:.4f}s iterations={record['iterations']} "
+            f"backups/s={record['backups_per_sec'] or 0:.3g} "
+            f"transitions/s={record['transitions_per_sec'] or 0:.3g} "
+            f"peak={record['peak_mb'] or 0:.1f}MB"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(records, f, indent=2)
+    if args.csv:
+        write_csv(records, args.csv)
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(records, baseline, args.threshold)
+        for record, seconds in regressions:
+            print(
+                f"REGRESSION {record['solver']} {record['width']}x{record['height']} "
+                f"p={record['p']} discount={record['discount']} "
+                f"walls={record['wall_density']}: {record['seconds']:.4f}s vs "
+                f"{seconds:.4f}s"
+            )
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,396 @@
+from collections.abc import Mapping
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from GridWorld import GridWorld
+
+
+class CompiledGridWorld:
+    """
+    Dense array form of a GridWorld MDP for vectorized Bellman backups.
+
+    Usually obtained through ``GridWorld.compile``, which caches it until the grid
+    is edited. Every cell is encoded by the flat index ``row * cols + col``, walls
+    included, and the absorbing GAMEOVER state takes the extra index
+    ``rows * cols``. Walls and GAMEOVER always have value zero, so a value function
+    is one contiguous float array of ``rows * cols + 1`` entries.
+
+    Attributes:
+        shape (tuple): Shape of the grid (rows, columns).
+        gameover (int): Index of the GAMEOVER state, which is also the number of cells.
+        wall (numpy.ndarray): Boolean mask of wall cells, shape (S,).
+        terminal (numpy.ndarray): Boolean mask of terminal states, shape (S,).
+        absorbing (numpy.ndarray): Boolean mask of cells that never move to another
+            cell (terminal states and walls), shape (S,).
+        moves (numpy.ndarray): Landing cell of a move in each direction of
+            GridWorld.DIRCS, shape (S, 4).
+        turnDirections (numpy.ndarray): Direction index actually taken for each action
+            and turn, shape (A, K).
+        probs (numpy.ndarray): Probability of each turn, shape (K,).
+        rewards (numpy.ndarray): Reward for leaving each cell (0 for walls), shape (S,).
+        checkerboard (numpy.ndarray): Boolean mask of cells with odd row + column,
+            shape (S,). Every move changes the parity, so each color only depends on
+            the other color and itself.
+    """
+
+    def __init__(self, mdp):
+        """
+        Compiles a GridWorld (or GridWorldAdditive) into index arrays.
+
+        Args:
+            mdp (GridWorld): The grid environment to compile.
+        """
+        rows, cols = mdp.rows, mdp.cols
+        self.shape = (rows, cols)
+        self.gameover = rows * cols
+        dtype = np.int32 if self.gameover + 1 < 2**31 else np.int64
+
+        self.wall = mdp.wallMask.ravel().copy()
+        self.terminal = mdp.terminalMask.ravel() & ~self.wall
+        self.absorbing = self.terminal | self.wall
+        self.rewards = np.where(self.wall, 0.0, mdp.getRewardArray().ravel())
+
+        ii, jj = np.divmod(np.arange(self.gameover, dtype=dtype), cols)
+        self.checkerboard = (ii + jj) % 2 == 1
+        self.moves = np.empty((self.gameover, len(GridWorld.DIRCS)), dtype=dtype)
+        for d, dirc in enumerate(GridWorld.DIRCS):
+            landing = (
+                np.clip(ii + dirc[0], 0, rows - 1) * cols
+                + np.clip(jj + dirc[1], 0, cols - 1)
+            ).astype(dtype)
+            self.moves[:, d] = np.where(self.wall[landing], ii * cols + jj, landing)
+
+        self.turnDirections = np.array(
+            [
+                [
+                    (GridWorld.index[action] + turn) % len(GridWorld.DIRCS)
+                    for turn in mdp.turns
+                ]
+                for action in GridWorld.DIRCS
+            ]
+        )
+        self.probs = np.array([mdp.turns[turn] for turn in mdp.turns], dtype=float)
+        self._nextStates = None
+        self._states = None
+        self._csr = None
+        self._predecessors = None
+
+    @property
+    def nextStates(self):
+        """numpy.ndarray: Landing cell per action and turn, shape (S, A, K)."""
+        if self._nextStates is None:
+            self._nextStates = self.moves[:, self.turnDirections]
+        return self._nextStates
+
+    @property
+    def stateIndices(self):
+        """numpy.ndarray: Flat indices of the non-wall states, in row-major order."""
+        return np.flatnonzero(~self.wall)
+
+    @property
+    def states(self):
+        """list: Non-wall state coordinates, in the order of ``stateIndices``."""
+        if self._states is None:
+            rows, cols = np.divmod(self.stateIndices, self.shape[1])
+            self._states = list(zip(rows.tolist(), cols.tolist()))
+        return self._states
+
+    def stateIndex(self, state):
+        """
+        Returns the flat index of a state coordinate.
+
+        Args:
+            state (tuple): State coordinate.
+
+        Returns:
+            int: Flat index, ``gameover`` for GridWorld.GAMEOVER, or None if the state
+            is not a cell of the grid.
+        """
+        if state == GridWorld.GAMEOVER:
+            return self.gameover
+        try:
+            i, j = state
+        except (TypeError, ValueError):
+            return None
+        if isinstance(i, (int, np.integer)) and isinstance(j, (int, np.integer)):
+            if 0 <= i < self.shape[0] and 0 <= j < self.shape[1]:
+                return int(i) * self.shape[1] + int(j)
+        return None
+
+    def transitionMatrix(self):
+        """
+        Returns the sparse transition matrix P[s, a] -> s' in CSR form.
+
+        Row ``s * A + a`` holds the landing cells of action ``a`` from cell ``s``,
+        one entry per turn in the order of ``probs`` (duplicate landings are kept).
+        Terminal and wall rows hold a single entry to GAMEOVER with probability 1,
+        matching the EXIT action. The matrix is built once and cached; the matrix of
+        a policy is its rows ``s * A + actions[s]``.
+
+        Returns:
+            scipy.sparse.csr_matrix: Matrix of shape (S * A, S + 1).
+        """
+        if self._csr is None:
+            states, actions, turns = self.nextStates.shape
+            counts = np.where(self.absorbing, 1, turns).repeat(actions)
+            indptr = np.zeros(states * actions + 1, dtype=self.moves.dtype)
+            np.cumsum(counts, out=indptr[1:])
+            indices = self.nextStates.copy()
+            indices[self.absorbing, :, 0] = self.gameover
+            data = np.broadcast_to(self.probs, self.nextStates.shape).copy()
+            data[self.absorbing, :, 0] = 1.0
+            keep = np.ones(self.nextStates.shape, dtype=bool)
+            keep[self.absorbing, :, 1:] = False
+            self._csr = csr_matrix(
+                (data[keep], indices[keep], indptr),
+                shape=(states * actions, states + 1),
+            )
+        return self._csr
+
+    def predecessors(self):
+        """
+        Returns, for every cell, the non-terminal states that can land on it.
+
+        The lists are built once from ``moves`` and cached; a state that can stay
+        in place is its own predecessor.
+
+        Returns:
+            tuple: (indptr, indices) arrays; the predecessors of cell ``s`` are
+            ``indices[indptr[s]:indptr[s + 1]]``.
+        """
+        if self._predecessors is None:
+            states = self.gameover
+            directions = np.unique(self.turnDirections)
+            source = np.repeat(np.arange(states, dtype=np.int64), len(directions))
+            target = self.moves[:, directions].ravel().astype(np.int64)
+            live = np.repeat(~self.absorbing, len(directions))
+            pairs = np.unique(target[live] * states + source[live])
+            indptr = np.zeros(states + 1, dtype=np.int64)
+            np.cumsum(np.bincount(pairs // states, minlength=states), out=indptr[1:])
+            self._predecessors = (indptr, (pairs % states).astype(self.moves.dtype))
+        return self._predecessors
+
+    def predecessorsOf(self, states):
+        """
+        Returns the non-terminal states that can land on any of the given cells.
+
+        Args:
+            states (numpy.ndarray): Cell indices.
+
+        Returns:
+            numpy.ndarray: Sorted, unique predecessor indices.
+        """
+        indptr, indices = self.predecessors()
+        states = np.asarray(states, dtype=np.int64)
+        starts = indptr[states]
+        lengths = indptr[states + 1] - starts
+        # Position k of the concatenated lists is starts[i] + (k - first k of list i).
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        # A mask over all cells dedupes and sorts in linear time.
+        marked = np.zeros(len(indptr) - 1, dtype=bool)
+        marked[indices[offsets + np.arange(lengths.sum())]] = True
+        return np.flatnonzero(marked)
+
+    def changedStates(self, other):
+        """
+        Returns the cells whose Bellman backup differs from another compiled grid.
+
+        A cell changes when it became or stopped being a wall or terminal, when its
+        reward changed, or when one of its moves lands elsewhere, e.g. next to an
+        added or removed wall. Values of all other cells only change through the
+        values of the cells they can land on.
+
+        Args:
+            other (CompiledGridWorld): Compiled grid of the same shape, usually the
+                grid before an edit.
+
+        Returns:
+            numpy.ndarray: Flat indices of the changed cells.
+        """
+        if other.shape != self.shape:
+            raise ValueError(
+                f"Cannot compare a {other.shape} grid to a {self.shape} grid"
+            )
+        if not (
+            np.array_equal(other.probs, self.probs)
+            and np.array_equal(other.turnDirections, self.turnDirections)
+        ):
+            return np.arange(self.gameover)
+        changed = (
+            (other.wall != self.wall)
+            | (other.terminal != self.terminal)
+            | (other.rewards != self.rewards)
+            | (other.moves != self.moves).any(axis=1)
+        )
+        return np.flatnonzero(changed)
+
+    def zeros(self):
+        """
+        Returns a value array of zeros, including the GAMEOVER slot.
+
+        Returns:
+            numpy.ndarray: Zero value estimates, shape (S + 1,).
+        """
+        return np.zeros(self.gameover + 1)
+
+    def qValues(self, values, discount, states=None):
+        """
+        Computes Q-values for every grid action.
+
+        The landing values of the four moves are gathered once and shared by all
+        actions and turns. The turns are accumulated in the same order as
+        ``ValueIteration.getQValueFromValues`` so results match it exactly.
+
+        Args:
+            values (numpy.ndarray): Value estimates, shape (S + 1,).
+            discount (float): Discount factor for future rewards.
+            states (numpy.ndarray, optional): Indices of the cells to evaluate
+                (default is None, which evaluates every cell).
+
+        Returns:
+            numpy.ndarray: Q-values, shape (S, A) or (len(states), A). Rows of terminal
+            states and walls are not meaningful.
+        """
+        if states is None:
+            rewards, moves = self.rewards, self.moves
+        else:
+            rewards, moves = self.rewards[states], self.moves[states]
+        # Row d holds reward + discount * V(landing) of a move in direction d.
+        targets = rewards + discount * values[moves.T]
+        q_values = np.zeros((len(self.turnDirections), len(rewards)))
+        for a, directions in enumerate(self.turnDirections.tolist()):
+            for prob, direction in zip(self.probs, directions):
+                q_values[a] += prob * targets[direction]
+        return q_values.T
+
+    def backup(self, values, discount):
+        """
+        Performs one synchronous Bellman backup over all states.
+
+        Args:
+            values (numpy.ndarray): Value estimates, shape (S + 1,).
+            discount (float): Discount factor for future rewards.
+
+        Returns:
+            numpy.ndarray: Updated value estimates, shape (S + 1,).
+        """
+        next_values = np.zeros_like(values)
+        next_values[:-1] = np.where(
+            self.absorbing,
+            self.rewards + discount * values[self.gameover],
+            self.qValues(values, discount).max(axis=1),
+        )
+        return next_values
+
+    def backupStates(self, values, discount, states):
+        """
+        Computes the Bellman backup of a subset of states.
+
+        Args:
+            values (numpy.ndarray): Value estimates, shape (S + 1,).
+            discount (float): Discount factor for future rewards.
+            states (numpy.ndarray): Indices of the cells to back up.
+
+        Returns:
+            numpy.ndarray: Backed-up values of the given cells.
+        """
+        return np.where(
+            self.absorbing[states],
+            self.rewards[states] + discount * values[self.gameover],
+            self.qValues(values, discount, states).max(axis=1),
+        )
+
+    def toDict(self, values):
+        """
+        Converts a value array to the state-keyed dictionary used by GridWorld.
+
+        Args:
+            values (numpy.ndarray): Value estimates, shape (S + 1,).
+
+        Returns:
+            dict: Dictionary mapping state coordinates to values.
+        """
+        return dict(zip(self.states, values[self.stateIndices].tolist()))
+
+    def fromDict(self, values):
+        """
+        Converts state-keyed values to a value array.
+
+        Args:
+            values (Mapping): Mapping of state coordinates to values, such as a dict or
+                a StateValues view. Missing states default to zero.
+
+        Returns:
+            numpy.ndarray: Value estimates, shape (S + 1,).
+        """
+        if isinstance(values, StateValues) and values.compiled is self:
+            return values.array
+        array = self.zeros()
+        for state, value in values.items():
+            index = self.stateIndex(state)
+            if index is not None and index < self.gameover and not self.wall[index]:
+                array[index] = value
+        return array
+
+
+class StateValues(Mapping):
+    """
+    State-keyed view of a flat value array.
+
+    Behaves like the ``defaultdict`` returned by the generic value iteration loop:
+    iterating yields the non-wall states and any other key reads as zero, while the
+    values themselves stay in one contiguous array.
+
+    Attributes:
+        compiled (CompiledGridWorld): The compiled grid the values belong to.
+        array (numpy.ndarray): Value estimates, shape (S + 1,).
+    """
+
+    def __init__(self, compiled, array):
+        """
+        Wraps a value array.
+
+        Args:
+            compiled (CompiledGridWorld): The compiled grid the values belong to.
+            array (numpy.ndarray): Value estimates, shape (S + 1,).
+        """
+        self.compiled = compiled
+        self.array = array
+
+    def __getitem__(self, state):
+        index = self.compiled.stateIndex(state)
+        if index is None:
+            return 0
+        return float(self.array[index])
+
+    def __setitem__(self, state, value):
+        if state not in self:
+            raise KeyError(state)
+        self.array[self.compiled.stateIndex(state)] = value
+
+    def __contains__(self, state):
+        index = self.compiled.stateIndex(state)
+        return (
+            index is not None
+            and index < self.compiled.gameover
+            and not self.compiled.wall[index]
+        )
+
+    def __iter__(self):
+        return iter(self.compiled.states)
+
+    def __len__(self):
+        return len(self.compiled.states)
+
+    def __repr__(self):
+        return f"StateValues({self.compiled.toDict(self.array)})"
+
+    def grid(self):
+        """
+        Returns the values as a grid-shaped array, with zeros on walls.
+
+        Returns:
+            numpy.ndarray: Value estimates, shape (rows, columns).
+        """
+        return self.array[:-1].reshape(self.compiled.shape)
@@ -1,3 +1,11 @@
+import copy
+from collections.abc import MutableMapping, MutableSet
+
+import numpy as np
+
+from Render import crop, write_symbols, write_values
+
+
 class GridWorld:
     """
     Grid Environment for MDP Value Iteration.
@@ -11,6 +19,10 @@ class GridWorld:
         DIRCS (list): List of all movement directions.
         index (dict): Mapping of directions to indices.
         GAMEOVER (tuple): Represents a coordinate indicating the end of the game.
+        wallMask (numpy.ndarray): Boolean mask of wall cells, shape (rows, columns).
+        terminalMask (numpy.ndarray): Boolean mask of terminal cells, shape (rows, columns).
+        terminalRewards (numpy.ndarray): Exit reward of each terminal cell, shape
+            (rows, columns).
     """
 
     EXIT = (float("inf"), float("inf"))
@@ -32,12 +44,206 @@ class GridWorld:
             walls (set): Set of wall coordinates in the grid.
             terminals (dict): Dictionary of terminal states and their rewards.
         """
+        self._compiled = None
+        self._wallSet = WallSet(self)
+        self._terminalMap = TerminalMap(self)
         self.rows, self.cols = shape
         accident = (1 - prob) / 2
         self.turns = {-1: accident, 0: prob, +1: accident}
-        self.walls = set(walls)
+        self.walls = walls
         self.terms = terminals
 
+    @property
+    def walls(self):
+        """WallSet: Set-like view of the wall coordinates, backed by ``wallMask``."""
+        return self._wallSet
+
+    @walls.setter
+    def walls(self, walls):
+        walls = list(walls)
+        self.wallMask = np.zeros((self.rows, self.cols), dtype=bool)
+        for state in walls:
+            self.wallMask[self._requireCell(state)] = True
+        self.invalidate()
+
+    @property
+    def terms(self):
+        """TerminalMap: Dict-like view of the terminal states and their rewards, backed
+        by ``terminalMask`` and ``terminalRewards``."""
+        return self._terminalMap
+
+    @terms.setter
+    def terms(self, terminals):
+        terminals = dict(terminals)
+        self.terminalMask = np.zeros((self.rows, self.cols), dtype=bool)
+        self.terminalRewards = np.zeros((self.rows, self.cols))
+        for state, reward in terminals.items():
+            cell = self._requireCell(state)
+            self.terminalMask[cell] = True
+            self.terminalRewards[cell] = reward
+        self.invalidate()
+
+    @property
+    def turns(self):
+        """dict: Mapping of direction turns (-1, 0, +1) to their probabilities."""
+        return self._turns
+
+    @turns.setter
+    def turns(self, turns):
+        self._turns = turns
+        self.invalidate()
+
+    def cellOf(self, state):
+        """
+        Returns the array cell of a state coordinate.
+
+        Args:
+            state (tuple): State coordinate.
+
+        Returns:
+            tuple: (row, column) indices into the grid masks, or None if the state is
+            not a cell of the grid.
+        """
+        try:
+            i, j = state
+        except (TypeError, ValueError):
+            return None
+        if isinstance(i, (int, np.integer)) and isinstance(j, (int, np.integer)):
+            if 0 <= i < self.rows and 0 <= j < self.cols:
+                return int(i), int(j)
+        return None
+
+    def _requireCell(self, state):
+        cell = self.cellOf(state)
+        if cell is None:
+            raise ValueError(f"{state} is not a cell of a {self.rows}x{self.cols} grid")
+        return cell
+
+    def addWall(self, state):
+        """
+        Adds a wall to the grid.
+
+        Args:
+            state (tuple): Wall coordinate.
+        """
+        self.wallMask[self._requireCell(state)] = True
+        self.invalidate()
+
+    def removeWall(self, state):
+        """
+        Removes a wall from the grid.
+
+        Args:
+            state (tuple): Wall coordinate.
+        """
+        cell = self.cellOf(state)
+        if cell is not None:
+            self.wallMask[cell] = False
+            self.invalidate()
+
+    def setTerminal(self, state, reward):
+        """
+        Makes a state terminal, or changes the reward of an existing terminal.
+
+        Args:
+            state (tuple): State coordinate.
+            reward (float): Reward collected when exiting from the state.
+        """
+        cell = self._requireCell(state)
+        self.terminalMask[cell] = True
+        self.terminalRewards[cell] = reward
+        self.invalidate()
+
+    def removeTerminal(self, state):
+        """
+        Turns a terminal state back into a regular state.
+
+        Args:
+            state (tuple): State coordinate.
+        """
+        cell = self.cellOf(state)
+        if cell is not None:
+            self.terminalMask[cell] = False
+            self.terminalRewards[cell] = 0
+            self.invalidate()
+
+    def getRewardArray(self):
+        """
+        Returns the reward for leaving every cell of the grid.
+
+        Returns:
+            numpy.ndarray: Rewards, shape (rows, columns); walls are not meaningful.
+        """
+        return np.where(self.terminalMask, self.terminalRewards, 0.0)
+
+    def invalidate(self):
+        """
+        Drops the cached compiled transition structure.
+
+        Called automatically when walls, terminals or transition probabilities are
+        replaced or edited through the methods and views above. Call it directly
+        after writing to ``wallMask``, ``terminalMask`` or ``terminalRewards``.
+        """
+        self._compiled = None
+
+    def compile(self):
+        """
+        Returns the compiled array form of the grid, building it on first use.
+
+        The result is cached and shared by the solvers and by policy/Q-value
+        extraction until the grid is edited.
+
+        Returns:
+            CompiledGridWorld: State-index map, transition arrays and reward vector.
+        """
+        if self._compiled is None:
+            from CompiledGridWorld import CompiledGridWorld
+
+            self._compiled = CompiledGridWorld(self)
+        return self._compiled
+
+    def coarsen(self, factor, discount):
+        """
+        Returns a coarser copy of the grid whose cells are blocks of this grid's cells.
+
+        A block of factor x factor cells (smaller at the bottom and right edges) is a
+        wall only if all its cells are walls, so every passage stays open, and a
+        terminal if it holds a terminal, with the largest exit reward of the block.
+        One coarse step stands for ``factor`` steps of this grid and is meant to be
+        solved with ``discount ** factor``; this grid only collects exit rewards, which
+        need no rescaling.
+
+        Args:
+            factor (int): Side of the blocks.
+            discount (float): Discount factor of this grid.
+
+        Returns:
+            GridWorld: Grid of shape (ceil(rows / factor), ceil(columns / factor)).
+        """
+        rows, cols = -(-self.rows // factor), -(-self.cols // factor)
+
+        def blocks(mask, fill):
+            padded = np.full((rows * factor, cols * factor), fill, dtype=mask.dtype)
+            padded[: self.rows, : self.cols] = mask
+            return padded.reshape(rows, factor, cols, factor)
+
+        coarse = copy.copy(self)
+        coarse._compiled = None
+        coarse._wallSet = WallSet(coarse)
+        coarse._terminalMap = TerminalMap(coarse)
+        coarse.rows, coarse.cols = rows, cols
+        coarse.wallMask = blocks(self.wallMask, True).all(axis=(1, 3))
+        terminal = blocks(self.terminalMask & ~self.wallMask, False)
+        coarse.terminalMask = terminal.any(axis=(1, 3))
+        coarse.terminalRewards = np.where(
+            coarse.terminalMask,
+            np.where(terminal, blocks(self.terminalRewards, 0.0), -np.inf).max(
+                axis=(1, 3)
+            ),
+            0.0,
+        )
+        return coarse
+
     def getStates(self):
         """
         Returns a list of all valid states in the grid.
@@ -45,12 +251,8 @@ class GridWorld:
         Returns:
             list: List of valid states (coordinates).
         """
-        return [
-            (i, j)
-            for i in range(self.rows)
-            for j in range(self.cols)
-            if (i, j) not in self.walls
-        ]
+        rows, cols = np.nonzero(~self.wallMask)
+        return list(zip(rows.tolist(), cols.tolist()))
 
     def getTransitionStatesAndProbs(self, state, action):
         """
@@ -63,23 +265,26 @@ class GridWorld:
         Returns:
             list: List of (next_state, probability) tuples.
         """
-        if state in self.terms:
+        rows, cols = self.rows, self.cols
+        i, j = state
+        inside = 0 <= i < rows and 0 <= j < cols
+        if inside and self.terminalMask[i, j]:
             return [(GridWorld.GAMEOVER, 1.0)]
 
+        wall = self.wallMask
+        index = GridWorld.index[action]
         result = []
-        for turn in self.turns:
-            dirc = GridWorld.DIRCS[
-                (GridWorld.index[action] + turn) % len(GridWorld.DIRCS)
-            ]
-            row = state[0] + dirc[0]
-            col = state[1] + dirc[1]
-            landing = (
-                row if 0 <= row < self.rows else state[0],
-                col if 0 <= col < self.cols else state[1],
-            )
-            if landing in self.walls:
+        for turn, prob in self._turns.items():
+            dirc = GridWorld.DIRCS[(index + turn) % 4]
+            row = i + dirc[0]
+            col = j + dirc[1]
+            if not 0 <= row < rows:
+                row = i
+            if not 0 <= col < cols:
+                col = j
+            landing = (row, col)
+            if inside and wall[row, col]:
                 landing = state
-            prob = self.turns[turn]
             result.append((landing, prob))
         return result
 
@@ -95,8 +300,9 @@ class GridWorld:
         Returns:
             float: Reward value.
         """
-        if state in self.terms:
-            return self.terms[state]
+        i, j = state
+        if 0 <= i < self.rows and 0 <= j < self.cols and self.terminalMask[i, j]:
+            return float(self.terminalRewards[i, j])
         else:
             return 0
 
@@ -122,57 +328,111 @@ class GridWorld:
         Returns:
             list: List of legal action direction tuples.
         """
-        if state in self.terms:
+        i, j = state
+        if 0 <= i < self.rows and 0 <= j < self.cols and self.terminalMask[i, j]:
             return [GridWorld.EXIT]
         else:
             return GridWorld.DIRCS
 
-    def printValues(self, values):
+    def valueGrid(self, values):
         """
-        Prints the current values of states in a grid format.
+        Arranges state values in a grid.
 
         Args:
-            values (dict): Dictionary mapping state coordinates to values.
-        """
-        output = str()
-        divide = "\n" + "----------- " * self.cols + "\n"
-        for i in range(self.rows):
-            for j in range(self.cols):
-                output += "   %+.2f   |" % values[(i, j)]
-            output += divide
-        print(output)
+            values (Mapping or numpy.ndarray): Mapping of state coordinates to values,
+                such as the result of ``ValueIteration.valueIteration``, or a grid of
+                shape (rows, columns), which is returned as is.
 
-    def printPolicy(self, policy):
+        Returns:
+            numpy.ndarray: Values of shape (rows, columns).
         """
-        Prints the current policy actions in a grid format.
+        from CompiledGridWorld import StateValues
+
+        if isinstance(values, np.ndarray):
+            return values
+        if isinstance(values, StateValues) and values.compiled.shape == (
+            self.rows,
+            self.cols,
+        ):
+            return values.grid()
+        return np.array(
+            [[values[(i, j)] for j in range(self.cols)] for i in range(self.rows)],
+            dtype=float,
+        )
+
+    def policySymbols(self, policy):
+        """
+        Arranges a policy in a grid of symbols.
+
+        Actions show as arrows; cells without one show "$" for a positive terminal
+        state, "!" for another terminal state and "W" otherwise.
 
         Args:
-            policy (dict): Dictionary mapping state coordinates to action tuples.
+            policy (Mapping or numpy.ndarray): Mapping of state coordinates to action
+                tuples, or the action indices returned by
+                ``ValueIteration.getPolicyArray``.
+
+        Returns:
+            numpy.ndarray: Single-character strings of shape (rows, columns).
         """
+        symbols = np.where(
+            self.terminalMask, np.where(self.terminalRewards > 0, "$", "!"), "W"
+        )
+        if isinstance(policy, np.ndarray):
+            arrows = np.array(["^", ">", "v", "<"])
+            states = self.compile().stateIndices
+            moving = policy >= 0
+            symbols.ravel()[states[moving]] = arrows[policy[moving]]
+            return symbols
         actmap = {
             GridWorld.NORTH: "^",
             GridWorld.EAST: ">",
             GridWorld.SOUTH: "v",
             GridWorld.WEST: "<",
         }
+        for state, action in policy.items():
+            cell = self.cellOf(state)
+            if cell is not None and action in actmap:
+                symbols[cell] = actmap[action]
+        return symbols
+
+    def printValues(self, values, window=None, step=1, stream=None):
+        """
+        Prints the current values of states in a grid format.
+
+        Rows are formatted and written one at a time, so large grids stream out
+        without building the whole table in memory.
+
+        Args:
+            values (Mapping or numpy.ndarray): Mapping of state coordinates to values,
+                or a grid of values (see ``valueGrid``).
+            window (tuple, optional): Pair of slices selecting the rows and columns to
+                print, e.g. ``numpy.s_[:20, :40]`` (default is None, which prints all).
+            step (int, optional): Print the mean of each step x step block of non-wall
+                states instead of every state (default is 1).
+            stream (file, optional): Text stream to write to (default is None, which
+                writes to sys.stdout).
+        """
+        grid = self.valueGrid(values)
+        if step > 1:
+            grid = np.where(self.wallMask, np.nan, grid)
+        write_values(crop(grid, window, step), stream)
+
+    def printPolicy(self, policy, window=None, step=1, stream=None):
+        """
+        Prints the current policy actions in a grid format.
 
-        output = str()
-        divide = "\n" + "------- " * self.cols + "\n"
-        for i in range(self.rows):
-            for j in range(self.cols):
-                try:
-                    output += "   %s   |" % actmap[policy[(i, j)]]
-                except KeyError:
-                    if (i, j) in self.terms:
-                        if self.terms[(i, j)] > 0:
-                            output += "   $   |"
-                        else:
-                            output += "   !   |"
-                    else:
-                        output += "   W   |"
-
-            output += divide
-        print(output)
+        Args:
+            policy (Mapping or numpy.ndarray): Mapping of state coordinates to action
+                tuples, or action indices (see ``policySymbols``).
+            window (tuple, optional): Pair of slices selecting the rows and columns to
+                print, e.g. ``numpy.s_[:20, :40]`` (default is None, which prints all).
+            step (int, optional): Print the top-left cell of each step x step block
+                (default is 1, which prints every cell).
+            stream (file, optional): Text stream to write to (default is None, which
+                writes to sys.stdout).
+        """
+        write_symbols(crop(self.policySymbols(policy), window, step, "first"), stream)
 
 
 class GridWorldAdditive(GridWorld):
@@ -206,6 +466,16 @@ class GridWorldAdditive(GridWorld):
         super(GridWorldAdditive, self).__init__(shape, prob, walls, terminals)
         self.reward = reward
 
+    @property
+    def reward(self):
+        """float: Constant reward value for transitions."""
+        return self._reward
+
+    @reward.setter
+    def reward(self, reward):
+        self._reward = reward
+        self.invalidate()
+
     def getReward(self, state, action, nextState):
         """
         Returns the reward for transitioning from a state to the next state with an action, considering the additive reward.
@@ -218,7 +488,119 @@ class GridWorldAdditive(GridWorld):
         Returns:
             float: Reward value.
         """
-        if state in self.terms:
-            return self.terms[state]
+        i, j = state
+        if 0 <= i < self.rows and 0 <= j < self.cols and self.terminalMask[i, j]:
+            return float(self.terminalRewards[i, j])
         else:
-            return self.reward
+            return self._reward
+
+    def getRewardArray(self):
+        """
+        Returns the reward for leaving every cell of the grid, considering the additive reward.
+
+        Returns:
+            numpy.ndarray: Rewards, shape (rows, columns); walls are not meaningful.
+        """
+        return np.where(self.terminalMask, self.terminalRewards, float(self.reward))
+
+    def coarsen(self, factor, discount):
+        """
+        Returns a coarser copy of the grid, see ``GridWorld.coarsen``.
+
+        The constant reward of a coarse step is the discounted reward of the
+        ``factor`` steps it stands for.
+
+        Args:
+            factor (int): Side of the blocks.
+            discount (float): Discount factor of this grid.
+
+        Returns:
+            GridWorldAdditive: Grid of shape (ceil(rows / factor), ceil(columns / factor)).
+        """
+        coarse = super(GridWorldAdditive, self).coarsen(factor, discount)
+        coarse.reward = self.reward * sum(discount**k for k in range(factor))
+        return coarse
+
+
+class WallSet(MutableSet):
+    """
+    Set-like view of the walls of a GridWorld.
+
+    Membership tests read ``GridWorld.wallMask``; coordinates outside the grid are
+    never walls. Adding or discarding walls edits the mask and invalidates the
+    compiled grid.
+    """
+
+    def __init__(self, mdp):
+        """
+        Creates a view of the walls of a grid.
+
+        Args:
+            mdp (GridWorld): The grid environment.
+        """
+        self.mdp = mdp
+
+    def __contains__(self, state):
+        cell = self.mdp.cellOf(state)
+        return cell is not None and bool(self.mdp.wallMask[cell])
+
+    def __iter__(self):
+        rows, cols = np.nonzero(self.mdp.wallMask)
+        return iter(list(zip(rows.tolist(), cols.tolist())))
+
+    def __len__(self):
+        return int(self.mdp.wallMask.sum())
+
+    def __repr__(self):
+        return f"WallSet({set(self)})"
+
+    def add(self, state):
+        self.mdp.addWall(state)
+
+    def discard(self, state):
+        self.mdp.removeWall(state)
+
+
+class TerminalMap(MutableMapping):
+    """
+    Dict-like view of the terminal states of a GridWorld and their rewards.
+
+    Reads ``GridWorld.terminalMask`` and ``GridWorld.terminalRewards``; writes edit
+    them and invalidate the compiled grid.
+    """
+
+    def __init__(self, mdp):
+        """
+        Creates a view of the terminal states of a grid.
+
+        Args:
+            mdp (GridWorld): The grid environment.
+        """
+        self.mdp = mdp
+
+    def __contains__(self, state):
+        cell = self.mdp.cellOf(state)
+        return cell is not None and bool(self.mdp.terminalMask[cell])
+
+    def __getitem__(self, state):
+        if state not in self:
+            raise KeyError(state)
+        return float(self.mdp.terminalRewards[self.mdp.cellOf(state)])
+
+    def __setitem__(self, state, reward):
+        self.mdp.setTerminal(state, reward)
+
+    def __delitem__(self, state):
+        if state not in self:
+            raise KeyError(state)
+        self.mdp.removeTerminal(state)
+
+    def __iter__(self):
+        rows, cols = np.nonzero(self.mdp.terminalMask)
+        return iter(list(zip(rows.tolist(), cols.tolist())))
+
+    def __len__(self):
+        return int(self.mdp.terminalMask.sum())
+
+    def __repr__(self):
+        return f"TerminalMap({dict(self)})"
@@ -0,0 +1,298 @@
+import ast
+import os
+import shutil
+import sys
+
+import numpy as np
+
+
+class InstanceStore:
+    """
+    Columnar on-disk store of grid world instances.
+
+    A store is a directory holding one ``.npy`` file per column. Per-instance columns
+    are ``name``, ``width``, ``height``, ``p`` and ``r``; the terminal lists of all
+    instances are concatenated into the ``x``, ``y`` and ``reward`` columns, and
+    ``offsets`` indexes them: the list of instance ``i`` is entries
+    ``offsets[i]:offsets[i + 1]``. Columns are memory-mapped on first use, so opening
+    a store reads nothing and looking up an instance only touches its own entries.
+
+    Instances are (W, H, L, p, r) tuples as used by GridWorldBased and GridWorldFree,
+    with L a list of (x, y, reward) triples where a reward of 0 marks a wall.
+
+    Attributes:
+        path (str): Directory of the store.
+    """
+
+    COLUMNS = ("name", "width", "height", "p", "r", "offsets", "x", "y", "reward")
+
+    def __init__(self, path):
+        """
+        Opens a store without reading any column.
+
+        Args:
+            path (str): Directory of the store.
+        """
+        self.path = path
+        self._columns = {}
+
+    def column(self, name):
+        """
+        Returns a column of the store, memory-mapping it on first use.
+
+        Args:
+            name (str): One of COLUMNS.
+
+        Returns:
+            numpy.ndarray: Read-only column.
+        """
+        if name not in self._columns:
+            self._columns[name] = np.load(
+                os.path.join(self.path, f"{name}.npy"), mmap_mode="r"
+            )
+        return self._columns[name]
+
+    def __len__(self):
+        return len(self.column("width"))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __getitem__(self, index):
+        """
+        Returns one instance, or a list of instances for a slice.
+
+        Args:
+            index (int or slice): Position of the instance.
+
+        Returns:
+            tuple: (W, H, L, p, r) instance.
+        """
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = self._position(index)
+        start, end = self.column("offsets")[index : index + 2].tolist()
+        L = list(
+            zip(
+                self.column("x")[start:end].tolist(),
+                self.column("y")[start:end].tolist(),
+                self.column("reward")[start:end].tolist(),
+            )
+        )
+        return (
+            int(self.column("width")[index]),
+            int(self.column("height")[index]),
+            L,
+            float(self.column("p")[index]),
+            float(self.column("r")[index]),
+        )
+
+    def _position(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Instance {index} out of range")
+        return index
+
+    def name(self, index):
+        """
+        Returns the name of an instance.
+
+        Args:
+            index (int): Position of the instance.
+
+        Returns:
+            str: Name of the instance.
+        """
+        return str(self.column("name")[self._position(index)])
+
+    def grid(self, index):
+        """
+        Returns an instance as a reward grid, as written by ``generateGrid.generate_grid``.
+
+        Args:
+            index (int): Position of the instance.
+
+        Returns:
+            numpy.ndarray: Grid of shape (H, W) holding the reward of each listed cell
+            at [y, x] and 0 elsewhere.
+        """
+        index = self._position(index)
+        start, end = self.column("offsets")[index : index + 2].tolist()
+        grid = np.zeros((self.column("height")[index], self.column("width")[index]))
+        grid[self.column("y")[start:end], self.column("x")[start:end]] = self.column(
+            "reward"
+        )[start:end]
+        return grid
+
+    @staticmethod
+    def write(path, instances, names=None):
+        """
+        Writes instances to a new store, replacing any store at the same path.
+
+        Args:
+            path (str): Directory of the store.
+            instances (iterable): (W, H, L, p, r) instances.
+            names (iterable, optional): Name of each instance (default is None, which
+                numbers them from 1).
+
+        Returns:
+            InstanceStore: The written store.
+        """
+        names = iter(names) if names is not None else None
+        with InstanceWriter(path) as writer:
+            for W, H, L, p, r in instances:
+                cells = np.array(L, dtype=float).reshape(-1, 3)
+                writer.add(
+                    W,
+                    H,
+                    cells[:, 0],
+                    cells[:, 1],
+                    cells[:, 2],
+                    p,
+                    r,
+                    None if names is None else next(names),
+                )
+        return InstanceStore(path)
+
+
+class InstanceWriter:
+    """
+    Streams instances into a new InstanceStore.
+
+    The terminal lists are appended to raw column files as instances arrive, so
+    writing a store never holds more than one instance's cells in memory. The
+    columns become ``.npy`` files when the writer is closed.
+
+    Attributes:
+        path (str): Directory of the store.
+        count (int): Number of instances added so far.
+    """
+
+    CELLS = {"x": np.int32, "y": np.int32, "reward": np.float64}
+
+    def __init__(self, path):
+        """
+        Starts a new store, replacing any store at the same path.
+
+        Args:
+            path (str): Directory of the store.
+        """
+        self.path = path
+        self.count = 0
+        os.makedirs(path, exist_ok=True)
+        self._rows = {name: [] for name in ("name", "width", "height", "p", "r")}
+        self._offsets = [0]
+        self._files = {
+            name: open(os.path.join(path, f"{name}.raw"), "wb") for name in self.CELLS
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, width, height, x, y, reward, p, r, name=None):
+        """
+        Appends one instance.
+
+        Args:
+            width (int): Width of the grid.
+            height (int): Height of the grid.
+            x (numpy.ndarray): X-coordinates of the listed cells.
+            y (numpy.ndarray): Y-coordinates of the listed cells.
+            reward (numpy.ndarray): Reward of each listed cell, 0 for walls.
+            p (float): Probability of moving in the intended direction.
+            r (float): Default reward value for non-terminal states.
+            name (str, optional): Name of the instance (default is None, which uses its
+                1-based position).
+        """
+        for column, values in (("x", x), ("y", y), ("reward", reward)):
+            np.asarray(values, dtype=self.CELLS[column]).tofile(self._files[column])
+        self._offsets.append(self._offsets[-1] + len(x))
+        self.count += 1
+        self._rows["name"].append(str(self.count) if name is None else name)
+        self._rows["width"].append(width)
+        self._rows["height"].append(height)
+        self._rows["p"].append(p)
+        self._rows["r"].append(r)
+
+    def close(self):
+        """
+        Writes the per-instance columns and turns the raw cell columns into ``.npy``.
+        """
+        columns = {
+            "name": np.array(self._rows["name"], dtype=str),
+            "width": np.array(self._rows["width"], dtype=np.int32),
+            "height": np.array(self._rows["height"], dtype=np.int32),
+            "p": np.array(self._rows["p"], dtype=float),
+            "r": np.array(self._rows["r"], dtype=float),
+            "offsets": np.array(self._offsets, dtype=np.int64),
+        }
+        for name, column in columns.items():
+            np.save(os.path.join(self.path, f"{name}.npy"), column)
+        for name, dtype in self.CELLS.items():
+            self._files[name].close()
+            raw = os.path.join(self.path, f"{name}.raw")
+            header = {
+                "descr": np.lib.format.dtype_to_descr(np.dtype(dtype)),
+                "fortran_order": False,
+                "shape": (self._offsets[-1],),
+            }
+            with open(os.path.join(self.path, f"{name}.npy"), "wb") as target:
+                np.lib.format.write_array_header_1_0(target, header)
+                with open(raw, "rb") as source:
+                    shutil.copyfileobj(source, target)
+            os.remove(raw)
+
+
+def read_text(filename):
+    """
+    Reads grid world instances from a text file of 7-line blocks.
+
+    Each block is a comment line naming the instance, then w, h, L, p and r
+    assignments and a blank line.
+
+    Args:
+        filename (str): Path of the instances file.
+
+    Returns:
+        tuple: List of (W, H, L, p, r) instances and list of their names.
+    """
+    with open(filename, "r") as file:
+        data = file.readlines()
+
+    instances = []
+    names = []
+    while len(data) >= 6:
+        names.append(data[0].lstrip("#").strip())
+        W = int(data[1].split("=")[1])
+        H = int(data[2].split("=")[1])
+        L = ast.literal_eval(data[3].split("=")[1].strip())
+        p = float(data[4].split("=")[1])
+        r = float(data[5].split("=")[1])
+        instances.append((W, H, L, p, r))
+
+        # Move to the next set of parameters
+        data = data[7:]
+    return instances, names
+
+
+def main(argv=None):
+    """
+    Converts a text instances file into an instance store.
+
+    Example:
+        To run:
+        python InstanceStore.py data/tests/instances.txt data/tests/instances
+    """
+    source, target = (sys.argv[1:] if argv is None else argv)[:2]
+    instances, names = read_text(source)
+    InstanceStore.write(target, instances, names)
+    print(f"Wrote {len(instances)} instances to {target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import json
+import time
+from collections import Counter
+
+
+class Instrument:
+    """
+    Collects counters, timed events and callbacks from the solvers.
+
+    Solvers accept an ``instrument`` argument and report to it once per sweep or
+    episode, never per state or step, so an instrumented run pays a dictionary
+    update per iteration and an uninstrumented one (``instrument=None``) pays
+    nothing beyond a None check.
+
+    Every event is a dict with its ``name``, its ``start`` time and ``duration`` in
+    seconds (relative to the creation of the instrument) and the fields reported
+    by the solver, e.g. ``residual`` or ``length``. Counters add up over all
+    events, sampled or not.
+
+    Attributes:
+        counters (collections.Counter): Totals reported by the solvers, e.g. backups,
+            transitions, sweeps and episodes.
+        events (list): Recorded events, in order.
+        callbacks (list): Functions called with each recorded event.
+        sample (int): Only every ``sample``-th event of each name is recorded and
+            passed to the callbacks.
+        keep (bool): Whether recorded events are kept in ``events``.
+    """
+
+    def __init__(self, callbacks=(), sample=1, keep=True):
+        """
+        Initializes an instrument with no events.
+
+        Args:
+            callbacks (iterable, optional): Functions called with each recorded event,
+                e.g. to print progress or stop a run early by raising (default is ()).
+            sample (int, optional): Record every ``sample``-th event of each name, to
+                keep long runs cheap (default is 1, which records every event).
+            keep (bool, optional): Whether to keep recorded events for export; with
+                False only counters and callbacks are updated (default is True).
+        """
+        if sample < 1:
+            raise ValueError("sample must be at least 1")
+        self.callbacks = list(callbacks)
+        self.sample = sample
+        self.keep = keep
+        self.counters = Counter()
+        self.events = []
+        self._origin = time.perf_counter()
+        self._marks = {}
+        self._seen = Counter()
+
+    def begin(self, name):
+        """
+        Starts timing the next event of a given name.
+
+        Args:
+            name (str): Event name, e.g. "sweep" or "episode".
+        """
+        self._marks[name] = time.perf_counter()
+
+    def record(self, name, **fields):
+        """
+        Ends an event, timing it from ``begin`` or from the previous event of that name.
+
+        Consecutive events of one name are timed back to back, so a solver only calls
+        ``begin`` before its loop and ``record`` at the end of each iteration.
+
+        Args:
+            name (str): Event name.
+            **fields: Values describing the event, e.g. residual=0.01.
+        """
+        now = time.perf_counter()
+        start = self._marks.get(name, now)
+        self._marks[name] = now
+        self._seen[name] += 1
+        if self._seen[name] % self.sample:
+            return
+        event = {
+            "name": name,
+            "start": start - self._origin,
+            "duration": now - start,
+            **fields,
+        }
+        if self.keep:
+            self.events.append(event)
+        for callback in self.callbacks:
+            callback(event)
+
+    def count(self, **amounts):
+        """
+        Adds to the counters.
+
+        Args:
+            **amounts: Increment of each counter, e.g. backups=100.
+        """
+        self.counters.update(amounts)
+
+    def summary(self):
+        """
+        Summarizes the recorded events.
+
+        Returns:
+            dict: For each event name, the number of recorded events and their total
+            and mean duration in seconds.
+        """
+        summary = {}
+        for event in self.events:
+            entry = summary.setdefault(event["name"], {"events": 0, "seconds": 0.0})
+            entry["events"] += 1
+            entry["seconds"] += event["duration"]
+        for entry in summary.values():
+            entry["mean"] = entry["seconds"] / entry["events"]
+        return summary
+
+    def write_log(self, filename):
+        """
+        Writes the events as JSON lines, followed by one line with the counters.
+
+        Args:
+            filename (str): Path of the log file.
+        """
+        with open(filename, "w") as f:
+            for event in self.events:
+                f.write(json.dumps(event) + "\n")
+            f.write(json.dumps({"name": "counters", **self.counters}) + "\n")
+
+    def write_chrome_trace(self, filename):
+        """
+        Writes the events in the Chrome trace event format.
+
+        The file opens in chrome://tracing or Perfetto: every event is a complete
+        ("X") slice carrying its fields as arguments, and every numeric field is also
+        plotted as a counter ("C") track.
+
+        Args:
+            filename (str): Path of the trace file.
+        """
+        trace = []
+        for event in self.events:
+            fields = {
+                key: value
+                for key, value in event.items()
+                if key not in ("name", "start", "duration")
+            }
+            ts = event["start"] * 1e6
+            trace.append(
+                {
+                    "name": event["name"],
+                    "ph": "X",
+                    "ts": ts,
+                    "dur": event["duration"] * 1e6,
+                    "pid": 0,
+                    "tid": 0,
+                    "args": fields,
+                }
+            )
+            numeric = {
+                key: value
+                for key, value in fields.items()
+                if isinstance(value, (int, float)) and not isinstance(value, bool)
+            }
+            if numeric:
+                trace.append(
+                    {
+                        "name": event["name"],
+                        "ph": "C",
+                        "ts": ts,
+                        "pid": 0,
+                        "args": numeric,
+                    }
+                )
+        with open(filename, "w") as f:
+            json.dump({"traceEvents": trace, "otherData": dict(self.counters)}, f)
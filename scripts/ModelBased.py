@@ -1,5 +1,8 @@
 import numpy as np
-import ast
+import heapq
+
+from InstanceStore import InstanceStore
+from Storage import allocate, flush, load_checkpoint, save_checkpoint
 
 
 class GridWorldBased:
@@ -15,9 +18,25 @@ class GridWorldBased:
         grid (numpy.ndarray): Grid representation with rewards and terminal states.
         policy (numpy.ndarray): Policy grid indicating the optimal action for each state.
         value (numpy.ndarray): Value grid storing the expected cumulative rewards for each state.
+        iterations (int): Number of sweeps performed by the last value_iteration call.
+        backups (int): Number of single-state backups performed by the last call.
+        residual (float): Bellman residual max|V_k - V_k-1| of the last sweep.
+        span (float): Span seminorm of V_k - V_k-1 for the last sweep.
+        storage (str): Directory of the memory-mapped arrays, or None.
+        counts (numpy.ndarray): Visit counts of each outcome of the (state, action)
+            pairs tried by ``learn``, shape (pairs, 5), one row per pair in the order
+            of ``pair_keys``.
+        pair_keys (numpy.ndarray): Key ``(y * w + x) * len(actions) + a`` of each row
+            of ``counts``, shape (pairs,).
+        transitions (int): Number of environment steps taken by the last ``learn`` call.
     """
 
-    def __init__(self, w, h, L, p, r, discount=0.5):
+    # Outcomes of a learned transition: staying, or moving to one of the neighbors
+    OUTCOMES = ("S", "U", "D", "L", "R")
+    # Approximate number of cells in a block of a frontier sweep
+    FRONTIER_BLOCK = 65536
+
+    def __init__(self, w, h, L, p, r, discount=0.5, storage=None, dtype=np.float64):
         """
         Initializes the grid world environment.
 
@@ -28,15 +47,29 @@ class GridWorldBased:
             p (float): Probability of moving in the intended direction.
             r (float): Default reward value for non-terminal states.
             discount (float, optional): Discount factor for future rewards (default is 0.5).
+            storage (str, optional): Directory in which grid, policy and value are kept as
+                memory-mapped .npy files (default is None, which keeps them in memory).
+            dtype (numpy.dtype, optional): Data type of grid and value, e.g. numpy.float32
+                to halve their size (default is numpy.float64).
         """
         self.w = w
         self.h = h
         self.p = p
         self.r = r
         self.discount = discount
-        self.grid = np.full((h, w), r)
-        self.policy = np.full((h, w), " ")
-        self.value = np.zeros((h, w))
+        self.grid = allocate((h, w), dtype, r, storage, "grid")
+        self.policy = allocate((h, w), "U1", " ", storage, "policy")
+        self.value = allocate((h, w), dtype, 0, storage, "value")
+        self.storage = storage
+        self.transitions = 0
+        self._pair_rows = {}
+        self._pair_keys = np.zeros(64, dtype=np.int64)
+        self._pair_counts = np.zeros((64, len(self.OUTCOMES)), dtype=np.uint32)
+        self._pair_rewards = np.zeros(64)
+        self.iterations = 0
+        self.backups = 0
+        self.residual = None
+        self.span = None
 
         for x, y, reward in L:
             if reward == 0:
@@ -108,29 +141,746 @@ class GridWorldBased:
             expected_val += self.action_prob[action][act] * self.value[new_y, new_x]
         return expected_val
 
-    def value_iteration(self, iterations=1000):
+    def backup(self, x, y):
+        """
+        Computes the Bellman backup of a single state from the current values.
+
+        Args:
+            x (int): X-coordinate of the state.
+            y (int): Y-coordinate of the state.
+
+        Returns:
+            tuple: Backed-up value and the greedy action.
+        """
+        max_val = float("-inf")
+        best_action = None
+        for action in self.actions:
+            val = self.expected_value(x, y, action)
+            if val > max_val:
+                max_val = val
+                best_action = action
+        return self.grid[y, x] + self.discount * max_val, best_action
+
+    def backup_rows(self, rows, y0, y1):
+        """
+        Computes the Bellman backups of a block of rows at once.
+
+        Matches ``backup`` exactly, including which neighbours count as walls.
+
+        Args:
+            rows (numpy.ndarray): Current values of rows max(y0 - 1, 0) to
+                min(y1 + 1, h) - 1, i.e. the block and the rows just around it.
+            y0 (int): First row of the block.
+            y1 (int): End (exclusive) of the block.
+
+        Returns:
+            tuple: Backed-up values and the index in ``actions`` of the greedy action,
+            both of shape (y1 - y0, w). Entries of terminal states and walls are not
+            meaningful.
+        """
+        ys = np.arange(y0, y1)
+        offset = y0 - 1 if y0 > 0 else 0
+        center = rows[ys - offset]
+        neighbours = {
+            "U": rows[np.minimum(ys + 1, self.h - 1) - offset],
+            "D": rows[np.maximum(ys - 1, 0) - offset],
+            "L": np.concatenate([center[:, :1], center[:, :-1]], axis=1),
+            "R": np.concatenate([center[:, 1:], center[:, -1:]], axis=1),
+        }
+        expected = np.zeros((len(self.actions),) + center.shape)
+        for a, action in enumerate(self.actions):
+            for act, prob in self.action_prob[action].items():
+                expected[a] += prob * neighbours[act]
+        best = expected.argmax(axis=0)
+        grid = np.asarray(self.grid[y0:y1], dtype=float)
+        return grid + self.discount * expected.max(axis=0), best
+
+    def backup_cells(self, cells, around=None):
+        """
+        Computes the Bellman backups of arbitrary cells at once.
+
+        Matches ``backup`` and ``backup_rows`` exactly.
+
+        Args:
+            cells (numpy.ndarray): Flat indices ``y * w + x`` of the cells.
+            around (numpy.ndarray, optional): ``neighbors(cells)``, if already known
+                (default is None, which computes it).
+
+        Returns:
+            tuple: Backed-up values and the index in ``actions`` of the greedy action.
+        """
+        if around is None:
+            around = self.neighbors(cells)
+        around = self.value.reshape(-1)[around].astype(float)
+        neighbours = {
+            outcome: around[:, o] for o, outcome in enumerate(self.OUTCOMES) if o > 0
+        }
+        expected = np.zeros((len(self.actions), len(cells)))
+        for a, action in enumerate(self.actions):
+            for act, prob in self.action_prob[action].items():
+                expected[a] += prob * neighbours[act]
+        grid = self.grid.reshape(-1)[cells].astype(float)
+        return grid + self.discount * expected.max(axis=0), expected.argmax(axis=0)
+
+    def sweep(self, block_rows=None):
+        """
+        Performs one synchronous (Jacobi) sweep, updating value and policy in place.
+
+        The grid is processed in blocks of rows. Each block is backed up from the
+        previous sweep's values, which only requires keeping the old copy of the row
+        just above it, so a sweep over memory-mapped arrays reads and writes each row
+        once and never holds more than a block in memory.
+
+        Args:
+            block_rows (int, optional): Number of rows per block (default is None, which
+                sweeps the whole grid as one block).
+
+        Returns:
+            tuple: Smallest and largest change of a state value during the sweep.
+        """
+        block_rows = self.h if block_rows is None else max(int(block_rows), 1)
+        actions = np.array(self.actions)
+        r = self.grid.dtype.type(self.r)
+        low, high = float("inf"), float("-inf")
+        above = None
+        for y0 in range(0, self.h, block_rows):
+            y1 = min(y0 + block_rows, self.h)
+            rows = np.array(self.value[max(y0 - 1, 0) : min(y1 + 1, self.h)], float)
+            if above is not None:
+                rows[0] = above
+            old = rows[y0 - max(y0 - 1, 0) :][: y1 - y0]
+            above = old[-1].copy()
+            new, best = self.backup_rows(rows, y0, y1)
+            live = self.grid[y0:y1] == r
+            new = np.where(live, new, old)
+            self.value[y0:y1] = new
+            self.policy[y0:y1] = np.where(live, actions[best], self.policy[y0:y1])
+            self.backups += int(live.sum())
+            diff = new - old
+            low = min(low, float(diff.min()))
+            high = max(high, float(diff.max()))
+        return low, high
+
+    @property
+    def counts(self):
+        """numpy.ndarray: Outcome counts of the tried pairs, shape (pairs, 5)."""
+        return self._pair_counts[1 : len(self._pair_rows) + 1]
+
+    @property
+    def pair_keys(self):
+        """numpy.ndarray: Key of each row of ``counts``, shape (pairs,)."""
+        return self._pair_keys[1 : len(self._pair_rows) + 1]
+
+    def flush(self):
+        """
+        Writes grid, policy and value to their files when they are memory-mapped.
+        """
+        flush(self.grid, self.policy, self.value)
+
+    def value_iteration(
+        self,
+        iterations=1000,
+        tolerance=None,
+        criterion="residual",
+        mode="jacobi",
+        block_rows=None,
+        checkpoint=None,
+        checkpoint_every=10,
+        instrument=None,
+    ):
         """
         Performs value iteration to compute the optimal policy and state values.
 
+        With a tolerance, iterations is only a cap and the loop stops as soon as the
+        sweep's Bellman residual (or its span, see criterion) drops below it.
+
+        The "jacobi" mode computes each sweep from the previous values in blocks of
+        rows (see ``sweep``), "gauss-seidel" updates ``value`` in place during the sweep,
+        "prioritized" backs up one state at a time in order of Bellman error (see
+        ``prioritized_sweeping``), and "frontier" sweeps only the states next to a
+        changed value (see ``frontier_sweeping``).
+
+        With a checkpoint file, value, policy, counters and settings of a "jacobi" or
+        "gauss-seidel" run are saved every ``checkpoint_every`` sweeps and when the run
+        ends; ``resume`` continues such a run exactly as if it had never stopped.
+
+        With an instrument, every sweep records a "sweep" event with its iteration,
+        backups, residual and span, and adds to the "sweeps" and "backups" counters;
+        prioritized sweeping records one "prioritized" event for the whole run.
+
         Args:
             iterations (int, optional): Number of iterations for value iteration (default is 1000).
+            tolerance (float, optional): Stop once the convergence measure is below this value
+                (default is None, which always runs all iterations).
+            criterion (str, optional): "residual" measures max|V_k - V_k-1|, "span" measures
+                max(V_k - V_k-1) - min(V_k - V_k-1) (default is "residual").
+            mode (str, optional): "jacobi", "gauss-seidel", "prioritized" or "frontier"
+                (default is "jacobi").
+            block_rows (int, optional): Rows per block of a "jacobi" or "frontier" sweep
+                (default is None, which sweeps the whole grid at once in "jacobi" mode).
+            checkpoint (str, optional): Path of the checkpoint file (default is None).
+            checkpoint_every (int, optional): Sweeps between checkpoints (default is 10).
+            instrument (Instrument, optional): Receives events and counters (default is None).
+
+        Returns:
+            tuple: Number of iterations performed and the final Bellman residual.
         """
+        if criterion not in ("residual", "span"):
+            raise ValueError(f"Unknown criterion: {criterion}")
+        if mode not in ("jacobi", "gauss-seidel", "prioritized", "frontier"):
+            raise ValueError(f"Unknown mode: {mode}")
+        self.iterations = 0
+        self.backups = 0
+        self.residual = self.span = None
+        if mode in ("prioritized", "frontier") and checkpoint is not None:
+            raise ValueError(f"Checkpoints are not supported in {mode} mode")
+        if mode == "prioritized":
+            return self.prioritized_sweeping(iterations, tolerance, instrument)
+        if mode == "frontier":
+            return self.frontier_sweeping(iterations, tolerance, instrument, block_rows)
+        return self._sweeps(
+            {
+                "iterations": iterations,
+                "tolerance": tolerance,
+                "criterion": criterion,
+                "mode": mode,
+                "block_rows": block_rows,
+                "checkpoint_every": checkpoint_every,
+            },
+            checkpoint,
+            instrument,
+        )
+
+    def resume(self, checkpoint, instrument=None):
+        """
+        Continues a value iteration run from a checkpoint written by ``value_iteration``.
+
+        The grid must be built with the same arguments as the interrupted run. The run
+        goes on with the saved settings and keeps saving to the same file.
+
+        Args:
+            checkpoint (str): Path of the checkpoint file.
+            instrument (Instrument, optional): Receives events and counters of the
+                remaining sweeps (default is None).
+
+        Returns:
+            tuple: Number of iterations performed and the final Bellman residual.
+        """
+        arrays, settings = load_checkpoint(checkpoint)
+        if settings.get("kind") != "value_iteration":
+            raise ValueError(f"{checkpoint} is not a value iteration checkpoint")
+        if arrays["value"].shape != self.value.shape:
+            raise ValueError("Checkpoint was written for a grid of a different size")
+        self.value[...] = arrays["value"]
+        self.policy[...] = arrays["policy"]
+        self.discount = settings["discount"]
+        self.iterations = settings["completed"]
+        self.backups = settings["backups"]
+        self.residual = settings["residual"]
+        self.span = settings["span"]
+        if settings["converged"]:
+            return self.iterations, self.residual
+        return self._sweeps(settings, checkpoint, instrument)
+
+    def _sweeps(self, settings, checkpoint=None, instrument=None):
+        """
+        Runs "jacobi" or "gauss-seidel" sweeps until convergence.
+
+        Args:
+            settings (dict): The iterations, tolerance, criterion, mode, block_rows and
+                checkpoint_every arguments of ``value_iteration``.
+            checkpoint (str, optional): Path of the checkpoint file (default is None).
+            instrument (Instrument, optional): Receives events and counters (default is None).
+
+        Returns:
+            tuple: Number of iterations performed and the final Bellman residual.
+        """
+        mode, block_rows = settings["mode"], settings["block_rows"]
+        tolerance, criterion = settings["tolerance"], settings["criterion"]
+        if instrument is not None:
+            instrument.begin("sweep")
+        while self.iterations < settings["iterations"]:
+            backups = self.backups
+            if mode == "jacobi":
+                low, high = self.sweep(block_rows)
+            else:
+                # Keep one row of old values, so memory-mapped values stay on disk
+                low, high = float("inf"), float("-inf")
+                for y in range(self.h):
+                    old = np.array(self.value[y], dtype=float)
+                    for x in range(self.w):
+                        if self.is_terminal(x, y) or self.grid[y, x] is None:
+                            continue
+                        self.value[y, x], self.policy[y, x] = self.backup(x, y)
+                        self.backups += 1
+                    diff = self.value[y] - old
+                    low = min(low, float(diff.min()))
+                    high = max(high, float(diff.max()))
+            self.iterations += 1
+            self.residual = max(abs(low), abs(high))
+            self.span = high - low
+            measure = self.residual if criterion == "residual" else self.span
+            converged = tolerance is not None and measure < tolerance
+            if instrument is not None:
+                backups = self.backups - backups
+                instrument.count(sweeps=1, backups=backups)
+                instrument.record(
+                    "sweep",
+                    iteration=self.iterations,
+                    backups=backups,
+                    residual=self.residual,
+                    span=self.span,
+                )
+            if checkpoint is not None and (
+                converged
+                or self.iterations % settings["checkpoint_every"] == 0
+                or self.iterations == settings["iterations"]
+            ):
+                save_checkpoint(
+                    checkpoint,
+                    {"value": self.value, "policy": self.policy},
+                    dict(
+                        settings,
+                        kind="value_iteration",
+                        discount=self.discount,
+                        completed=self.iterations,
+                        backups=self.backups,
+                        residual=self.residual,
+                        span=self.span,
+                        converged=converged,
+                    ),
+                )
+            if converged:
+                break
+        return self.iterations, self.residual
+
+    def prioritized_sweeping(self, iterations=1000, tolerance=None, instrument=None):
+        """
+        Performs value iteration by prioritized sweeping.
+
+        States wait in a heap keyed by their Bellman error. Each step backs up the state
+        with the largest error in place and re-scores the states that can move into it,
+        which are its four neighbors and itself. The loop stops when no error exceeds
+        the tolerance (0 if None) or after ``iterations`` backups per state.
+
+        Args:
+            iterations (int, optional): Budget of backups per state (default is 1000).
+            tolerance (float, optional): Bellman errors at or below this value are not
+                queued (default is None).
+            instrument (Instrument, optional): Receives a "prioritized" event and the
+                "backups" counter (default is None).
+
+        Returns:
+            tuple: Equivalent number of sweeps and the largest Bellman error left.
+        """
+        if instrument is not None:
+            instrument.begin("prioritized")
+        theta = 0 if tolerance is None else tolerance
+        states = [
+            (x, y)
+            for y in range(self.h)
+            for x in range(self.w)
+            if not (self.is_terminal(x, y) or self.grid[y, x] is None)
+        ]
+        priority = {}
+        heap = []
+        for x, y in states:
+            priority[x, y] = abs(self.backup(x, y)[0] - self.value[y, x])
+            if priority[x, y] > theta:
+                heap.append((-priority[x, y], x, y))
+        heapq.heapify(heap)
+        self.backups = 0
+        while heap and self.backups < iterations * len(states):
+            err, x, y = heapq.heappop(heap)
+            if -err != priority[x, y]:
+                continue
+            self.value[y, x], self.policy[y, x] = self.backup(x, y)
+            self.backups += 1
+            priority[x, y] = 0
+            for dx, dy in ((0, 0), (0, 1), (0, -1), (-1, 0), (1, 0)):
+                px, py = x + dx, y + dy
+                if (px, py) not in priority:
+                    continue
+                priority[px, py] = abs(self.backup(px, py)[0] - self.value[py, px])
+                if priority[px, py] > theta:
+                    heapq.heappush(heap, (-priority[px, py], px, py))
+        self.iterations = -(-self.backups // max(len(states), 1))
+        self.residual = float(max(priority.values(), default=0))
+        if instrument is not None:
+            instrument.count(backups=self.backups)
+            instrument.record(
+                "prioritized",
+                backups=self.backups,
+                iterations=self.iterations,
+                residual=self.residual,
+            )
+        return self.iterations, self.residual
+
+    def frontier_sweeping(
+        self, iterations=1000, tolerance=None, instrument=None, block_rows=None
+    ):
+        """
+        Performs value iteration by synchronous sweeps over an active set of states.
+
+        The first sweep backs up every state. A state's value only depends on its own
+        value and its four neighbors', so each later sweep backs up just the states
+        around those whose value moved by more than the tolerance (0 if None). The
+        loop stops when no value moved, which skips regions that already converged.
+
+        Sweeps go through the grid in blocks of rows and write a block only once the
+        next one is backed up, so no block reads a value of the same sweep. The
+        active set is a sorted array of int32 flat indices, built block by block, so
+        besides it only a block's worth of states is held in memory.
+
+        Args:
+            iterations (int, optional): Maximum number of sweeps (default is 1000).
+            tolerance (float, optional): Changes at or below this value do not
+                propagate (default is None).
+            instrument (Instrument, optional): Receives a "sweep" event per sweep and
+                the "sweeps" and "backups" counters (default is None).
+            block_rows (int, optional): Number of rows per block (default is None,
+                which uses blocks of about FRONTIER_BLOCK cells).
+
+        Returns:
+            tuple: Number of iterations performed and the final Bellman residual.
+        """
+        if instrument is not None:
+            instrument.begin("sweep")
+        if block_rows is None:
+            block_rows = self.FRONTIER_BLOCK // self.w
+        block_rows = max(int(block_rows), 1)
+        theta = 0 if tolerance is None else tolerance
+        r = self.grid.dtype.type(self.r)
+        index = np.int32 if self.h * self.w < 2**31 else np.int64
+        actions = np.array(self.actions)
+        grid = self.grid.reshape(-1)
+        value, policy = self.value.reshape(-1), self.policy.reshape(-1)
+        # None stands for every live state, which the first sweep backs up
+        active = None
+        while self.iterations < iterations and (active is None or active.size):
+            backups = 0
+            low, high = float("inf"), float("-inf")
+            frontier, held = [], np.empty(0, dtype=index)
+            pending = None
+            for y0 in range(0, self.h, block_rows):
+                y1 = min(y0 + block_rows, self.h)
+                if active is None:
+                    cells = np.flatnonzero(self.grid[y0:y1] == r).astype(index)
+                    cells += y0 * self.w
+                else:
+                    bounds = np.array((y0 * self.w, y1 * self.w), dtype=index)
+                    lo, hi = np.searchsorted(active, bounds)
+                    cells = active[lo:hi]
+                if cells.size:
+                    around = self.neighbors(cells)
+                    new, best = self.backup_cells(cells, around)
+                    diff = new - value[cells]
+                    backups += cells.size
+                    low = min(low, float(diff.min()))
+                    high = max(high, float(diff.max()))
+                    # Each column of around is sorted, so the sort merges 6 runs
+                    moved = around[np.abs(diff) > theta].T.reshape(-1)
+                    moved = np.sort(np.concatenate((held, moved)), kind="stable")
+                    first = np.ones(moved.size, dtype=bool)
+                    first[1:] = moved[1:] != moved[:-1]
+                    moved = moved[first]
+                    moved = moved[grid[moved] == r]
+                    # Later blocks can only reach the last two rows of this one
+                    split = np.searchsorted(moved, index((y1 - 1) * self.w))
+                    frontier.append(moved[:split])
+                    held = moved[split:]
+                # The previous block is written once nothing reads its old values
+                if pending is not None:
+                    value[pending[0]], policy[pending[0]] = pending[1:]
+                    pending = None
+                if cells.size:
+                    pending = cells, new, actions[best]
+            if pending is not None:
+                value[pending[0]], policy[pending[0]] = pending[1:]
+            if not backups:
+                break
+            active = np.concatenate(frontier + [held])
+            self.backups += backups
+            self.iterations += 1
+            self.residual = max(abs(low), abs(high))
+            self.span = high - low
+            if instrument is not None:
+                instrument.count(sweeps=1, backups=backups)
+                instrument.record(
+                    "sweep",
+                    iteration=self.iterations,
+                    backups=backups,
+                    residual=self.residual,
+                    span=self.span,
+                )
+        return self.iterations, self.residual
+
+    def neighbors(self, cells):
+        """
+        Returns the cell reached by each outcome of OUTCOMES from the given cells.
+
+        The cells are computed from the coordinates of the given cells only, so
+        no table over the whole grid is kept.
+
+        Args:
+            cells (numpy.ndarray): Flat indices ``y * w + x`` of the cells.
+
+        Returns:
+            numpy.ndarray: Flat indices ``y * w + x`` of shape (len(cells), 5), int32
+            if the cells are int32 and int64 otherwise.
+        """
+        cells = np.asarray(cells)
+        if cells.dtype != np.int32:
+            cells = cells.astype(np.int64)
+        y, x = np.divmod(cells, self.w)
+        around = np.empty((len(cells), len(self.OUTCOMES)), dtype=cells.dtype)
+        # Moves off the edge of the grid stay in place
+        around[:, 0] = cells
+        around[:, 1] = cells + self.w * (y < self.h - 1)
+        around[:, 2] = cells - self.w * (y > 0)
+        around[:, 3] = cells - (x > 0)
+        around[:, 4] = cells + (x < self.w - 1)
+        return around
+
+    def sample(self, x, y, action, rng):
+        """
+        Samples one step of the true environment.
+
+        This is the only access ``learn`` has to the dynamics and rewards: the agent
+        slips as given by ``action_prob``, collects the reward of the state it leaves
+        and, on reaching a terminal state or a wall, learns its value.
+
+        Args:
+            x (int): Current X-coordinate.
+            y (int): Current Y-coordinate.
+            action (str): Action to take ('U', 'D', 'L', 'R').
+            rng (numpy.random.Generator): Random number generator.
+
+        Returns:
+            tuple: (next x, next y, reward, done, terminal value or None).
+        """
+        moves = list(self.action_prob[action])
+        act = moves[rng.choice(len(moves), p=list(self.action_prob[action].values()))]
+        nx, ny = self.step(x, y, act)
+        reward = float(self.grid[y, x])
+        if self.grid[ny, nx] == self.r:
+            return nx, ny, reward, False, None
+        terminal = float(self.grid[ny, nx])
+        return nx, ny, reward, True, 0.0 if np.isnan(terminal) else terminal
+
+    def model_counts(self, states):
+        """
+        Looks up the learned counts of every action of some states.
+
+        Args:
+            states (numpy.ndarray): Flat indices of states.
+
+        Returns:
+            tuple: Outcome counts of shape (len(states), len(actions), 5), zero for
+            actions never tried, and the sum of the observed rewards of each state.
+        """
+        actions = len(self.actions)
+        keys = np.asarray(states, dtype=np.int64)[:, None] * actions + np.arange(actions)
+        # Row 0 stays all zeros and stands for the pairs never tried
+        rows = np.array(
+            [self._pair_rows.get(key, 0) for key in keys.ravel().tolist()]
+        ).reshape(keys.shape)
+        return self._pair_counts[rows], self._pair_rewards[rows].sum(axis=1)
+
+    def model_backup(self, states):
+        """
+        Computes Bellman backups of states under the learned model.
+
+        The transition probabilities are the observed outcome frequencies and the
+        reward is the mean observed reward of each state. Actions never tried from a
+        state are left out.
+
+        Args:
+            states (numpy.ndarray): Flat indices of visited states.
+
+        Returns:
+            tuple: Backed-up values and the index in ``actions`` of the greedy action.
+        """
+        counts, rewards = self.model_counts(states)
+        value = np.asarray(self.value, dtype=float).reshape(-1)
+        tried = counts.sum(axis=2)
+        expected = (counts * value[self.neighbors(states)][:, None, :]).sum(axis=2)
+        expected = np.where(tried > 0, expected / np.maximum(tried, 1), -np.inf)
+        reward = rewards / tried.sum(axis=1)
+        return reward + self.discount * expected.max(axis=1), expected.argmax(axis=1)
+
+    def _count(self, state, action, outcome, reward):
+        """
+        Adds one observed transition to the counts, creating its row if needed.
+
+        Args:
+            state (int): Flat index of the state left.
+            action (int): Index in ``actions`` of the action taken.
+            outcome (int): Index in OUTCOMES of the outcome.
+            reward (float): Observed reward.
+        """
+        key = state * len(self.actions) + action
+        row = self._pair_rows.get(key)
+        if row is None:
+            row = len(self._pair_rows) + 1
+            if row == len(self._pair_keys):
+                # Grow the rows geometrically, so adding a pair is amortized O(1)
+                size = 2 * row
+                self._pair_keys = np.resize(self._pair_keys, size)
+                self._pair_counts = np.resize(self._pair_counts, (size, 5))
+                self._pair_rewards = np.resize(self._pair_rewards, size)
+            self._pair_rows[key] = row
+            self._pair_keys[row] = key
+            self._pair_counts[row] = 0
+            self._pair_rewards[row] = 0
+        self._pair_counts[row, outcome] += 1
+        self._pair_rewards[row] += reward
+
+    def learn(
+        self,
+        episodes=100,
+        planning_steps=10,
+        replan_every=None,
+        epsilon=0.1,
+        max_steps=1000,
+        tolerance=1e-6,
+        seed=None,
+        instrument=None,
+    ):
+        """
+        Learns values and a policy from sampled transitions (model-based RL).
+
+        The agent starts knowing nothing about the grid. Every step taken through
+        ``sample`` adds to the visit counts of (state, action, outcome), where an
+        outcome is one of OUTCOMES, and to the observed rewards; terminal states and
+        walls are learned when reached. Counts are only kept for the (state, action)
+        pairs actually tried, so the model grows with the explored part of the grid
+        rather than with its size. The agent acts epsilon-greedily on the learned
+        model, trying every action of a state once before exploiting it.
+
+        Planning is incremental. After each real step, the state just left and
+        ``planning_steps - 1`` states drawn from those visited so far are backed up
+        under the learned model, Dyna style. With ``replan_every``, value
+        iteration also runs on the whole learned model every ``replan_every`` steps.
+        As the counts grow, the learned model approaches the true one and the values
+        approach those of ``value_iteration``.
+
+        Args:
+            episodes (int, optional): Number of episodes (default is 100).
+            planning_steps (int, optional): Model backups per real step (default is 10).
+            replan_every (int, optional): Steps between full value iterations on the
+                learned model (default is None, which never runs them).
+            epsilon (float, optional): Probability of a random action (default is 0.1).
+            max_steps (int, optional): Step limit per episode (default is 1000).
+            tolerance (float, optional): Residual at which the full value iterations
+                stop (default is 1e-6).
+            seed (int, optional): Seed of the random number generator (default is None).
+            instrument (Instrument, optional): Receives an "episode" event per episode
+                and the "episodes", "transitions" and "backups" counters (default is None).
+
+        Returns:
+            int: Number of environment steps taken.
+        """
+        rng = np.random.default_rng(seed)
+        size = self.h * self.w
+        actions = len(self.actions)
+        self._pair_rows = {}
+        self.value[...] = 0
+        self.policy[...] = " "
+        value = self.value.reshape(-1)
+        policy = self.policy.reshape(-1)
+        visited = np.zeros(size, dtype=bool)
+        # The first ``seen`` entries of order list the visited states
+        order = np.zeros(64, dtype=np.int64)
+        seen = 0
+        starts = np.flatnonzero(np.asarray(self.grid).reshape(-1) == self.r)
+        self.transitions = 0
+        self.backups = 0
+
+        if instrument is not None:
+            instrument.begin("episode")
+        for episode in range(episodes):
+            state = int(rng.choice(starts))
+            steps = 0
+            while steps < max_steps:
+                y, x = divmod(state, self.w)
+                if rng.random() < epsilon:
+                    a = int(rng.integers(actions))
+                else:
+                    untried = [
+                        a
+                        for a in range(actions)
+                        if state * actions + a not in self._pair_rows
+                    ]
+                    if untried:
+                        a = untried[0]
+                    else:
+                        a = int(self.model_backup(np.array([state]))[1][0])
+                nx, ny, reward, done, terminal = self.sample(x, y, self.actions[a], rng)
+                next_state = ny * self.w + nx
+                outcome = self._outcome(x, y, nx, ny)
+                self._count(state, a, outcome, reward)
+                if not visited[state]:
+                    visited[state] = True
+                    if seen == len(order):
+                        order = np.resize(order, 2 * seen)
+                    order[seen] = state
+                    seen += 1
+                if done:
+                    value[next_state] = terminal
+                    policy[next_state] = "T" if terminal != 0 else " "
+                steps += 1
+                self.transitions += 1
+
+                others = order[rng.integers(seen, size=max(planning_steps - 1, 0))]
+                batch = np.unique(np.concatenate([[state], others]))
+                value[batch], best = self.model_backup(batch)
+                policy[batch] = np.array(self.actions)[best]
+                self.backups += len(batch)
+                if replan_every is not None and self.transitions % replan_every == 0:
+                    self.plan(visited, tolerance)
+                if done:
+                    break
+                state = next_state
+            if instrument is not None:
+                instrument.count(episodes=1, transitions=steps)
+                instrument.record("episode", episode=episode + 1, length=steps)
+        if instrument is not None:
+            instrument.count(backups=self.backups)
+        return self.transitions
+
+    def plan(self, visited, tolerance=1e-6, iterations=1000):
+        """
+        Runs value iteration on the learned model over the visited states.
+
+        Args:
+            visited (numpy.ndarray): Boolean mask of the states with counts, shape (h * w,).
+            tolerance (float, optional): Stop once the residual is below this value
+                (default is 1e-6).
+            iterations (int, optional): Maximum number of sweeps (default is 1000).
+        """
+        states = np.flatnonzero(visited)
+        value = self.value.reshape(-1)
         for _ in range(iterations):
-            new_value = np.copy(self.value)
-            for y in range(self.h):
-                for x in range(self.w):
-                    if self.is_terminal(x, y) or self.grid[y, x] is None:
-                        continue
-                    max_val = float("-inf")
-                    best_action = None
-                    for action in self.actions:
-                        val = self.expected_value(x, y, action)
-                        if val > max_val:
-                            max_val = val
-                            best_action = action
-                    new_value[y, x] = self.grid[y, x] + self.discount * max_val
-                    self.policy[y, x] = best_action
-            self.value = new_value
+            new, best = self.model_backup(states)
+            residual = np.abs(new - value[states]).max(initial=0)
+            value[states] = new
+            self.backups += len(states)
+            if residual < tolerance:
+                break
+        self.policy.reshape(-1)[states] = np.array(self.actions)[best]
+
+    @staticmethod
+    def _outcome(x, y, nx, ny):
+        if ny > y:
+            return 1
+        if ny < y:
+            return 2
+        if nx < x:
+            return 3
+        if nx > x:
+            return 4
+        return 0
 
     def get_policy(self):
         """
@@ -144,21 +894,11 @@ class GridWorldBased:
 
 def main():
     """
-    Main function to run the grid world instances from file and perform value iteration.
+    Main function to run the grid world instances from the instance store and perform value iteration.
     """
-    with open("data/tests/instances.txt", "r") as file:
-        data = file.readlines()
-
-    for i in range(10):
-        W = int(data[1].split("=")[1])
-        H = int(data[2].split("=")[1])
-        L = ast.literal_eval(data[3].split("=")[1].strip())
-        p = float(data[4].split("=")[1])
-        r = float(data[5].split("=")[1])
-
-        # Get next lines
-        data = data[7:]
+    store = InstanceStore("data/tests/instances")
 
+    for i, (W, H, L, p, r) in enumerate(store[:10]):
         # Create GridWorldBased instance
         gridworld = GridWorldBased(W, H, L, p, r)
 
@@ -1,6 +1,10 @@
 import numpy as np
-import random
-import ast
+from itertools import islice
+from scipy import ndimage
+
+from InstanceStore import InstanceStore
+from ReplayBuffer import ReplayBuffer
+from Storage import allocate, flush, load_checkpoint, save_checkpoint
 
 
 class GridWorldFree:
@@ -11,17 +15,36 @@ class GridWorldFree:
         width (int): Width of the grid.
         height (int): Height of the grid.
         terminal_states (dict): Dictionary of terminal states and their rewards.
-        action_prob (float): Probability of choosing the intended action.
+        action_prob (float): Probability of moving in the intended direction; the agent
+            slips to either side with probability (1 - action_prob) / 2 each.
         reward (float): Default reward value for non-terminal states.
         discount_factor (float): Discount factor for future rewards.
         actions (list): List of possible actions ('U', 'D', 'L', 'R').
+        turns (dict): Probability of each slip outcome: -1 (turn left), 0 (intended
+            direction) and +1 (turn right), as in GridWorld.turns.
+        rng (numpy.random.Generator): Random number generator for the environment and agents.
         q_values (numpy.ndarray): Q-values for each state-action pair.
         epsilon (float): Epsilon value for epsilon-greedy action selection.
         learning_rate (float): Learning rate for updating Q-values.
+        transitions (int): Number of environment steps taken by the last training run.
+        stream_state (dict): Generator state at the start of the current block of
+            ``random_stream`` draws.
     """
 
+    MOVES = {"U": (0, 1), "D": (0, -1), "L": (-1, 0), "R": (1, 0)}
+    CLOCKWISE = ["U", "R", "D", "L"]
+
     def __init__(
-        self, width, height, terminal_states, action_prob, reward, discount_factor=0.5
+        self,
+        width,
+        height,
+        terminal_states,
+        action_prob,
+        reward,
+        discount_factor=0.5,
+        seed=None,
+        storage=None,
+        dtype=np.float64,
     ):
         """
         Initializes the grid world environment.
@@ -30,20 +53,40 @@ class GridWorldFree:
             width (int): Width of the grid.
             height (int): Height of the grid.
             terminal_states (list): List of terminal states and their rewards in format [(x, y, reward), ...].
-            action_prob (float): Probability of choosing the intended action.
+            action_prob (float): Probability of moving in the intended direction.
             reward (float): Default reward value for non-terminal states.
             discount_factor (float, optional): Discount factor for future rewards (default is 0.5).
+            seed (int, optional): Seed for the random number generator (default is None).
+            storage (str, optional): Directory in which q_values is kept as a memory-mapped
+                .npy file (default is None, which keeps it in memory).
+            dtype (numpy.dtype, optional): Data type of q_values, e.g. numpy.float32 to
+                halve its size (default is numpy.float64).
         """
         self.width = width
         self.height = height
         self.terminal_states = {(x, y): reward for x, y, reward in terminal_states}
         self.action_prob = action_prob
+        accident = (1 - action_prob) / 2
+        self.turns = {-1: accident, 0: action_prob, +1: accident}
+        self.rng = np.random.default_rng(seed)
         self.reward = reward
         self.discount_factor = discount_factor
         self.actions = ["U", "D", "L", "R"]
-        self.q_values = np.zeros((height, width, len(self.actions)))
+        self.q_values = allocate(
+            (height, width, len(self.actions)), dtype, 0, storage, "q_values"
+        )
         self.epsilon = 0.1
         self.learning_rate = 0.1
+        self.transitions = 0
+        self.stream_state = None
+        self._step_table = None
+        self._start_states = None
+
+    def flush(self):
+        """
+        Writes q_values to its file when it is memory-mapped.
+        """
+        flush(self.q_values)
 
     def is_terminal(self, state):
         """
@@ -59,7 +102,7 @@ class GridWorldFree:
 
     def get_next_state(self, state, action):
         """
-        Computes the next state based on the current state and action.
+        Computes the next state when moving in the given direction without slipping.
 
         Args:
             state (tuple): Current coordinates (x, y) of the state.
@@ -116,104 +159,508 @@ class GridWorldFree:
         Returns:
             str: Selected action ('U', 'D', 'L', 'R').
         """
-        if random.uniform(0, 1) < self.epsilon:
-            return random.choice(self.actions)
+        if self.rng.random() < self.epsilon:
+            return self.actions[self.rng.integers(len(self.actions))]
         else:
             return self.actions[np.argmax(self.q_values[state[1], state[0]])]
 
-    def q_learning(self, episodes=1000):
+    def sample_next_state(self, state, action):
+        """
+        Samples the next state, slipping to either side of the intended direction.
+
+        Args:
+            state (tuple): Current coordinates (x, y) of the state.
+            action (str): Action to take ('U', 'D', 'L', 'R').
+
+        Returns:
+            tuple: Next state coordinates (x, y).
+        """
+        next_states, _, _ = self.step_table()
+        outcome = self.rng.choice(len(self.turns), p=list(self.turns.values()))
+        index = next_states[
+            state[1] * self.width + state[0], self.actions.index(action), outcome
+        ]
+        return int(index % self.width), int(index // self.width)
+
+    def random_stream(self, block=4096, resume=None):
+        """
+        Yields the random draws of one Q-learning step, generated in blocks.
+
+        The generator state at the start of the current block is kept in
+        ``stream_state``, so a checkpoint can regenerate the block later.
+
+        Args:
+            block (int, optional): Number of steps drawn at once (default is 4096).
+            resume (tuple, optional): (generator state, offset) of a block drawn by an
+                earlier stream; the block is regenerated and the stream continues at the
+                given offset, leaving ``rng`` where it is (default is None).
+
+        Yields:
+            tuple: (explore, random_action, outcome) where explore is True with
+            probability epsilon, random_action is a uniform action index and outcome is
+            a slip outcome index into ``turns``.
+        """
+        probs = list(self.turns.values())
+        current, offset = None, 0
+        if resume is not None:
+            current = self.rng.bit_generator.state
+            self.rng.bit_generator.state, offset = resume
+        while True:
+            self.stream_state = self.rng.bit_generator.state
+            explore = (self.rng.random(block) < self.epsilon).tolist()
+            random_action = self.rng.integers(len(self.actions), size=block).tolist()
+            outcome = self.rng.choice(len(probs), size=block, p=probs).tolist()
+            if current is not None:
+                self.rng.bit_generator.state, current = current, None
+            yield from islice(zip(explore, random_action, outcome), offset, None)
+            offset = 0
+
+    def q_learning(
+        self,
+        episodes=1000,
+        replay=None,
+        batch_size=32,
+        replay_updates=1,
+        checkpoint=None,
+        checkpoint_every=1000,
+        instrument=None,
+    ):
         """
         Performs Q-learning to learn optimal Q-values.
 
+        Moves follow the slip dynamics in ``turns`` through the precomputed
+        ``step_table``, and random numbers are drawn in blocks. With a replay buffer,
+        every transition is also stored in it and, after each step, ``replay_updates``
+        minibatches are sampled from it and applied as vectorized TD updates.
+
+        With a checkpoint file, the Q-table, generator states, counters,
+        hyperparameters and replay buffer are saved every ``checkpoint_every``
+        episodes and after the last one; ``resume_q_learning`` continues such a run
+        exactly as if it had never stopped.
+
+        With an instrument, every episode records an "episode" event with its index,
+        length and the transitions so far, and adds to the "episodes" and
+        "transitions" counters (and "replayed" with a replay buffer).
+
         Args:
             episodes (int, optional): Number of episodes to train the agent (default is 1000).
+            replay (ReplayBuffer, optional): Buffer for experience replay (default is None).
+            batch_size (int, optional): Transitions per replayed minibatch (default is 32).
+            replay_updates (int, optional): Minibatches replayed per step (default is 1).
+            checkpoint (str, optional): Path of the checkpoint file (default is None).
+            checkpoint_every (int, optional): Episodes between checkpoints (default is 1000).
+            instrument (Instrument, optional): Receives events and counters (default is None).
+        """
+        self.transitions = 0
+        # Start states come from their own generator, drawn in blocks of episodes
+        starter = np.random.default_rng(int(self.rng.integers(2**63)))
+        self._train(
+            0,
+            episodes,
+            starter.bit_generator.state,
+            None,
+            replay,
+            batch_size,
+            replay_updates,
+            checkpoint,
+            checkpoint_every,
+            instrument,
+        )
+
+    def resume_q_learning(self, checkpoint, replay=None, instrument=None):
         """
-        for episode in range(episodes):
-            state = (
-                random.randint(0, self.width - 1),
-                random.randint(0, self.height - 1),
+        Continues a Q-learning run from a checkpoint written by ``q_learning``.
+
+        The environment must be built with the same grid as the interrupted run. The
+        Q-table, generator, counters and hyperparameters are restored, and the run
+        goes on saving to the same checkpoint file.
+
+        Args:
+            checkpoint (str): Path of the checkpoint file.
+            replay (ReplayBuffer, optional): Buffer to restore the saved replay buffer
+                into (default is None, which creates one when the run used replay).
+            instrument (Instrument, optional): Receives events and counters of the
+                remaining episodes (default is None).
+
+        Returns:
+            ReplayBuffer: The replay buffer of the run, or None if it did not use one.
+        """
+        arrays, settings = load_checkpoint(checkpoint)
+        if settings.get("kind") != "q_learning":
+            raise ValueError(f"{checkpoint} is not a Q-learning checkpoint")
+        if arrays["q_values"].shape != self.q_values.shape:
+            raise ValueError("Checkpoint was written for a grid of a different size")
+        self.q_values[...] = arrays["q_values"]
+        self.epsilon = settings["epsilon"]
+        self.learning_rate = settings["learning_rate"]
+        self.discount_factor = settings["discount_factor"]
+        self.transitions = settings["transitions"]
+        self.rng.bit_generator.state = settings["rng_state"]
+        if settings["replay"] is not None:
+            if replay is None:
+                replay = ReplayBuffer(settings["replay"]["capacity"])
+            replay.set_state(
+                {
+                    name[len("replay_") :]: array
+                    for name, array in arrays.items()
+                    if name.startswith("replay_")
+                },
+                settings["replay"],
             )
-            while self.is_terminal(state):
-                state = (
-                    random.randint(0, self.width - 1),
-                    random.randint(0, self.height - 1),
-                )
+        stream = None
+        if self.transitions % settings["block"]:
+            stream = (settings["stream_state"], self.transitions % settings["block"])
+        self._train(
+            settings["episode"],
+            settings["episodes"],
+            settings["start_state"],
+            stream,
+            replay,
+            settings["batch_size"],
+            settings["replay_updates"],
+            checkpoint,
+            settings["checkpoint_every"],
+            instrument,
+        )
+        return replay
+
+    def _train(
+        self,
+        episode,
+        episodes,
+        start_state,
+        stream,
+        replay,
+        batch_size,
+        replay_updates,
+        checkpoint,
+        checkpoint_every,
+        instrument=None,
+    ):
+        """
+        Runs Q-learning episodes, saving checkpoints along the way.
 
-            while not self.is_terminal(state):
-                action = self.choose_action(state)
-                next_state = self.get_next_state(state, action)
-                reward = self.get_reward(next_state)
+        Args:
+            episode (int): Index of the first episode to run.
+            episodes (int): Total number of episodes of the run.
+            start_state (dict): Generator state from which the block of start states
+                holding the first episode is drawn; later blocks follow from it.
+            stream (tuple): ``resume`` argument of ``random_stream``, or None.
+            replay (ReplayBuffer): Buffer for experience replay, or None.
+            batch_size (int): Transitions per replayed minibatch.
+            replay_updates (int): Minibatches replayed per step.
+            checkpoint (str): Path of the checkpoint file, or None.
+            checkpoint_every (int): Episodes between checkpoints.
+            instrument (Instrument, optional): Receives events and counters (default is None).
+        """
+        next_states, rewards, terminal = self.step_table()
+        q_values = self.q_values.reshape(-1, len(self.actions))
+        starts = self.start_states()
+        block = 4096
+        starter = np.random.default_rng()
+        starter.bit_generator.state = start_state
+        start_states = None
+        draws = self.random_stream(block, stream)
+        if instrument is not None:
+            instrument.begin("episode")
+        for episode in range(episode, episodes):
+            if start_states is None or episode % block == 0:
+                block_state = starter.bit_generator.state
+                start_states = starter.choice(starts, block).tolist()
+            state = start_states[episode % block]
+            transitions = self.transitions
+            while not terminal[state]:
+                explore, random_action, outcome = next(draws)
+                action = random_action if explore else int(q_values[state].argmax())
+                next_state = next_states[state, action, outcome]
 
-                best_next_action = np.argmax(
-                    self.q_values[next_state[1], next_state[0]]
-                )
                 td_target = (
-                    reward
-                    + self.discount_factor
-                    * self.q_values[next_state[1], next_state[0], best_next_action]
+                    rewards[next_state]
+                    + self.discount_factor * q_values[next_state].max()
                 )
-                td_error = (
-                    td_target
-                    - self.q_values[state[1], state[0], self.actions.index(action)]
+                td_error = td_target - q_values[state, action]
+                q_values[state, action] += self.learning_rate * td_error
+
+                if replay is not None:
+                    replay.add(
+                        state,
+                        action,
+                        rewards[next_state],
+                        next_state,
+                        terminal[next_state],
+                    )
+                    for _ in range(replay_updates):
+                        self.replay_minibatch(replay, batch_size)
+
+                self.transitions += 1
+                state = next_state
+
+            done = episode + 1
+            if instrument is not None:
+                length = self.transitions - transitions
+                instrument.count(episodes=1, transitions=length)
+                if replay is not None:
+                    instrument.count(replayed=length * replay_updates * batch_size)
+                instrument.record(
+                    "episode",
+                    episode=done,
+                    length=length,
+                    transitions=self.transitions,
                 )
-                self.q_values[state[1], state[0], self.actions.index(action)] += (
-                    self.learning_rate * td_error
+            if checkpoint is not None and (
+                done % checkpoint_every == 0 or done == episodes
+            ):
+                arrays = {"q_values": self.q_values}
+                replay_settings = None
+                if replay is not None:
+                    replay_arrays, replay_settings = replay.get_state()
+                    for name, array in replay_arrays.items():
+                        arrays[f"replay_{name}"] = array
+                save_checkpoint(
+                    checkpoint,
+                    arrays,
+                    {
+                        "kind": "q_learning",
+                        "episode": done,
+                        "episodes": episodes,
+                        "transitions": self.transitions,
+                        # State of the block of start states holding the next episode
+                        "start_state": (
+                            starter.bit_generator.state
+                            if done % block == 0
+                            else block_state
+                        ),
+                        "rng_state": self.rng.bit_generator.state,
+                        "stream_state": self.stream_state,
+                        "block": block,
+                        "epsilon": self.epsilon,
+                        "learning_rate": self.learning_rate,
+                        "discount_factor": self.discount_factor,
+                        "batch_size": batch_size,
+                        "replay_updates": replay_updates,
+                        "checkpoint_every": checkpoint_every,
+                        "replay": replay_settings,
+                    },
                 )
 
-                state = next_state
+    def replay_minibatch(self, replay, batch_size=32):
+        """
+        Samples a minibatch from a replay buffer and applies its TD updates.
+
+        Args:
+            replay (ReplayBuffer): Buffer to sample from.
+            batch_size (int, optional): Number of transitions to sample (default is 32).
+        """
+        q_values = self.q_values.reshape(-1, len(self.actions))
+        indices, states, actions, rewards, next_states, dones, weights = replay.sample(
+            batch_size, self.rng
+        )
+        td_error = (
+            rewards
+            + self.discount_factor * q_values[next_states].max(axis=1) * ~dones
+            - q_values[states, actions]
+        )
+        self.apply_td_errors(states, actions, weights * td_error)
+        if replay.prioritized:
+            replay.update_priorities(indices, td_error)
+
+    def apply_td_errors(self, states, actions, td_errors):
+        """
+        Applies a batch of TD updates to ``q_values``.
+
+        Updates that hit the same state-action pair are averaged, so a batch never
+        moves a Q-value further than a single update would.
+
+        Args:
+            states (numpy.ndarray): Flat state indices.
+            actions (numpy.ndarray): Action indices.
+            td_errors (numpy.ndarray): TD errors to apply.
+        """
+        keys, inverse, counts = np.unique(
+            states * len(self.actions) + actions,
+            return_inverse=True,
+            return_counts=True,
+        )
+        mean_error = np.bincount(inverse, weights=td_errors) / counts
+        self.q_values.reshape(-1)[keys] += self.learning_rate * mean_error
+
+    def step_table(self):
+        """
+        Builds the flat-index transition table used by the learners.
+
+        States are numbered ``y * width + x``, matching a (height * width, actions)
+        view of ``q_values``. Each (state, action, outcome) entry is the state reached
+        when the move in the intended direction turned by the outcome's turn in
+        ``turns``, following the rules of ``get_next_state``. The table is built once.
+
+        Returns:
+            tuple: (next_states, rewards, terminal) where next_states has shape (S, A, K),
+            rewards holds the reward for arriving in each state and terminal marks
+            terminal states and walls.
+        """
+        if self._step_table is None:
+            size = self.width * self.height
+            x = np.arange(size) % self.width
+            y = np.arange(size) // self.width
+            rewards = np.full(size, self.reward, dtype=float)
+            terminal = np.zeros(size, dtype=bool)
+            wall = np.zeros(size, dtype=bool)
+            for (tx, ty), reward in self.terminal_states.items():
+                rewards[ty * self.width + tx] = reward
+                terminal[ty * self.width + tx] = True
+                wall[ty * self.width + tx] = reward == 0
+
+            next_states = np.empty(
+                (size, len(self.actions), len(self.turns)), dtype=np.int64
+            )
+            clockwise = GridWorldFree.CLOCKWISE
+            for a, action in enumerate(self.actions):
+                for k, turn in enumerate(self.turns):
+                    direction = clockwise[(clockwise.index(action) + turn) % 4]
+                    dx, dy = GridWorldFree.MOVES[direction]
+                    nx, ny = x + dx, y + dy
+                    inside = (
+                        (0 <= nx) & (nx < self.width) & (0 <= ny) & (ny < self.height)
+                    )
+                    landing = np.where(inside, ny * self.width + nx, np.arange(size))
+                    blocked = wall[landing] | terminal
+                    next_states[:, a, k] = np.where(blocked, np.arange(size), landing)
+            self._step_table = (next_states, rewards, terminal)
+        return self._step_table
+
+    def start_states(self):
+        """
+        Returns the states episodes can start from.
+
+        These are the non-terminal states that share a connected region of open
+        cells with a terminal state. Moves and slips never leave such a region, so an
+        episode started in a region without a terminal state would never end.
+
+        Returns:
+            numpy.ndarray: Flat indices of the start states, as in ``step_table``.
+
+        Raises:
+            ValueError: If no state can reach a terminal state.
+        """
+        if self._start_states is None:
+            _, rewards, terminal = self.step_table()
+            shape = (self.height, self.width)
+            wall = (terminal & (rewards == 0)).reshape(shape)
+            regions, _ = ndimage.label(~wall)
+            exits = np.unique(regions[terminal.reshape(shape) & ~wall])
+            reachable = np.isin(regions, exits).reshape(-1)
+            self._start_states = np.flatnonzero(reachable & ~terminal)
+            if not self._start_states.size:
+                raise ValueError("No state can reach a terminal state")
+        return self._start_states
+
+    def q_learning_vectorized(self, episodes=1000, agents=64, shared=True):
+        """
+        Performs Q-learning with many independent agents stepping in lock-step.
+
+        Every step selects epsilon-greedy actions, moves all agents and applies their TD
+        updates as array operations. An agent that reaches a terminal state counts one
+        finished episode and restarts from a random state of ``start_states``; training
+        stops once ``episodes`` episodes have finished in total.
+
+        With a shared table all agents update ``q_values``; agents that update the same
+        state-action pair in the same step apply the mean of their TD errors. Otherwise
+        each agent learns its own table, kept in ``agent_q_values``, and their mean is
+        written into ``q_values``.
+
+        Args:
+            episodes (int, optional): Number of episodes to finish across all agents
+                (default is 1000).
+            agents (int, optional): Number of agents stepping together (default is 64).
+            shared (bool, optional): Whether the agents share one Q-table (default is True).
+
+        Returns:
+            int: Number of transitions taken.
+        """
+        rng = self.rng
+        next_states, rewards, terminal = self.step_table()
+        probs = list(self.turns.values())
+        starts = self.start_states()
+        actions = len(self.actions)
+        agent = np.arange(agents)
+
+        if shared:
+            q_values = self.q_values.reshape(-1, actions)
+        else:
+            q_values = np.repeat(self.q_values.reshape(1, -1, actions), agents, axis=0)
+
+        self.transitions = 0
+        finished = 0
+        state = rng.choice(starts, agents)
+        while finished < episodes:
+            q_state = q_values[state] if shared else q_values[agent, state]
+            action = np.where(
+                rng.random(agents) < self.epsilon,
+                rng.integers(actions, size=agents),
+                q_state.argmax(axis=1),
+            )
+            outcome = rng.choice(len(probs), size=agents, p=probs)
+            next_state = next_states[state, action, outcome]
+            q_next = q_values[next_state] if shared else q_values[agent, next_state]
+            td_error = (
+                rewards[next_state]
+                + self.discount_factor * q_next.max(axis=1)
+                - q_state[agent, action]
+            )
+            if shared:
+                self.apply_td_errors(state, action, td_error)
+            else:
+                q_values[agent, state, action] += self.learning_rate * td_error
+
+            self.transitions += agents
+            done = terminal[next_state]
+            finished += int(done.sum())
+            state = np.where(done, rng.choice(starts, agents), next_state)
+
+        if not shared:
+            self.agent_q_values = q_values.reshape((agents,) + self.q_values.shape)
+            self.q_values[...] = self.agent_q_values.mean(axis=0)
+        return self.transitions
 
     def extract_policy(self):
         """
         Extracts the optimal policy based on learned Q-values.
 
         Returns:
-            numpy.ndarray: Policy grid with optimal actions for each state.
-        """
-        policy = np.empty((self.height, self.width), dtype=str)
-        for y in range(self.height):
-            for x in range(self.width):
-                state = (x, y)
-                if self.is_terminal(state):
-                    policy[y, x] = "T" if self.terminal_states[state] != 0 else "W"
-                else:
-                    best_action = np.argmax(self.q_values[y, x])
-                    policy[y, x] = self.actions[best_action]
-        return policy
+            numpy.ndarray: Policy grid with optimal actions for each state, "T" for
+            terminal states and "W" for walls.
+        """
+        _, rewards, terminal = self.step_table()
+        shape = (self.height, self.width)
+        terminal = terminal.reshape(shape)
+        wall = terminal & (rewards.reshape(shape) == 0)
+        policy = np.array(self.actions)[np.argmax(self.q_values, axis=2)]
+        return np.where(terminal, np.where(wall, "W", "T"), policy)
 
     def get_state_values(self):
         """
         Computes the state values based on learned Q-values.
 
         Returns:
-            numpy.ndarray: Grid of state values.
+            numpy.ndarray: Grid of state values; terminal states hold their reward and
+            walls 0.
         """
-        state_values = np.zeros((self.height, self.width))
-        for y in range(self.height):
-            for x in range(self.width):
-                if self.is_terminal((x, y)):
-                    state_values[y, x] = self.terminal_states[(x, y)]
-                else:
-                    state_values[y, x] = np.max(self.q_values[y, x])
-        return state_values
+        _, rewards, terminal = self.step_table()
+        shape = (self.height, self.width)
+        return np.where(
+            terminal.reshape(shape),
+            rewards.reshape(shape),
+            np.max(self.q_values, axis=2),
+        )
 
 
 def main():
     """
-    Main function to run the grid world instances from file and perform Q-learning.
+    Main function to run the grid world instances from the instance store and perform Q-learning.
     """
-    with open("data/tests/instances.txt", "r") as file:
-        data = file.readlines()
-
-    for i in range(10):
-        W = int(data[1].split("=")[1])
-        H = int(data[2].split("=")[1])
-        L = ast.literal_eval(data[3].split("=")[1].strip())
-        p = float(data[4].split("=")[1])
-        r = float(data[5].split("=")[1])
-
-        # get next lines
-        data = data[7:]
+    store = InstanceStore("data/tests/instances")
 
+    for i, (W, H, L, p, r) in enumerate(store[:10]):
         # Create gridworld instance
         gridworld = GridWorldFree(W, H, L, p, r)
 
@@ -0,0 +1,119 @@
+import numpy as np
+from scipy.sparse import identity
+from scipy.sparse.linalg import spsolve
+
+from CompiledGridWorld import StateValues
+from GridWorld import GridWorld
+
+
+class PolicyIteration:
+    """
+    Policy Iteration algorithm for solving GridWorld Markov Decision Processes (MDPs).
+
+    Works on the compiled form of a GridWorld (see ``GridWorld.compile``) and returns
+    values and policies in the formats used by ``ValueIteration`` and
+    ``GridWorld.printValues``/``GridWorld.printPolicy``.
+
+    Attributes:
+        iterations (int): Number of policy improvement steps of the last run.
+        sweeps (int): Number of evaluation sweeps of the last run (modified mode only).
+        residual (float): Bellman residual max|TV - V| of the returned values.
+    """
+
+    def __init__(self):
+        """
+        Initializes the solver with empty convergence statistics.
+        """
+        self.iterations = 0
+        self.sweeps = 0
+        self.residual = None
+
+    def evaluatePolicy(self, compiled, actions, discount):
+        """
+        Computes the exact values of a policy with a sparse linear solve.
+
+        Solves (I - discount * P_pi) V = R over the grid cells, where terminal and wall
+        rows only keep their own reward (zero for walls). With a discount of 1 the
+        system is only solvable if the policy reaches a terminal state from everywhere.
+
+        Args:
+            compiled (CompiledGridWorld): The compiled grid environment.
+            actions (numpy.ndarray): Action index per cell, shape (S,).
+            discount (float): Discount factor for future rewards.
+
+        Returns:
+            numpy.ndarray: Values of the policy, shape (S + 1,).
+        """
+        states = compiled.gameover
+        rows = np.arange(states) * len(compiled.turnDirections) + actions
+        # Terminal and wall rows only move to GAMEOVER, whose column is dropped
+        transitions = compiled.transitionMatrix()[rows, :states]
+        system = identity(states, format="csr") - discount * transitions
+        values = compiled.zeros()
+        values[:-1] = np.atleast_1d(spsolve(system.tocsc(), compiled.rewards))
+        return values
+
+    def policyIteration(
+        self, mdp, discount, iterations=100, evaluationSweeps=None, tolerance=1e-9
+    ):
+        """
+        Performs policy iteration to compute the optimal values and policy.
+
+        Each iteration evaluates the current policy and then makes it greedy with
+        respect to the resulting values; an action only changes when another one is
+        strictly better. With ``evaluationSweeps`` set, the exact linear solve is
+        replaced by that many applications of the policy's Bellman operator
+        (modified policy iteration).
+
+        Args:
+            mdp (GridWorld): The grid environment.
+            discount (float): Discount factor for future rewards.
+            iterations (int, optional): Maximum number of improvement steps (default is 100).
+            evaluationSweeps (int, optional): Evaluation sweeps per iteration for modified
+                policy iteration (default is None, which evaluates exactly).
+            tolerance (float, optional): In modified mode, stop once the policy is stable
+                and the Bellman residual is below this value (default is 1e-9).
+
+        Returns:
+            tuple: (values, policy) where values is a StateValues view mapping states to
+            values and policy is a dict mapping states to their actions.
+        """
+        if not isinstance(mdp, GridWorld):
+            raise TypeError("PolicyIteration requires a GridWorld")
+        self.iterations = 0
+        self.sweeps = 0
+        compiled = mdp.compile()
+        rows = np.arange(compiled.gameover)
+        actions = np.zeros(compiled.gameover, dtype=int)
+        values = compiled.zeros()
+        for _ in range(iterations):
+            if evaluationSweeps is None:
+                values = self.evaluatePolicy(compiled, actions, discount)
+            else:
+                for _ in range(evaluationSweeps):
+                    q_values = compiled.qValues(values, discount)
+                    values[:-1] = np.where(
+                        compiled.absorbing,
+                        compiled.rewards + discount * values[compiled.gameover],
+                        q_values[rows, actions],
+                    )
+                    self.sweeps += 1
+            q_values = compiled.qValues(values, discount)
+            best = q_values.argmax(axis=1)
+            stable = q_values[rows, actions] >= q_values[rows, best]
+            stable |= compiled.absorbing
+            self.iterations += 1
+            greedy = compiled.backup(values, discount)
+            self.residual = float(np.abs(greedy - values).max())
+            if stable.all() and (evaluationSweeps is None or self.residual < tolerance):
+                break
+            actions = np.where(stable, actions, best)
+
+        states = compiled.stateIndices
+        terminal = compiled.terminal[states].tolist()
+        chosen = actions[states].tolist()
+        policy = {
+            state: GridWorld.EXIT if terminal[i] else GridWorld.DIRCS[chosen[i]]
+            for i, state in enumerate(compiled.states)
+        }
+        return StateValues(compiled, values), policy
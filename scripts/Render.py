@@ -0,0 +1,85 @@
+import sys
+
+import numpy as np
+
+VALUE_CELL = "   %+.2f   |"
+VALUE_DIVIDER = "----------- "
+SYMBOL_CELL = "   %s   |"
+SYMBOL_DIVIDER = "------- "
+
+
+def crop(grid, window=None, step=1, reduce="mean"):
+    """
+    Selects the part of a grid to render.
+
+    Args:
+        grid (numpy.ndarray): Grid of shape (rows, columns).
+        window (tuple, optional): Pair of slices selecting rows and columns, e.g.
+            ``numpy.s_[:20, 100:140]`` (default is None, which keeps the whole grid).
+        step (int, optional): Side of the square blocks that are summarized as one
+            cell (default is 1, which keeps every cell).
+        reduce (str, optional): "mean" averages the finite entries of each block (0
+            if there are none), "first" keeps its top-left entry (default is "mean").
+
+    Returns:
+        numpy.ndarray: The selected, possibly downsampled, grid.
+    """
+    if window is not None:
+        grid = grid[window]
+    if step == 1:
+        return grid
+    if reduce == "first":
+        return grid[::step, ::step]
+    if reduce != "mean":
+        raise ValueError(f"Unknown reduction: {reduce}")
+    rows, cols = grid.shape
+    padded = np.full((-(-rows // step) * step, -(-cols // step) * step), np.nan)
+    padded[:rows, :cols] = grid
+    blocks = padded.reshape(padded.shape[0] // step, step, -1, step)
+    finite = np.isfinite(blocks)
+    total = np.where(finite, blocks, 0).sum(axis=(1, 3))
+    count = finite.sum(axis=(1, 3))
+    return np.divide(total, count, out=np.zeros_like(total), where=count > 0)
+
+
+def write_values(grid, stream=None):
+    """
+    Writes a grid of values as a table, one formatted row at a time.
+
+    Args:
+        grid (numpy.ndarray): Values of shape (rows, columns).
+        stream (file, optional): Text stream to write to (default is None, which
+            writes to sys.stdout).
+    """
+    stream = sys.stdout if stream is None else stream
+    row_format = VALUE_CELL * grid.shape[1]
+    divide = "\n" + VALUE_DIVIDER * grid.shape[1] + "\n"
+    for row in grid.tolist():
+        stream.write(row_format % tuple(row) + divide)
+    stream.write("\n")
+
+
+def write_symbols(grid, stream=None):
+    """
+    Writes a grid of one-character symbols as a table.
+
+    Rows are assembled in a preallocated byte buffer, so the cost per cell is a
+    single array copy.
+
+    Args:
+        grid (numpy.ndarray): Single-character strings of shape (rows, columns).
+        stream (file, optional): Text stream to write to (default is None, which
+            writes to sys.stdout).
+    """
+    stream = sys.stdout if stream is None else stream
+    rows, cols = grid.shape
+    cell = (SYMBOL_CELL % " ").encode()
+    center = SYMBOL_CELL.index("%s")
+    buffer = np.frombuffer(cell * cols, dtype=np.uint8).reshape(cols, -1).copy()
+    # A "U1" entry is one UCS-4 code point, which is the ASCII code of the symbol
+    symbols = np.asarray(grid, dtype="U1").view(np.uint32).astype(np.uint8)
+    divide = "\n" + SYMBOL_DIVIDER * cols + "\n"
+    for row in symbols:
+        buffer[:, center] = row
+        stream.write(buffer.tobytes().decode() + divide)
+    stream.write("\n")
@@ -0,0 +1,221 @@
+import numpy as np
+
+
+class ReplayBuffer:
+    """
+    Fixed-capacity ring buffer of transitions for experience replay.
+
+    Transitions are stored in preallocated NumPy arrays, using the flat state indices
+    of ``GridWorldFree.step_table``. Once the buffer is full the oldest transitions
+    are overwritten.
+
+    Prioritized sampling reads a sum tree over ``priorities ** alpha``: leaf i of a
+    complete binary tree holds the scaled priority of transition i and every inner
+    node the sum of its two children. Drawing a transition walks from the root to a
+    leaf and changing a priority updates the nodes above its leaf, so both take
+    O(log capacity) time instead of a pass over the whole buffer.
+
+    Attributes:
+        capacity (int): Maximum number of stored transitions.
+        size (int): Number of transitions currently stored.
+        prioritized (bool): Whether sampling is proportional to priority.
+        alpha (float): Priority exponent for prioritized sampling.
+        beta (float): Importance-sampling exponent for prioritized sampling.
+        states (numpy.ndarray): State index of each transition.
+        actions (numpy.ndarray): Action index of each transition.
+        rewards (numpy.ndarray): Reward of each transition.
+        next_states (numpy.ndarray): Next state index of each transition.
+        dones (numpy.ndarray): Whether each transition ended the episode.
+        priorities (numpy.ndarray): Sampling priority of each transition.
+    """
+
+    def __init__(self, capacity, prioritized=False, alpha=0.6, beta=0.4):
+        """
+        Initializes an empty replay buffer.
+
+        Args:
+            capacity (int): Maximum number of stored transitions.
+            prioritized (bool, optional): Sample proportionally to |TD error|^alpha
+                instead of uniformly (default is False).
+            alpha (float, optional): Priority exponent (default is 0.6).
+            beta (float, optional): Importance-sampling exponent (default is 0.4).
+        """
+        self.capacity = capacity
+        self.size = 0
+        self.prioritized = prioritized
+        self.alpha = alpha
+        self.beta = beta
+        self.states = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity)
+        self.next_states = np.zeros(capacity, dtype=np.int64)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.priorities = np.zeros(capacity)
+        self._next = 0
+        self._max_priority = 1.0
+        self._build_tree()
+
+    def _build_tree(self):
+        """
+        Rebuilds the sum tree from ``priorities``.
+        """
+        self._leaves = 1 << max(self.capacity - 1, 0).bit_length()
+        self._tree = np.zeros(2 * self._leaves)
+        if self.prioritized:
+            leaves = self._tree[self._leaves :]
+            leaves[: self.size] = self.priorities[: self.size] ** self.alpha
+            for level in range(self._leaves.bit_length() - 1, 0, -1):
+                nodes = np.arange(1 << (level - 1), 1 << level)
+                self._tree[nodes] = self._tree[2 * nodes] + self._tree[2 * nodes + 1]
+
+    def _update_tree(self, indices):
+        """
+        Copies the scaled priorities of some transitions into the sum tree.
+
+        Args:
+            indices (numpy.ndarray): Buffer indices whose priority changed.
+        """
+        nodes = np.unique(np.asarray(indices, dtype=np.int64)) + self._leaves
+        self._tree[nodes] = self.priorities[nodes - self._leaves] ** self.alpha
+        for _ in range(self._leaves.bit_length() - 1):
+            nodes = np.unique(nodes // 2)
+            self._tree[nodes] = self._tree[2 * nodes] + self._tree[2 * nodes + 1]
+
+    def __len__(self):
+        """
+        Returns the number of stored transitions.
+
+        Returns:
+            int: Number of stored transitions.
+        """
+        return self.size
+
+    def add(self, state, action, reward, next_state, done):
+        """
+        Stores one transition, overwriting the oldest one when full.
+
+        New transitions get the largest priority seen so far, so they are replayed at
+        least once soon.
+
+        Args:
+            state (int): State index.
+            action (int): Action index.
+            reward (float): Reward received.
+            next_state (int): Next state index.
+            done (bool): Whether the transition ended the episode.
+        """
+        i = self._next
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.dones[i] = done
+        self.priorities[i] = self._max_priority
+        self._next = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        if self.prioritized:
+            node = i + self._leaves
+            self._tree[node] = self._max_priority**self.alpha
+            while node > 1:
+                node //= 2
+                self._tree[node] = self._tree[2 * node] + self._tree[2 * node + 1]
+
+    def sample(self, batch_size, rng):
+        """
+        Samples a minibatch of stored transitions.
+
+        Args:
+            batch_size (int): Number of transitions to sample.
+            rng (numpy.random.Generator): Random number generator.
+
+        Returns:
+            tuple: (indices, states, actions, rewards, next_states, dones, weights) where
+            weights are the normalized importance-sampling weights (all ones when
+            sampling uniformly).
+        """
+        if not self.prioritized:
+            indices = rng.integers(self.size, size=batch_size)
+            weights = np.ones(batch_size)
+        else:
+            total = self._tree[1]
+            draws = rng.random(batch_size) * total
+            nodes = np.ones(batch_size, dtype=np.int64)
+            # Descend to the leaf whose prefix sums enclose each draw
+            for _ in range(self._leaves.bit_length() - 1):
+                left = self._tree[2 * nodes]
+                right = draws >= left
+                draws -= np.where(right, left, 0.0)
+                nodes = 2 * nodes + right
+            indices = np.minimum(nodes - self._leaves, self.size - 1)
+            scaled = self._tree[indices + self._leaves]
+            weights = (self.size * scaled / total) ** -self.beta
+            weights /= weights.max()
+        return (
+            indices,
+            self.states[indices],
+            self.actions[indices],
+            self.rewards[indices],
+            self.next_states[indices],
+            self.dones[indices],
+            weights,
+        )
+
+    def update_priorities(self, indices, td_errors, epsilon=1e-6):
+        """
+        Sets the priorities of sampled transitions from their latest TD errors.
+
+        Args:
+            indices (numpy.ndarray): Buffer indices returned by ``sample``.
+            td_errors (numpy.ndarray): TD errors of the sampled transitions.
+            epsilon (float, optional): Floor that keeps every transition sampleable
+                (default is 1e-6).
+        """
+        self.priorities[indices] = np.abs(td_errors) + epsilon
+        self._max_priority = max(self._max_priority, self.priorities[indices].max())
+        self._update_tree(indices)
+
+    def get_state(self):
+        """
+        Returns the contents of the buffer for checkpointing.
+
+        Returns:
+            tuple: (arrays, settings) where arrays holds the stored transitions and
+            settings the JSON-serializable parameters and counters.
+        """
+        arrays = {
+            "states": self.states,
+            "actions": self.actions,
+            "rewards": self.rewards,
+            "next_states": self.next_states,
+            "dones": self.dones,
+            "priorities": self.priorities,
+        }
+        settings = {
+            "capacity": self.capacity,
+            "size": self.size,
+            "prioritized": self.prioritized,
+            "alpha": self.alpha,
+            "beta": self.beta,
+            "next": self._next,
+            "max_priority": float(self._max_priority),
+        }
+        return arrays, settings
+
+    def set_state(self, arrays, settings):
+        """
+        Restores contents saved by ``get_state``.
+
+        Args:
+            arrays (dict): Stored transitions, as returned by ``get_state``.
+            settings (dict): Parameters and counters, as returned by ``get_state``.
+        """
+        self.capacity = settings["capacity"]
+        self.size = settings["size"]
+        self.prioritized = settings["prioritized"]
+        self.alpha = settings["alpha"]
+        self.beta = settings["beta"]
+        self._next = settings["next"]
+        self._max_priority = settings["max_priority"]
+        for name, array in arrays.items():
+            setattr(self, name, array.copy())
+        self._build_tree()
@@ -1,54 +1,75 @@
-import ast
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
 import numpy as np
-import pandas as pd
 
 from GridWorld import GridWorldAdditive
+from InstanceStore import InstanceStore, read_text
 from ValueIteration import ValueIteration
 from ModelFree import GridWorldFree
 from ModelBased import GridWorldBased
+from ResultsWriter import ResultsWriter
+from SolutionCache import SolutionCache
 
 discount = 0.5
+tolerance = 1e-9
+episodes = 10000
 
 
-def main():
+def read_instances(filename="data/tests/instances"):
     """
-    Main function to run experiments on different Markov Decision Process (MDP) models.
-
-    Reads instances from a file, computes values using Value Iteration, Model-Based RL, and Model-Free RL,
-    and calculates differences between their state values.
+    Reads grid world instances from an instance store or a text file of 7-line blocks.
 
-    Outputs average differences and differences per cell to a CSV file.
+    Args:
+        filename (str, optional): Directory of an InstanceStore, or path of a text
+            instances file (default is "data/tests/instances").
 
-    Example:
-        To run:
-        python Results.py
+    Returns:
+        Sequence: Instances as (W, H, L, p, r) tuples; an InstanceStore for a store,
+        which loads instances lazily.
     """
+    if os.path.isdir(filename):
+        return InstanceStore(filename)
+    return read_text(filename)[0]
 
-    # Open the instances file
-    with open("data/tests/instances.txt", "r") as file:
-        data = file.readlines()
-
-    # Lists to store average differences and differences per cell
-    average_differences = []
-    cells_difference = []
-
-    # Iterate over each instance in the file
-    for i in range(10):
-        # Parse parameters for the current instance
-        W = int(data[1].split("=")[1])
-        H = int(data[2].split("=")[1])
-        L = ast.literal_eval(data[3].split("=")[1].strip())
-        p = float(data[4].split("=")[1])
-        r = float(data[5].split("=")[1])
-
-        # Move to the next set of parameters
-        data = data[7:]
-
-        print(f"---------------------- instance={i + 1} ----------------------")
-        print(f"W={W} | H={H} | p={p} | r={r} | L={L}\n")
-
-        # Value Iteration ----------------------------------------------------
 
+def run_job(job, cache=None, warm_start=False):
+    """
+    Computes the state values of one instance with one algorithm.
+
+    With a cache, value iteration and model-based RL solutions are looked up before
+    solving and stored after. With warm_start, a miss starts from the cached solution
+    of the same layout with the closest reward. Which solutions are cached depends on
+    the order jobs finish in, so warm-started values are not reproducible bit for bit
+    across runs or worker counts. Cold and warm-started values are both within
+    ``tolerance * discount / (1 - discount)`` of the exact values in every state.
+
+    Args:
+        job (tuple): (index, algorithm, seed, instance) where algorithm is "MDP", "MBRL"
+            or "MFRL" and instance is a (W, H, L, p, r) tuple.
+        cache (str, optional): Directory of a SolutionCache (default is None).
+        warm_start (bool, optional): Whether to warm-start from the nearest cached
+            solution (default is False).
+
+    Returns:
+        tuple: (index, algorithm, seed, values) with values as an (H, W) array in the
+        orientation of GridWorldBased.value.
+    """
+    index, algorithm, seed, instance = job
+    W, H, L, p, r = instance
+
+    warm = None
+    if cache is not None and algorithm != "MFRL":
+        cache = SolutionCache(cache)
+        cached = cache.get(instance, discount, algorithm, tolerance)
+        if cached is not None:
+            return index, algorithm, seed, cached["values"]
+        if warm_start:
+            warm = cache.nearest(instance, discount, algorithm, tolerance)
+
+    if algorithm == "MDP":
         # Extract terminal states and walls for GridWorldAdditive
         terminals = {(-i[1] + (H - 1), i[0]): i[2] for i in L if i[2] != 0}
         walls = [(-i[1] + (H - 1), i[0]) for i in L if i[2] == 0]
@@ -56,58 +77,139 @@ def main():
         # Initialize GridWorldAdditive and perform value iteration
         gwa = GridWorldAdditive((H, W), p, walls, terminals, r)
         vi = ValueIteration()
-        values_MDP = np.zeros((H, W))
-        temp = vi.valueIteration(gwa, discount, 100)
+        values = np.zeros((H, W))
+        temp = vi.valueIteration(
+            gwa,
+            discount,
+            100,
+            tolerance=tolerance,
+            initial=None if warm is None else warm["values"][::-1],
+        )
         for x in range(H):
             for y in range(W):
-                values_MDP[-x + (H - 1)][y] = temp[(x, y)]
-
-        # Model Based ------------------------------------------------------
-
+                values[-x + (H - 1)][y] = temp[(x, y)]
+    elif algorithm == "MBRL":
         # Initialize GridWorldBased and perform value iteration
         gridworld_b = GridWorldBased(W, H, L, p, r)
-        gridworld_b.value_iteration()
-        values_MBRL = gridworld_b.value
-
-        # Model Free ---------------------------------------------------------
+        if warm is not None:
+            live = gridworld_b.grid == r
+            gridworld_b.value[live] = warm["values"][live]
+        gridworld_b.value_iteration(tolerance=tolerance)
+        values = gridworld_b.value
+    elif algorithm == "MFRL":
+        # Initialize a seeded GridWorldFree and perform Q-learning
+        gridworld = GridWorldFree(W, H, L, p, r, seed=seed)
+        gridworld.q_learning(episodes=episodes)
+        values = gridworld.get_state_values()
+    else:
+        raise ValueError(f"Unknown algorithm: {algorithm}")
+    if cache is not None and algorithm != "MFRL":
+        cache.put(instance, discount, algorithm, tolerance, values)
+    return index, algorithm, seed, values
+
+
+def run_experiments(instances, workers=None, seeds=(0,), cache=None, warm_start=False):
+    """
+    Runs every (instance, algorithm, seed) job, optionally on a process pool.
+
+    Value iteration and model-based RL are deterministic and run once per instance;
+    Q-learning runs once per seed and its state values are averaged over the seeds.
+
+    Args:
+        instances (list): List of (W, H, L, p, r) tuples.
+        workers (int, optional): Number of worker processes; None uses all cores and 1
+            runs the jobs in this process (default is None).
+        seeds (sequence, optional): Random seeds for the Q-learning runs (default is (0,)).
+        cache (str, optional): Directory of a SolutionCache (default is None).
+        warm_start (bool, optional): Whether value iteration and model-based RL
+            warm-start from the nearest cached solution, which makes their values
+            nondeterministic within the tolerance (see ``run_job``, default is False).
+
+    Returns:
+        list: For each instance in order, a dict mapping "MDP", "MBRL" and "MFRL" to
+        their (H, W) state values.
+    """
+    jobs = []
+    for index, instance in enumerate(instances):
+        jobs.append((index, "MDP", None, instance))
+        jobs.append((index, "MBRL", None, instance))
+        jobs.extend((index, "MFRL", seed, instance) for seed in seeds)
+
+    job = partial(run_job, cache=cache, warm_start=warm_start)
+    if workers == 1:
+        outputs = list(map(job, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            outputs = list(executor.map(job, jobs))
+
+    # executor.map yields in submission order, so the merge is deterministic
+    results = [{"MFRL": []} for _ in instances]
+    for index, algorithm, seed, values in outputs:
+        if algorithm == "MFRL":
+            results[index]["MFRL"].append(values)
+        else:
+            results[index][algorithm] = values
+    for result in results:
+        result["MFRL"] = np.mean(result["MFRL"], axis=0)
+    return results
+
+
+def main(argv=None):
+    """
+    Main function to run experiments on different Markov Decision Process (MDP) models.
 
-        # Initialize GridWorldFree and perform Q-learning
-        gridworld = GridWorldFree(W, H, L, p, r)
-        gridworld.q_learning(episodes=10000)
-        values_MFRL = gridworld.get_state_values()
+    Reads instances from a file, computes values using Value Iteration, Model-Based RL, and Model-Free RL,
+    and calculates differences between their state values. The independent runs are spread
+    over a pool of worker processes.
 
-        # Compute and print average differences
-        diff_mdp_mbrl = (values_MDP - values_MBRL).mean()
-        diff_mdp_mfrl = (values_MDP - values_MFRL).mean()
-        diff_mbrl_mfrl = (values_MBRL - values_MFRL).mean()
+    Outputs average differences, and streams the differences per cell of each instance
+    in long format (instance, x, y, pair, diff) to a CSV file, or to a directory of npz
+    files for any other output path, as soon as the instance is done (see ResultsWriter).
+    The default output is data/results/long_results.csv, which leaves the wide-format
+    data/results/results.csv of the original experiments untouched.
 
-        print(f"average(d(MDP, MBRL))= {diff_mdp_mbrl}")
-        print(f"average(d(MDP, MFRL))= {diff_mdp_mfrl}")
-        print(f"average(d(MBRL, MFRL))= {diff_mbrl_mfrl}\n")
+    Args:
+        argv (list, optional): Command line arguments (default is None, which uses sys.argv).
 
-        # Compute differences per cell and create a DataFrame
-        d = {}
-        for x in range(H):
-            for y in range(W):
-                d[f"({x}, {y})"] = [
-                    values_MDP[x][y] - values_MBRL[x][y],
-                    values_MDP[x][y] - values_MFRL[x][y],
-                    values_MBRL[x][y] - values_MFRL[x][y],
-                ]
-        df = pd.DataFrame(d)
-        print(df)
-
-        # Append DataFrame to cells_difference list
-        cells_difference.append(df)
-
-    # Write differences per cell to a CSV file
-    with open("data/results/results.csv", "a") as f:
-        i = 1
-        for df in cells_difference:
-            f.write(f"Test {i}\n")
-            df.to_csv(f, index=False)
-            f.write("\n")
-            i += 1
+    Example:
+        To run:
+        python Results.py --workers 8 --seeds 3 --cache data/cache --warm-start
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__.splitlines()[1].strip())
+    parser.add_argument("--instances", default="data/tests/instances")
+    parser.add_argument("--count", type=int, default=None, help="number of instances")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes")
+    parser.add_argument("--seeds", type=int, default=1, help="Q-learning seeds")
+    parser.add_argument("--output", default="data/results/long_results.csv")
+    parser.add_argument("--cache", default=None, help="solution cache directory")
+    parser.add_argument("--warm-start", action="store_true", help="on cache misses")
+    args = parser.parse_args(argv)
+
+    instances = read_instances(args.instances)[: args.count]
+    results = run_experiments(
+        instances, args.workers, range(args.seeds), args.cache, args.warm_start
+    )
+
+    with ResultsWriter(args.output) as writer:
+        for i, ((W, H, L, p, r), result) in enumerate(zip(instances, results)):
+            print(f"---------------------- instance={i + 1} ----------------------")
+            print(f"W={W} | H={H} | p={p} | r={r} | L={L}\n")
+
+            values_MDP = result["MDP"]
+            values_MBRL = result["MBRL"]
+            values_MFRL = result["MFRL"]
+
+            # Compute and print average differences
+            diff_mdp_mbrl = (values_MDP - values_MBRL).mean()
+            diff_mdp_mfrl = (values_MDP - values_MFRL).mean()
+            diff_mbrl_mfrl = (values_MBRL - values_MFRL).mean()
+
+            print(f"average(d(MDP, MBRL))= {diff_mdp_mbrl}")
+            print(f"average(d(MDP, MFRL))= {diff_mdp_mfrl}")
+            print(f"average(d(MBRL, MFRL))= {diff_mbrl_mfrl}\n")
+
+            # Write differences per cell
+            print(writer.write(i + 1, result))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,129 @@
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+PAIRS = (("MDP", "MBRL"), ("MDP", "MFRL"), ("MBRL", "MFRL"))
+COLUMNS = ("instance", "x", "y", "pair", "diff")
+
+
+def long_format(instance, values):
+    """
+    Computes the per-cell differences of one instance in long format.
+
+    Args:
+        instance (int): Number of the instance.
+        values (dict): Maps "MDP", "MBRL" and "MFRL" to (H, W) state values in the
+            orientation of GridWorldBased.value.
+
+    Returns:
+        pandas.DataFrame: One row per cell and algorithm pair, with the columns of
+        COLUMNS; x and y are the cell coordinates (column and row of the values) and
+        pair names the algorithms, e.g. "MDP-MBRL", whose values are subtracted.
+    """
+    H, W = np.shape(values["MDP"])
+    y, x = np.divmod(np.arange(H * W), W)
+    frames = [
+        pd.DataFrame(
+            {
+                "instance": instance,
+                "x": x,
+                "y": y,
+                "pair": f"{first}-{second}",
+                "diff": (
+                    np.asarray(values[first]) - np.asarray(values[second])
+                ).ravel(),
+            }
+        )
+        for first, second in PAIRS
+    ]
+    return pd.concat(frames, ignore_index=True)
+
+
+class ResultsWriter:
+    """
+    Streams per-cell differences to disk, one instance at a time.
+
+    With a ``.csv`` path the rows are appended to one CSV file; any other path is a
+    directory that receives one ``part-<n>.npz`` file of columns per instance. Each
+    instance is flushed as soon as it is written, so memory use is bounded by the
+    largest instance and an interrupted run keeps every finished instance.
+
+    Attributes:
+        path (str): The CSV file or npz directory.
+        count (int): Number of instances written.
+    """
+
+    def __init__(self, path):
+        """
+        Starts a new results file or directory, replacing an existing one.
+
+        Args:
+            path (str): Path of a ``.csv`` file or of an npz directory.
+        """
+        self.path = path
+        self.count = 0
+        self._csv = None
+        if path.endswith(".csv"):
+            self._csv = open(path, "w", newline="")
+        else:
+            os.makedirs(path, exist_ok=True)
+            for part in glob.glob(os.path.join(path, "part-*.npz")):
+                os.remove(part)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, instance, values):
+        """
+        Writes the differences of one instance.
+
+        Args:
+            instance (int): Number of the instance.
+            values (dict): Maps "MDP", "MBRL" and "MFRL" to (H, W) state values.
+
+        Returns:
+            pandas.DataFrame: The rows written, see ``long_format``.
+        """
+        frame = long_format(instance, values)
+        if self._csv is not None:
+            frame.to_csv(self._csv, header=self.count == 0, index=False)
+            self._csv.flush()
+        else:
+            columns = {column: frame[column].to_numpy() for column in COLUMNS}
+            columns["pair"] = columns["pair"].astype(str)
+            np.savez(os.path.join(self.path, f"part-{self.count:06d}.npz"), **columns)
+        self.count += 1
+        return frame
+
+    def close(self):
+        """
+        Closes the CSV file, if any.
+        """
+        if self._csv is not None:
+            self._csv.close()
+            self._csv = None
+
+
+def read_results(path, chunksize=1_000_000):
+    """
+    Reads results written by ResultsWriter lazily.
+
+    Args:
+        path (str): The CSV file or npz directory.
+        chunksize (int, optional): Rows per chunk of a CSV file (default is 1000000).
+            Chunks of an npz directory are its instances.
+
+    Yields:
+        pandas.DataFrame: Consecutive chunks of rows with the columns of COLUMNS.
+    """
+    if path.endswith(".csv"):
+        yield from pd.read_csv(path, chunksize=chunksize)
+        return
+    for part in sorted(glob.glob(os.path.join(path, "part-*.npz"))):
+        with np.load(part) as data:
+            yield pd.DataFrame({column: data[column] for column in COLUMNS})
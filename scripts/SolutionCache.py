@@ -0,0 +1,169 @@
+import glob
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from Storage import load_checkpoint, save_checkpoint
+
+
+class SolutionCache:
+    """
+    Content-addressed on-disk cache of solved value functions.
+
+    Entries are keyed by a fingerprint of everything that determines a solution:
+    grid size, walls, terminals, p, reward, discount, algorithm and tolerance. Each
+    entry is one checkpoint file (see ``Storage.save_checkpoint``) named
+    ``<layout>-<key>.npz``, where the layout part leaves out the reward, so solutions
+    of grids that only differ in reward can be found to warm-start from. Files are
+    written atomically, so several processes can share a cache.
+
+    The cache is bounded by total file size. Reading an entry marks it as recently
+    used, and writing one evicts the least recently used entries above the bound.
+
+    Attributes:
+        path (str): Directory of the cache.
+        max_bytes (int): Total size of the entries kept after a write.
+        hits (int): Number of lookups answered by the cache.
+        misses (int): Number of lookups that were not.
+    """
+
+    def __init__(self, path, max_bytes=2**30):
+        """
+        Opens a cache, creating its directory if needed.
+
+        Args:
+            path (str): Directory of the cache.
+            max_bytes (int, optional): Size bound of the cache (default is 1 GiB).
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def fingerprint(instance, discount, algorithm, tolerance):
+        """
+        Hashes an instance and its solver settings.
+
+        Args:
+            instance (tuple): (W, H, L, p, r) instance, with L a list of (x, y, reward)
+                triples where a reward of 0 marks a wall.
+            discount (float): Discount factor for future rewards.
+            algorithm (str): Name of the solver, e.g. "MDP" or "MBRL".
+            tolerance (float): Convergence tolerance of the solver, or None.
+
+        Returns:
+            tuple: (layout, key) hex digests; the layout digest ignores the reward r.
+        """
+        W, H, L, p, r = instance
+        cells = np.full((H, W), np.nan)
+        for x, y, reward in L:
+            cells[y, x] = reward
+        layout = hashlib.sha256(cells.tobytes())
+        layout.update(
+            json.dumps([W, H, float(p), float(discount), algorithm, tolerance]).encode()
+        )
+        key = layout.copy()
+        key.update(json.dumps(float(r)).encode())
+        return layout.hexdigest()[:16], key.hexdigest()[:32]
+
+    def _file(self, layout, key):
+        return os.path.join(self.path, f"{layout}-{key}.npz")
+
+    def get(self, instance, discount, algorithm, tolerance):
+        """
+        Looks up the solution of an instance.
+
+        Args:
+            instance (tuple): (W, H, L, p, r) instance.
+            discount (float): Discount factor for future rewards.
+            algorithm (str): Name of the solver.
+            tolerance (float): Convergence tolerance of the solver, or None.
+
+        Returns:
+            dict: Arrays stored with ``put`` (``values`` and optionally ``policy``), or
+            None if the instance was not solved yet.
+        """
+        filename = self._file(
+            *self.fingerprint(instance, discount, algorithm, tolerance)
+        )
+        try:
+            arrays, _ = load_checkpoint(filename)
+            os.utime(filename)
+        except (OSError, EOFError, ValueError):
+            # Missing, or evicted by another process while being read
+            self.misses += 1
+            return None
+        self.hits += 1
+        return arrays
+
+    def put(self, instance, discount, algorithm, tolerance, values, policy=None):
+        """
+        Stores the solution of an instance, then evicts entries above the size bound.
+
+        Args:
+            instance (tuple): (W, H, L, p, r) instance.
+            discount (float): Discount factor for future rewards.
+            algorithm (str): Name of the solver.
+            tolerance (float): Convergence tolerance of the solver, or None.
+            values (numpy.ndarray): Solved state values.
+            policy (numpy.ndarray, optional): Solved policy (default is None).
+        """
+        arrays = {"values": np.asarray(values)}
+        if policy is not None:
+            arrays["policy"] = np.asarray(policy)
+        save_checkpoint(
+            self._file(*self.fingerprint(instance, discount, algorithm, tolerance)),
+            arrays,
+            {"kind": "solution", "r": float(instance[4]), "algorithm": algorithm},
+        )
+        self.evict()
+
+    def nearest(self, instance, discount, algorithm, tolerance):
+        """
+        Finds the cached solution of the same layout whose reward is closest.
+
+        Args:
+            instance (tuple): (W, H, L, p, r) instance.
+            discount (float): Discount factor for future rewards.
+            algorithm (str): Name of the solver.
+            tolerance (float): Convergence tolerance of the solver, or None.
+
+        Returns:
+            dict: Arrays of the nearest entry, or None if no solution of the same
+            layout is cached.
+        """
+        layout, _ = self.fingerprint(instance, discount, algorithm, tolerance)
+        best, distance = None, float("inf")
+        for filename in glob.glob(os.path.join(self.path, f"{layout}-*.npz")):
+            try:
+                arrays, settings = load_checkpoint(filename)
+            except (OSError, EOFError, ValueError):
+                continue
+            if abs(settings["r"] - instance[4]) < distance:
+                best, distance = arrays, abs(settings["r"] - instance[4])
+        return best
+
+    def evict(self):
+        """
+        Removes least recently used entries until the cache fits its size bound.
+        """
+        entries = []
+        for filename in glob.glob(os.path.join(self.path, "*.npz")):
+            try:
+                stat = os.stat(filename)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, filename))
+        total = sum(size for _, size, _ in entries)
+        for _, size, filename in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                pass
+            total -= size
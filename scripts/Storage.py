@@ -0,0 +1,89 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+
+
+def allocate(shape, dtype, fill=0, storage=None, name=None):
+    """
+    Allocates an array in memory or as a memory-mapped ``.npy`` file.
+
+    Memory-mapped arrays are only paged in where they are read or written, so a grid
+    can hold tables larger than RAM, and the file always contains the latest values
+    once flushed.
+
+    Args:
+        shape (tuple): Shape of the array.
+        dtype (numpy.dtype): Data type of the array.
+        fill (scalar, optional): Initial value of every entry (default is 0).
+        storage (str, optional): Directory for the backing file (default is None, which
+            allocates in memory).
+        name (str, optional): File name without extension, required with storage.
+
+    Returns:
+        numpy.ndarray: The array, a ``numpy.memmap`` when storage is given.
+    """
+    if storage is None:
+        return np.full(shape, fill, dtype=dtype)
+    os.makedirs(storage, exist_ok=True)
+    array = np.lib.format.open_memmap(
+        os.path.join(storage, f"{name}.npy"), mode="w+", dtype=dtype, shape=shape
+    )
+    if fill != 0 or np.dtype(dtype).kind not in "biuf":
+        array[...] = fill
+    return array
+
+
+def flush(*arrays):
+    """
+    Writes pending changes of memory-mapped arrays to their files.
+
+    Args:
+        *arrays (numpy.ndarray): Arrays to flush; in-memory arrays are skipped.
+    """
+    for array in arrays:
+        if isinstance(array, np.memmap):
+            array.flush()
+
+
+def save_checkpoint(path, arrays, settings):
+    """
+    Writes a checkpoint as a compressed ``.npz`` file.
+
+    The file is written to a uniquely named temporary file next to its destination and
+    then renamed over it, so a job killed while saving leaves the previous checkpoint
+    intact, and processes saving the same path at once never share a temporary file.
+
+    Args:
+        path (str): Destination file.
+        arrays (dict): Arrays to store, by name.
+        settings (dict): JSON-serializable counters, hyperparameters and generator
+            states, stored alongside the arrays.
+    """
+    descriptor, temporary = tempfile.mkstemp(
+        suffix=".tmp", dir=os.path.dirname(path) or "."
+    )
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            np.savez_compressed(file, settings=np.array(json.dumps(settings)), **arrays)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def load_checkpoint(path):
+    """
+    Reads a checkpoint written by ``save_checkpoint``.
+
+    Args:
+        path (str): Checkpoint file.
+
+    Returns:
+        tuple: (arrays, settings) as passed to ``save_checkpoint``.
+    """
+    with np.load(path) as data:
+        arrays = {name: data[name] for name in data.files if name != "settings"}
+        settings = json.loads(str(data["settings"]))
+    return arrays, settings
@@ -1,11 +1,47 @@
+import heapq
+import math
 from collections import defaultdict
 
+import numpy as np
+from scipy.sparse import csr_matrix, identity
+from scipy.sparse.linalg import LinearOperator, gmres, splu
+
+from CompiledGridWorld import StateValues
+from GridWorld import GridWorld
+from Storage import load_checkpoint, save_checkpoint
+
 
 class ValueIteration:
     """
     Value Iteration algorithm for solving Markov Decision Processes (MDPs).
+
+    Attributes:
+        iterations (int): Number of sweeps performed by the last valueIteration call
+            (for prioritized sweeping, its backups divided by the number of states).
+        backups (int): Number of single-state Bellman backups performed.
+        residual (float): Bellman residual max|V_k - V_k-1| of the last sweep.
+        span (float): Span seminorm max(V_k - V_k-1) - min(V_k - V_k-1) of the last sweep.
+        bounds (tuple): Offsets (low, high) such that V_k + low <= V* <= V_k + high
+            holds for every state, or None when the discount is 1 or the mode is not
+            "jacobi".
+        instrument (Instrument): Receives a "sweep" event per sweep (a "prioritized"
+            event per prioritized run) during the last call, or None.
     """
 
+    CRITERIA = ("residual", "span")
+    MODES = ("jacobi", "gauss-seidel", "prioritized", "frontier")
+
+    def __init__(self):
+        """
+        Initializes the solver with empty convergence statistics.
+        """
+        self.iterations = 0
+        self.backups = 0
+        self.residual = None
+        self.span = None
+        self.bounds = None
+        self.instrument = None
+
     def getQValueFromValues(self, mdp, state, action, values, discount):
         """
         Computes the Q-value for a given state-action pair using current value estimates.
@@ -26,22 +62,164 @@ class ValueIteration:
             q_value += prob * (reward + discount * values[landing_state])
         return q_value
 
-    def valueIteration(self, mdp, discount, iterations=100):
+    def valueIteration(
+        self,
+        mdp,
+        discount,
+        iterations=100,
+        backend="numpy",
+        tolerance=None,
+        criterion="residual",
+        mode="jacobi",
+        checkpoint=None,
+        checkpointEvery=10,
+        instrument=None,
+        initial=None,
+    ):
         """
         Performs the value iteration algorithm to compute optimal state values.
 
+        With a tolerance, iterations is only a cap: the loop stops as soon as the
+        chosen convergence measure of a sweep drops below the tolerance. The number of
+        sweeps, the final residual and span, and the resulting bounds on V* are kept in
+        the ``iterations``, ``residual``, ``span`` and ``bounds`` attributes.
+
+        The "jacobi" mode computes every sweep from the previous sweep's values.
+        "gauss-seidel" updates values in place, so later states in a sweep already see
+        the new values of earlier ones; the numpy backend sweeps the checkerboard colors
+        alternately, which is an exact Gauss-Seidel sweep in red-black order.
+        "prioritized" backs up one state at a time, always the one with the largest
+        Bellman error, and re-scores its predecessors after each backup. It stops when
+        no error exceeds the tolerance (0 if None) or after ``iterations`` times the
+        number of states backups; its residual is the largest Bellman error left.
+        "frontier" runs synchronous sweeps over an active set of states only: the
+        first sweep backs up every state, and each later one only the predecessors of
+        the states whose value moved by more than the tolerance (0 if None). It stops
+        when no state moved, so converged or unreachable regions drop out early.
+
+        With a checkpoint file, the values, counters and settings of a "jacobi" or
+        "gauss-seidel" run on the numpy backend are saved every ``checkpointEvery``
+        sweeps and when the run ends; ``resume`` continues such a run exactly as if it
+        had never stopped.
+
+        With an instrument, every sweep records a "sweep" event with its iteration,
+        backups, residual and span, and adds to the "sweeps" and "backups" counters.
+
         Args:
             mdp (object): The Markov Decision Process (MDP) instance.
             discount (float): Discount factor for future rewards.
             iterations (int, optional): Number of iterations for the algorithm (default is 100).
+            backend (str, optional): "numpy" runs vectorized backups on a compiled GridWorld,
+                "python" runs the generic per-state loop (default is "numpy"). MDPs that are
+                not GridWorlds always use the "python" backend.
+            tolerance (float, optional): Stop once the convergence measure is below this
+                value (default is None, which always runs all iterations).
+            criterion (str, optional): "residual" measures max|V_k - V_k-1|, "span" measures
+                its span seminorm (default is "residual").
+            mode (str, optional): "jacobi", "gauss-seidel", "prioritized" or "frontier"
+                (default is "jacobi").
+            checkpoint (str, optional): Path of the checkpoint file (default is None).
+            checkpointEvery (int, optional): Sweeps between checkpoints (default is 10).
+            instrument (Instrument, optional): Receives events and counters
+                (default is None).
+            initial (Mapping or numpy.ndarray, optional): Values to start from instead of
+                zeros, e.g. the solution of a similar grid: a mapping of states to values
+                or, for a GridWorld, a (rows, columns) grid (default is None).
 
         Returns:
-            defaultdict: Dictionary mapping states to their optimal value estimates.
+            Mapping: Mapping of states to their optimal value estimates; a defaultdict for
+            the "python" backend and a StateValues view over the value array for "numpy".
         """
+        if backend not in ("numpy", "python"):
+            raise ValueError(f"Unknown backend: {backend}")
+        if criterion not in ValueIteration.CRITERIA:
+            raise ValueError(f"Unknown criterion: {criterion}")
+        if mode not in ValueIteration.MODES:
+            raise ValueError(f"Unknown mode: {mode}")
+        self.iterations = 0
+        self.backups = 0
+        self.residual = self.span = self.bounds = None
+        self.instrument = instrument
+        if backend == "numpy" and isinstance(mdp, GridWorld):
+            return self.valueIterationArray(
+                mdp,
+                discount,
+                iterations,
+                tolerance,
+                criterion,
+                mode,
+                checkpoint,
+                checkpointEvery,
+                initial,
+            )
+        if checkpoint is not None:
+            raise ValueError("Checkpoints require the numpy backend")
+
+        states = mdp.getStates()
         values = defaultdict(lambda: 0)
+        if initial is not None:
+            for state in states:
+                if isinstance(initial, np.ndarray):
+                    values[state] = float(initial[state])
+                else:
+                    values[state] = initial.get(state, 0)
+        if mode in ("prioritized", "frontier"):
+            predecessors = defaultdict(set)
+            for state in states:
+                if not mdp.isTerminal(state):
+                    for action in mdp.getLegalActions(state):
+                        for landing_state, prob in mdp.getTransitionStatesAndProbs(
+                            state, action
+                        ):
+                            predecessors[landing_state].add(state)
+
+            def backup(state):
+                if mdp.isTerminal(state):
+                    return 0
+                return max(
+                    self.getQValueFromValues(mdp, state, action, values, discount)
+                    for action in mdp.getLegalActions(state)
+                )
+
+            if mode == "frontier":
+                theta = 0 if tolerance is None else tolerance
+                active = [state for state in states if not mdp.isTerminal(state)]
+                if instrument is not None:
+                    instrument.begin("sweep")
+                while active and self.iterations < iterations:
+                    new_values = [backup(state) for state in active]
+                    diffs = [new - values[s] for s, new in zip(active, new_values)]
+                    values.update(zip(active, new_values))
+                    self._converged(
+                        len(diffs), min(diffs), max(diffs), 1, None, criterion
+                    )
+                    changed = [s for s, diff in zip(active, diffs) if abs(diff) > theta]
+                    active = list(
+                        dict.fromkeys(
+                            p for state in changed for p in predecessors[state]
+                        )
+                    )
+                return values
+
+            def update(state):
+                values[state] = backup(state)
+
+            self._prioritizedSweeping(
+                states,
+                lambda state: abs(backup(state) - values[state]),
+                update,
+                predecessors.__getitem__,
+                tolerance,
+                iterations * len(states),
+            )
+            return values
+
+        if instrument is not None:
+            instrument.begin("sweep")
         for _ in range(iterations):
-            next_values = defaultdict(lambda: 0)
-            for state in mdp.getStates():
+            next_values = values if mode == "gauss-seidel" else defaultdict(lambda: 0)
+            diffs = []
+            for state in states:
                 if not mdp.isTerminal(state):
                     max_q_value = float("-inf")
                     for action in mdp.getLegalActions(state):
@@ -49,11 +227,641 @@ class ValueIteration:
                             mdp, state, action, values, discount
                         )
                         max_q_value = max(max_q_value, q_value)
+                    diffs.append(max_q_value - values[state])
                     next_values[state] = max_q_value
             values = next_values
+            if self._converged(
+                len(diffs),
+                min(diffs, default=0),
+                max(diffs, default=0),
+                # The V* bounds only hold for synchronous sweeps.
+                discount if mode == "jacobi" else 1,
+                tolerance,
+                criterion,
+            ):
+                break
+        return values
+
+    def valueIterationArray(
+        self,
+        mdp,
+        discount,
+        iterations=100,
+        tolerance=None,
+        criterion="residual",
+        mode="jacobi",
+        checkpoint=None,
+        checkpointEvery=10,
+        initial=None,
+    ):
+        """
+        Performs value iteration with vectorized backups on a compiled GridWorld.
+
+        Args:
+            mdp (GridWorld): The grid environment.
+            discount (float): Discount factor for future rewards.
+            iterations (int, optional): Number of iterations for the algorithm (default is 100).
+            tolerance (float, optional): Convergence tolerance (default is None).
+            criterion (str, optional): "residual" or "span" (default is "residual").
+            mode (str, optional): "jacobi", "gauss-seidel", "prioritized" or "frontier"
+                (default is "jacobi").
+            checkpoint (str, optional): Path of the checkpoint file (default is None).
+            checkpointEvery (int, optional): Sweeps between checkpoints (default is 10).
+            initial (Mapping or numpy.ndarray, optional): Values to start from, as a
+                mapping of states to values or a (rows, columns) grid (default is None,
+                which starts from zeros).
+
+        Returns:
+            StateValues: View mapping states to their optimal value estimates.
+        """
+        if checkpoint is not None and mode in ("prioritized", "frontier"):
+            raise ValueError(f"Checkpoints are not supported in {mode} mode")
+        compiled = mdp.compile()
+        states = compiled.stateIndices
+        values = compiled.zeros()
+        if isinstance(initial, np.ndarray):
+            values[:-1] = np.where(compiled.wall, 0, initial.ravel())
+        elif initial is not None:
+            values = compiled.fromDict(initial).copy()
+        if mode == "prioritized":
+            indptr, indices = compiled.predecessors()
+            errors = np.abs(compiled.backup(values, discount) - values)[states].tolist()
+
+            def update(state):
+                values[state] = compiled.backupStates(values, discount, [state])[0]
+
+            def error(state):
+                return abs(
+                    compiled.backupStates(values, discount, [state])[0] - values[state]
+                )
+
+            self._prioritizedSweeping(
+                states.tolist(),
+                error,
+                update,
+                lambda state: indices[indptr[state] : indptr[state + 1]].tolist(),
+                tolerance,
+                iterations * len(states),
+                errors,
+            )
+        elif mode == "frontier":
+            values = self._frontier(
+                compiled, values, discount, states, tolerance, iterations
+            )
+        else:
+            values = self._sweeps(
+                compiled,
+                values,
+                {
+                    "discount": discount,
+                    "iterations": iterations,
+                    "tolerance": tolerance,
+                    "criterion": criterion,
+                    "mode": mode,
+                    "checkpointEvery": checkpointEvery,
+                },
+                checkpoint,
+            )
+        return StateValues(compiled, values)
+
+    def resume(self, mdp, checkpoint, instrument=None):
+        """
+        Continues a value iteration run from a checkpoint written by ``valueIteration``.
+
+        The run goes on with the saved settings and keeps saving to the same file.
+
+        Args:
+            mdp (GridWorld): The grid environment of the interrupted run.
+            checkpoint (str): Path of the checkpoint file.
+            instrument (Instrument, optional): Receives events and counters of the
+                remaining sweeps (default is None).
+
+        Returns:
+            StateValues: View mapping states to their optimal value estimates.
+        """
+        arrays, settings = load_checkpoint(checkpoint)
+        if settings.get("kind") != "valueIteration":
+            raise ValueError(f"{checkpoint} is not a value iteration checkpoint")
+        compiled = mdp.compile()
+        values = arrays["values"]
+        if values.shape != (compiled.gameover + 1,):
+            raise ValueError("Checkpoint was written for a grid of a different size")
+        self.iterations = settings["completed"]
+        self.backups = settings["backups"]
+        self.residual = settings["residual"]
+        self.span = settings["span"]
+        self.bounds = None if settings["bounds"] is None else tuple(settings["bounds"])
+        self.instrument = instrument
+        if not settings["converged"]:
+            values = self._sweeps(compiled, values, settings, checkpoint)
+        return StateValues(compiled, values)
+
+    def resolve(
+        self,
+        mdp,
+        values,
+        discount,
+        tolerance=1e-6,
+        iterations=1000,
+        changed=None,
+        instrument=None,
+    ):
+        """
+        Re-converges a value function after the grid was edited.
+
+        Edit the grid in place (``addWall``, ``setTerminal``, ``removeTerminal``,
+        ``GridWorldAdditive.reward``, ...) and pass the values solved before the edit.
+        The solve warm-starts from them and only backs up a frontier of states: first
+        the cells whose transitions or rewards changed, then, each round, the
+        predecessors of the states whose value moved by more than the tolerance. States
+        that cannot reach an edited cell are never touched.
+
+        Each round counts as one iteration. The result agrees with a full value
+        iteration to within about tolerance / (1 - discount).
+
+        Args:
+            mdp (GridWorld): The edited grid environment.
+            values (Mapping): Values solved before the edit. A StateValues returned by
+                ``valueIteration`` remembers the grid it was solved on, and the changed
+                cells are found by comparing it to the edited grid.
+            discount (float): Discount factor for future rewards.
+            tolerance (float, optional): Changes at or below this value do not
+                propagate (default is 1e-6).
+            iterations (int, optional): Maximum number of rounds (default is 1000).
+            changed (iterable, optional): States whose transitions or rewards changed
+                (default is None, which derives them from values).
+            instrument (Instrument, optional): Receives a "sweep" event per round and
+                the "sweeps" and "backups" counters (default is None).
+
+        Returns:
+            StateValues: View mapping states to their optimal value estimates.
+        """
+        compiled = mdp.compile()
+        self.iterations = 0
+        self.backups = 0
+        self.residual = self.span = self.bounds = None
+        self.instrument = instrument
+        if changed is None:
+            if not isinstance(values, StateValues):
+                raise ValueError("changed is required unless values is a StateValues")
+            frontier = compiled.changedStates(values.compiled)
+            array = values.array.copy()
+        else:
+            frontier = [compiled.stateIndex(state) for state in changed]
+            frontier = np.array(
+                [i for i in frontier if i is not None and i < compiled.gameover],
+                dtype=np.int64,
+            )
+            array = compiled.fromDict(values).copy()
+        array[:-1][compiled.wall] = 0
+        frontier = np.unique(frontier[~compiled.wall[frontier]])
+        array = self._frontier(
+            compiled, array, discount, frontier, tolerance, iterations
+        )
+        return StateValues(compiled, array)
+
+    def multigrid(
+        self,
+        mdp,
+        discount,
+        iterations=1000,
+        tolerance=1e-6,
+        criterion="residual",
+        mode="jacobi",
+        factor=2,
+        coarsest=16,
+        smoothing=4,
+        instrument=None,
+    ):
+        """
+        Performs coarse-to-fine (multigrid) value iteration on a GridWorld.
+
+        The grid is coarsened repeatedly (see ``GridWorld.coarsen``) until its shorter
+        side is at most ``coarsest`` cells. The coarsest grid is solved from zeros with
+        discount ``discount ** (factor ** level)``, and each solution, repeated over
+        the blocks of the next finer grid, warm-starts that grid's solve.
+
+        A warm start still differs from the finer grid's values by a smooth error,
+        and sweeps only move that error by one cell each, so every level alternates
+        ``smoothing`` sweeps with a coarse correction (see ``_coarseCorrection``).
+        A level stops on the tolerance of a plain sweep, so the values pass the same
+        convergence test as in ``valueIterationArray``.
+
+        Afterwards ``iterations``, ``residual``, ``span`` and ``bounds`` describe the
+        solve of the full grid, while ``backups`` counts the backups of all levels.
+
+        Args:
+            mdp (GridWorld): The grid environment.
+            discount (float): Discount factor for future rewards, below 1.
+            iterations (int, optional): Maximum number of sweeps per level (default is
+                1000).
+            tolerance (float, optional): Convergence tolerance of every level (default
+                is 1e-6).
+            criterion (str, optional): "residual" or "span" (default is "residual").
+            mode (str, optional): "jacobi" or "gauss-seidel" (default is "jacobi").
+            factor (int, optional): Side of the blocks merged into one coarse cell
+                (default is 2).
+            coarsest (int, optional): Shorter side of the coarsest grid, both for the
+                coarse grids and for the blocks of a coarse correction (default is 16).
+            smoothing (int, optional): Sweeps between coarse corrections (default is
+                4).
+            instrument (Instrument, optional): Receives a "sweep" event per sweep of
+                every level, a "level" event per level and the "sweeps", "backups" and
+                "corrections" counters (default is None).
+
+        Returns:
+            StateValues: View mapping states to their optimal value estimates.
+        """
+        if criterion not in ValueIteration.CRITERIA:
+            raise ValueError(f"Unknown criterion: {criterion}")
+        if mode not in ("jacobi", "gauss-seidel"):
+            raise ValueError(f"Unknown mode: {mode}")
+        if not 0 <= discount < 1:
+            raise ValueError("multigrid requires a discount below 1")
+        if factor < 2:
+            raise ValueError("factor must be at least 2")
+        if smoothing < 1:
+            raise ValueError("smoothing must be at least 1")
+        levels = [(mdp, discount)]
+        while min(levels[-1][0].rows, levels[-1][0].cols) > coarsest:
+            grid, gamma = levels[-1]
+            levels.append((grid.coarsen(factor, gamma), gamma**factor))
+
+        self.instrument = instrument
+        backups = 0
+        values = None
+        for level, (grid, gamma) in reversed(list(enumerate(levels))):
+            compiled = grid.compile()
+            array = compiled.zeros()
+            if values is not None:
+                initial = np.repeat(np.repeat(values.grid(), factor, 0), factor, 1)
+                array[:-1] = initial[: grid.rows, : grid.cols].ravel()
+                array[:-1][compiled.wall] = 0
+            self.iterations = 0
+            self.backups = 0
+            self.residual = self.span = self.bounds = None
+            if instrument is not None:
+                instrument.begin("level")
+            settings = {
+                "discount": gamma,
+                "tolerance": tolerance,
+                "criterion": criterion,
+                "mode": mode,
+            }
+            transfers = None
+            corrections = 0
+            while self.iterations < iterations:
+                settings["iterations"] = min(self.iterations + smoothing, iterations)
+                array = self._sweeps(compiled, array, settings)
+                measure = self.residual if criterion == "residual" else self.span
+                if measure < tolerance or self.iterations >= iterations:
+                    break
+                if transfers is None:
+                    transfers = self._aggregation(compiled, factor, coarsest)
+                array = self._coarseCorrection(compiled, array, gamma, transfers)
+                corrections += 1
+            backups += self.backups
+            values = StateValues(compiled, array)
+            if instrument is not None:
+                instrument.count(corrections=corrections)
+                instrument.record(
+                    "level",
+                    level=level,
+                    rows=grid.rows,
+                    cols=grid.cols,
+                    iterations=self.iterations,
+                    backups=self.backups,
+                    corrections=corrections,
+                    residual=self.residual,
+                )
+        self.backups = backups
+        return values
+
+    def _aggregation(self, compiled, factor, coarsest):
+        """
+        Builds the transfer matrices between a grid and its nested blocks.
+
+        Cells are merged into blocks of ``factor`` x ``factor``, those into blocks of
+        blocks, and so on until the shorter side is at most ``coarsest``. Prolongation
+        copies a block's value to all its cells; restriction averages over the
+        non-wall cells of a block (blocks of walls only are left out).
+
+        Args:
+            compiled (CompiledGridWorld): The compiled grid environment.
+            factor (int): Side of the blocks.
+            coarsest (int): Shorter side of the coarsest block grid.
+
+        Returns:
+            list: (prolong, restrict) sparse matrices per level, finest first.
+        """
+        shape = compiled.shape
+        weights = (~compiled.wall).astype(float)
+        transfers = []
+        while min(shape) > coarsest:
+            rows, cols = shape
+            shape = (-(-rows // factor), -(-cols // factor))
+            cells = np.arange(rows * cols)
+            ii, jj = np.divmod(cells, cols)
+            blocks = (ii // factor) * shape[1] + jj // factor
+            size = shape[0] * shape[1]
+            counts = np.bincount(blocks, weights=weights, minlength=size)
+            prolong = csr_matrix(
+                (np.ones(rows * cols), (cells, blocks)), shape=(rows * cols, size)
+            )
+            restrict = csr_matrix(
+                (weights / np.maximum(counts, 1)[blocks], (blocks, cells)),
+                shape=(size, rows * cols),
+            )
+            transfers.append((prolong, restrict))
+            weights = (counts > 0).astype(float)
+        return transfers
+
+    def _coarseCorrection(self, compiled, values, discount, transfers):
+        """
+        Adds an estimate of the remaining error of the greedy policy to the values.
+
+        For the greedy policy pi of the values, the error e = V_pi - V solves
+        (I - discount * P_pi) e = TV - V. It is solved to a relative accuracy of
+        1e-3 by up to 20 GMRES steps, preconditioned with one V-cycle over the block
+        levels of ``transfers``: two Jacobi steps, the averaged residual equation
+        solved on the blocks (directly on the coarsest ones), the block solution
+        copied back to the cells, and two more Jacobi steps. Like a policy
+        evaluation step of modified policy iteration, this lets a new value reach
+        the whole grid at once instead of one cell per sweep.
+
+        Args:
+            compiled (CompiledGridWorld): The compiled grid environment.
+            values (numpy.ndarray): Value estimates, shape (S + 1,).
+            discount (float): Discount factor for future rewards.
+            transfers (list): Transfer matrices from ``_aggregation``.
+
+        Returns:
+            numpy.ndarray: Corrected value estimates, shape (S + 1,).
+        """
+        cells = compiled.gameover
+        live = np.flatnonzero(~compiled.absorbing)
+        actions = np.zeros(cells, dtype=np.int64)
+        actions[live] = compiled.qValues(values, discount, live).argmax(axis=1)
+        rows = np.arange(cells) * len(compiled.turnDirections) + actions
+        # Terminal and wall rows only move to GAMEOVER, whose column is dropped
+        operators = [discount * compiled.transitionMatrix()[rows, :cells]]
+        for prolong, restrict in transfers:
+            operators.append((restrict @ operators[-1] @ prolong).tocsr())
+        size = operators[-1].shape[0]
+        coarse = splu((identity(size, format="csc") - operators[-1]).tocsc())
+
+        def cycle(rhs, depth=0):
+            if depth == len(transfers):
+                return coarse.solve(rhs)
+            transitions = operators[depth]
+            prolong, restrict = transfers[depth]
+            solution = rhs.copy()
+            for _ in range(2):
+                solution = rhs + transitions @ solution
+            residual = rhs + transitions @ solution - solution
+            solution += prolong @ cycle(restrict @ residual, depth + 1)
+            for _ in range(2):
+                solution = rhs + transitions @ solution
+            return solution
+
+        residual = compiled.backup(values, discount)[:-1] - values[:-1]
+        error, _ = gmres(
+            identity(cells, format="csr") - operators[0],
+            residual,
+            rtol=1e-3,
+            restart=20,
+            maxiter=1,
+            M=LinearOperator((cells, cells), matvec=cycle),
+        )
+        corrected = values.copy()
+        corrected[:-1] += np.where(compiled.wall, 0, error)
+        return corrected
+
+    def _frontier(self, compiled, values, discount, frontier, tolerance, iterations):
+        """
+        Runs synchronous sweeps restricted to an active set of states.
+
+        Each sweep backs up the active states from the previous values; the next
+        active set holds the predecessors of the states that moved by more than the
+        tolerance. Each sweep counts as one iteration.
+
+        Args:
+            compiled (CompiledGridWorld): The compiled grid environment.
+            values (numpy.ndarray): Initial value estimates, shape (S + 1,), updated in
+                place.
+            discount (float): Discount factor for future rewards.
+            frontier (numpy.ndarray): Sorted indices of the states of the first sweep.
+            tolerance (float): Changes at or below this value do not propagate (0 if
+                None).
+            iterations (int): Maximum number of sweeps.
+
+        Returns:
+            numpy.ndarray: Value estimates, shape (S + 1,).
+        """
+        theta = 0 if tolerance is None else tolerance
+        if self.instrument is not None:
+            self.instrument.begin("sweep")
+        while frontier.size and self.iterations < iterations:
+            new = compiled.backupStates(values, discount, frontier)
+            diffs = new - values[frontier]
+            values[frontier] = new
+            self._converged(
+                len(frontier), diffs.min(), diffs.max(), 1, None, "residual"
+            )
+            frontier = compiled.predecessorsOf(frontier[np.abs(diffs) > theta])
+        return values
+
+    def _sweeps(self, compiled, values, settings, checkpoint=None):
+        """
+        Runs synchronous or red-black Gauss-Seidel sweeps until convergence.
+
+        Args:
+            compiled (CompiledGridWorld): The compiled grid environment.
+            values (numpy.ndarray): Initial value estimates, shape (S + 1,).
+            settings (dict): The discount, iterations, tolerance, criterion, mode and
+                checkpointEvery arguments of ``valueIteration``.
+            checkpoint (str, optional): Path of the checkpoint file (default is None).
+
+        Returns:
+            numpy.ndarray: Value estimates, shape (S + 1,).
+        """
+        discount, mode = settings["discount"], settings["mode"]
+        states = compiled.stateIndices
+        colors = [~compiled.checkerboard, compiled.checkerboard]
+        colors = [np.flatnonzero(color & ~compiled.wall) for color in colors]
+        if self.instrument is not None:
+            self.instrument.begin("sweep")
+        while self.iterations < settings["iterations"]:
+            if mode == "gauss-seidel":
+                previous = values.copy()
+                for color in colors:
+                    values[color] = compiled.backupStates(values, discount, color)
+                diffs = values[:-1] - previous[:-1]
+            else:
+                next_values = compiled.backup(values, discount)
+                diffs = next_values[:-1] - values[:-1]
+                values = next_values
+            converged = self._converged(
+                len(states),
+                diffs.min(initial=0),
+                diffs.max(initial=0),
+                # The V* bounds only hold for synchronous sweeps.
+                discount if mode == "jacobi" else 1,
+                settings["tolerance"],
+                settings["criterion"],
+            )
+            if checkpoint is not None and (
+                converged
+                or self.iterations % settings["checkpointEvery"] == 0
+                or self.iterations == settings["iterations"]
+            ):
+                save_checkpoint(
+                    checkpoint,
+                    {"values": values},
+                    dict(
+                        settings,
+                        kind="valueIteration",
+                        completed=self.iterations,
+                        backups=self.backups,
+                        residual=self.residual,
+                        span=self.span,
+                        bounds=self.bounds,
+                        converged=converged,
+                    ),
+                )
+            if converged:
+                break
         return values
 
-    def getQValues(self, mdp, values, discount):
+    def _prioritizedSweeping(
+        self, states, error, update, predecessors, tolerance, budget, errors=None
+    ):
+        """
+        Runs prioritized sweeping with a heap of Bellman errors.
+
+        Args:
+            states (iterable): All states of the MDP.
+            error (callable): Returns the current Bellman error of a state.
+            update (callable): Backs up a state in place.
+            predecessors (callable): Returns the states whose backup reads a state.
+            tolerance (float): Errors at or below this value are not queued (0 if None).
+            budget (int): Maximum number of backups.
+            errors (list, optional): Precomputed initial errors, in the order of states.
+        """
+        if self.instrument is not None:
+            self.instrument.begin("prioritized")
+        theta = 0 if tolerance is None else tolerance
+        states = list(states)
+        if errors is None:
+            errors = [error(state) for state in states]
+        priority = dict(zip(states, errors))
+        heap = [(-err, i, state) for i, (state, err) in enumerate(zip(states, errors))]
+        heap = [entry for entry in heap if -entry[0] > theta]
+        heapq.heapify(heap)
+        order = {state: i for i, state in enumerate(states)}
+        while heap and self.backups < budget:
+            err, _, state = heapq.heappop(heap)
+            if -err != priority[state]:
+                continue
+            update(state)
+            self.backups += 1
+            priority[state] = 0
+            for predecessor in predecessors(state):
+                err = error(predecessor)
+                priority[predecessor] = err
+                if err > theta:
+                    heapq.heappush(heap, (-err, order[predecessor], predecessor))
+        self.iterations = math.ceil(self.backups / max(len(states), 1))
+        self.residual = max(priority.values(), default=0)
+        if self.instrument is not None:
+            self.instrument.count(backups=self.backups)
+            self.instrument.record(
+                "prioritized",
+                backups=self.backups,
+                iterations=self.iterations,
+                residual=float(self.residual),
+            )
+
+    def _converged(self, backups, low, high, discount, tolerance, criterion):
+        """
+        Records the statistics of a finished sweep and checks for convergence.
+
+        Args:
+            backups (int): Number of states backed up during the sweep.
+            low (float): Smallest change of a state value during the sweep.
+            high (float): Largest change of a state value during the sweep.
+            discount (float): Discount factor for future rewards.
+            tolerance (float): Convergence tolerance, or None to never stop early.
+            criterion (str): "residual" or "span".
+
+        Returns:
+            bool: True if the sweep met the tolerance.
+        """
+        self.iterations += 1
+        self.backups += backups
+        self.residual = float(max(abs(low), abs(high)))
+        self.span = float(high - low)
+        if discount < 1:
+            factor = discount / (1 - discount)
+            self.bounds = (factor * float(low), factor * float(high))
+        if self.instrument is not None:
+            self.instrument.count(sweeps=1, backups=backups)
+            self.instrument.record(
+                "sweep",
+                iteration=self.iterations,
+                backups=backups,
+                residual=self.residual,
+                span=self.span,
+            )
+        if tolerance is None:
+            return False
+        measure = self.residual if criterion == "residual" else self.span
+        return measure < tolerance
+
+    def getQValueArray(self, mdp, values, discount):
+        """
+        Computes the Q-values of every state of a GridWorld as one array.
+
+        Args:
+            mdp (GridWorld): The grid environment.
+            values (Mapping): Mapping of states to their value estimates.
+            discount (float): Discount factor for future rewards.
+
+        Returns:
+            numpy.ndarray: Q-values of shape (S, A), with rows in the order of
+            ``mdp.compile().states`` and columns in the order of GridWorld.DIRCS.
+            Terminal states, whose only action is EXIT, hold their exit value in every
+            column, so the row maximum is always the backed-up state value.
+        """
+        compiled = mdp.compile()
+        value_array = compiled.fromDict(values)
+        states = compiled.stateIndices
+        q_values = compiled.qValues(value_array, discount, states)
+        terminal = compiled.terminal[states]
+        exits = compiled.rewards[states] + discount * value_array[compiled.gameover]
+        q_values[terminal] = exits[terminal, None]
+        return q_values
+
+    def getPolicyArray(self, mdp, values, discount):
+        """
+        Extracts the greedy policy of every state of a GridWorld as one array.
+
+        Args:
+            mdp (GridWorld): The grid environment.
+            values (Mapping): Mapping of states to their value estimates.
+            discount (float): Discount factor for future rewards.
+
+        Returns:
+            numpy.ndarray: Index into GridWorld.DIRCS of the best action of each state,
+            or -1 for the EXIT action of terminal states, shape (S,) in the order of
+            ``mdp.compile().states``.
+        """
+        compiled = mdp.compile()
+        policy = self.getQValueArray(mdp, values, discount).argmax(axis=1)
+        policy[compiled.terminal[compiled.stateIndices]] = -1
+        return policy
+
+    def getQValues(self, mdp, values, discount, backend="numpy"):
         """
         Computes Q-values for all state-action pairs using current value estimates.
 
@@ -61,10 +869,26 @@ class ValueIteration:
             mdp (object): The Markov Decision Process (MDP) instance.
             values (defaultdict): Dictionary mapping states to their value estimates.
             discount (float): Discount factor for future rewards.
+            backend (str, optional): "numpy" reads transitions from the compiled GridWorld,
+                "python" queries the MDP per state (default is "numpy").
 
         Returns:
             dict: Dictionary mapping (state, action) pairs to their computed Q-values.
+            ``getQValueArray`` returns the same values as an array.
         """
+        if backend == "numpy" and isinstance(mdp, GridWorld):
+            compiled = mdp.compile()
+            q_array = self.getQValueArray(mdp, values, discount).tolist()
+            terminal = compiled.terminal[compiled.stateIndices].tolist()
+            q_values = {}
+            for i, state in enumerate(compiled.states):
+                if terminal[i]:
+                    q_values[state, GridWorld.EXIT] = q_array[i][0]
+                else:
+                    for a, action in enumerate(GridWorld.DIRCS):
+                        q_values[state, action] = q_array[i][a]
+            return q_values
+
         q_values = {}
         for state in mdp.getStates():
             if not mdp.isTerminal(state):
@@ -74,7 +898,7 @@ class ValueIteration:
                     )
         return q_values
 
-    def getPolicy(self, mdp, values, discount):
+    def getPolicy(self, mdp, values, discount, backend="numpy"):
         """
         Extracts the optimal policy based on computed values and Q-values.
 
@@ -82,10 +906,18 @@ class ValueIteration:
             mdp (object): The Markov Decision Process (MDP) instance.
             values (defaultdict): Dictionary mapping states to their value estimates.
             discount (float): Discount factor for future rewards.
+            backend (str, optional): "numpy" reads transitions from the compiled GridWorld,
+                "python" queries the MDP per state (default is "numpy").
 
         Returns:
             dict: Dictionary mapping states to their optimal actions according to the policy.
+            ``getPolicyArray`` returns the same policy as an array.
         """
+        if backend == "numpy" and isinstance(mdp, GridWorld):
+            actions = GridWorld.DIRCS + [GridWorld.EXIT]
+            best = self.getPolicyArray(mdp, values, discount).tolist()
+            return dict(zip(mdp.compile().states, [actions[a] for a in best]))
+
         policy = {}
         for state in mdp.getStates():
             if not mdp.isTerminal(state):
@@ -1,5 +1,9 @@
-import os
-import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from InstanceStore import InstanceStore, InstanceWriter
 
 # Define the test cases with different configurations
 test_cases = [
@@ -142,24 +146,269 @@ def generate_grid(w, h, L, p, r):
     return grid
 
 
-if __name__ == "__main__":
+def maze_layout(w, h, rng):
+    """
+    Carves a perfect maze with the binary tree algorithm.
+
+    Rooms sit on even coordinates and every room opens a passage either up or to
+    the right, chosen at random, so all rooms are connected without loops. The
+    goal (+1) is the top-right room.
+
+    Args:
+        w (int): Width of the grid.
+        h (int): Height of the grid.
+        rng (numpy.random.Generator): Random number generator.
+
+    Returns:
+        tuple: (walls, terminals) arrays of shape (h, w); walls is a boolean mask and
+        terminals holds the reward of each terminal cell and 0 elsewhere.
+    """
+    rows, cols = (h + 1) // 2, (w + 1) // 2
+    walls = np.ones((h, w), dtype=bool)
+    walls[::2, ::2] = False
+    up = rng.random((rows, cols)) < 0.5
+    up[-1, :] = False
+    up[:, -1] = True
+    up[-1, -1] = False
+    right = ~up
+    right[-1, -1] = False
+    iy, ix = np.nonzero(up)
+    walls[2 * iy + 1, 2 * ix] = False
+    iy, ix = np.nonzero(right)
+    walls[2 * iy, 2 * ix + 1] = False
+    terminals = np.zeros((h, w))
+    terminals[2 * (rows - 1), 2 * (cols - 1)] = 1
+    return walls, terminals
+
+
+def cliff_layout(w, h, rng):
+    """
+    Builds the cliff walk: the bottom row between the start and the goal is a cliff.
+
+    Args:
+        w (int): Width of the grid.
+        h (int): Height of the grid.
+        rng (numpy.random.Generator): Random number generator (unused, the layout is
+            fixed).
+
+    Returns:
+        tuple: (walls, terminals) arrays of shape (h, w), see ``maze_layout``.
+    """
+    walls = np.zeros((h, w), dtype=bool)
+    terminals = np.zeros((h, w))
+    terminals[0, 1:-1] = -100
+    terminals[0, -1] = 1
+    return walls, terminals
+
+
+def rooms_layout(w, h, rng, room=10):
+    """
+    Splits the grid into square rooms joined by one random door per shared wall.
+
+    A goal (+1) and a pit (-1) are placed in random free cells.
+
+    Args:
+        w (int): Width of the grid.
+        h (int): Height of the grid.
+        rng (numpy.random.Generator): Random number generator.
+        room (int, optional): Side of a room in cells (default is 10).
+
+    Returns:
+        tuple: (walls, terminals) arrays of shape (h, w), see ``maze_layout``.
+    """
+    period = room + 1
+    walls = np.zeros((h, w), dtype=bool)
+    walls[room::period, :] = True
+    walls[:, room::period] = True
+    # One door in every wall segment between two wall crossings
+    for axis in (0, 1):
+        lines = np.arange(room, (h, w)[axis], period)
+        starts = np.arange(0, (w, h)[axis], period)
+        lengths = np.minimum(room, (w, h)[axis] - starts)
+        doors = starts + (rng.random((len(lines), len(starts))) * lengths).astype(int)
+        line = np.repeat(lines, len(starts))
+        if axis == 0:
+            walls[line, doors.ravel()] = False
+        else:
+            walls[doors.ravel(), line] = False
+    terminals = np.zeros((h, w))
+    free = np.flatnonzero(~walls)
+    cells = rng.choice(free, size=min(2, len(free)), replace=False)
+    terminals.flat[cells] = [1, -1][: len(cells)]
+    return walls, terminals
+
+
+def random_layout(w, h, rng, wall_density=0.2, terminal_density=0.01, rewards=(1, -1)):
+    """
+    Places walls and terminals independently at random.
+
+    At least one terminal is placed whenever there is a free cell.
+
+    Args:
+        w (int): Width of the grid.
+        h (int): Height of the grid.
+        rng (numpy.random.Generator): Random number generator.
+        wall_density (float, optional): Probability of a cell being a wall (default is 0.2).
+        terminal_density (float, optional): Probability of a free cell being terminal
+            (default is 0.01).
+        rewards (sequence, optional): Terminal rewards to draw from; must be nonzero
+            (default is (1, -1)).
+
+    Returns:
+        tuple: (walls, terminals) arrays of shape (h, w), see ``maze_layout``.
+    """
+    walls = rng.random((h, w)) < wall_density
+    terminal = ~walls & (rng.random((h, w)) < terminal_density)
+    free = np.flatnonzero(~walls)
+    if not terminal.any() and len(free):
+        terminal.flat[rng.choice(free)] = True
+    terminals = np.zeros((h, w))
+    terminals[terminal] = rng.choice(rewards, size=int(terminal.sum()))
+    return walls, terminals
+
+
+LAYOUTS = {
+    "maze": maze_layout,
+    "cliff": cliff_layout,
+    "rooms": rooms_layout,
+    "random": random_layout,
+}
+
+
+def layout_cells(walls, terminals):
+    """
+    Lists the walls and terminals of a layout in the (x, y, reward) format of L.
+
+    Args:
+        walls (numpy.ndarray): Boolean wall mask, shape (h, w).
+        terminals (numpy.ndarray): Terminal rewards, 0 for non-terminal cells, shape (h, w).
+
+    Returns:
+        tuple: (x, y, reward) arrays in row-major order, with reward 0 for walls.
+    """
+    y, x = np.nonzero(walls | (terminals != 0))
+    return x, y, np.where(walls[y, x], 0.0, terminals[y, x])
+
+
+def family(kinds, sizes, count=1, p=0.8, r=-0.04, seed=0, **options):
+    """
+    Describes a family of generated instances.
+
+    Every (kind, size) pair gets ``count`` instances. Each instance draws from its
+    own generator seeded with (seed, position), so an instance does not depend on
+    which worker builds it or on the rest of the family.
+
+    Args:
+        kinds (list): Layout names from LAYOUTS.
+        sizes (list): (w, h) grid sizes.
+        count (int, optional): Instances per kind and size (default is 1).
+        p (float, optional): Probability of moving in the intended direction (default is 0.8).
+        r (float, optional): Default reward value for non-terminal states (default is -0.04).
+        seed (int, optional): Seed of the family (default is 0).
+        **options: Extra keyword arguments for the layout functions.
+
+    Returns:
+        list: Jobs for ``generate_instance``.
+    """
+    for kind in kinds:
+        if kind not in LAYOUTS:
+            raise ValueError(f"Unknown layout: {kind}")
+    jobs = []
+    for kind in kinds:
+        for w, h in sizes:
+            for i in range(count):
+                jobs.append((kind, w, h, p, r, (seed, len(jobs)), i, options))
+    return jobs
+
+
+def generate_instance(job):
+    """
+    Builds one instance of a family.
+
+    Args:
+        job (tuple): A job from ``family``.
+
+    Returns:
+        tuple: (name, w, h, x, y, reward, p, r) ready for ``InstanceWriter.add``.
+    """
+    kind, w, h, p, r, seed, i, options = job
+    walls, terminals = LAYOUTS[kind](w, h, np.random.default_rng(seed), **options)
+    x, y, reward = layout_cells(walls, terminals)
+    return f"{kind}_{w}x{h}_{i}", w, h, x, y, reward, p, r
+
+
+def write_family(path, jobs, workers=None):
+    """
+    Generates a family of instances and streams it into an instance store.
+
+    Args:
+        path (str): Directory of the store.
+        jobs (list): Jobs from ``family``.
+        workers (int, optional): Number of worker processes; None uses all cores and 1
+            generates in this process (default is None).
+
+    Returns:
+        InstanceStore: The written store.
+    """
+    with InstanceWriter(path) as writer:
+        if workers == 1:
+            instances = map(generate_instance, jobs)
+            for name, w, h, x, y, reward, p, r in instances:
+                writer.add(w, h, x, y, reward, p, r, name)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                instances = executor.map(generate_instance, jobs)
+                for name, w, h, x, y, reward, p, r in instances:
+                    writer.add(w, h, x, y, reward, p, r, name)
+    return InstanceStore(path)
+
+
+def main(argv=None):
+    """
+    Writes the hard-coded test cases, or a generated family, to an instance store.
+
+    Example:
+        To run:
+        python generateGrid.py --kind maze rooms --size 100x100 1000x1000 --count 10
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__.splitlines()[1].strip())
+    parser.add_argument("--kind", nargs="+", choices=sorted(LAYOUTS))
+    parser.add_argument("--size", nargs="+", default=["100x100"], help="WxH")
+    parser.add_argument("--count", type=int, default=1, help="instances per size")
+    parser.add_argument("--p", type=float, default=0.8)
+    parser.add_argument("--r", type=float, default=-0.04)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args(argv)
+
     # Print a debug statement to verify script execution
     print("Script started.")
 
-    # Create data/tests directory if it doesn't exist
-    if not os.path.exists("../data/tests"):
-        os.makedirs("../data/tests")
-        print("Created directory: ../data/tests")
-
-    # Iterate through test cases
-    for idx, case in enumerate(test_cases):
-        w, h = case["w"], case["h"]
-        L, p, rewards = case["L"], case["p"], case["r"]
-        for reward in rewards:
-            grid = generate_grid(w, h, L, p, reward)
-            filename = f"data/tests/grid_t{idx + 1}_r{reward}.json"
-            print(f"Generating file: {filename}")
-            with open(filename, "w") as f:
-                json.dump(grid, f)
+    if args.kind:
+        sizes = [tuple(int(n) for n in size.split("x")) for size in args.size]
+        jobs = family(args.kind, sizes, args.count, args.p, args.r, args.seed)
+        store = write_family(args.output or "data/tests/generated", jobs, args.workers)
+    else:
+        # Collect one instance per test case and reward
+        instances = []
+        names = []
+        for idx, case in enumerate(test_cases):
+            w, h = case["w"], case["h"]
+            L, p, rewards = case["L"], case["p"], case["r"]
+            for reward in rewards:
+                instances.append((w, h, L, p, reward))
+                names.append(f"grid_t{idx + 1}_r{reward}")
+                print(f"Generating instance: {names[-1]}")
+
+        # Write all instances to a single instance store
+        store = InstanceStore.write(
+            args.output or "data/tests/generated", instances, names
+        )
+    print(f"Wrote {len(store)} instances to {store.path}")
 
     print("Script finished.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,69 +1,40 @@
-import json
 import numpy as np
-import pandas as pd
 from GridWorld import GridWorldAdditive
+from InstanceStore import InstanceStore
 from ValueIteration import ValueIteration
 from ModelFree import GridWorldFree
 from ModelBased import GridWorldBased
+from ResultsWriter import ResultsWriter
+from SolutionCache import SolutionCache
 
 discount = 0.5
-
-
-def load_grid_from_json(filename):
-    with open(filename, "r") as f:
-        grid = json.load(f)
-    return grid
+tolerance = 1e-9
+cache_dir = "data/cache"
 
 
 def main():
     """
     Main function to run experiments on different Markov Decision Process (MDP) models.
 
-    Reads instances from generated JSON files, computes values using Value Iteration, Model-Based RL, and Model-Free RL,
-    and calculates differences between their state values.
+    Reads the instances written by generateGrid.py from the instance store, computes values using Value Iteration,
+    Model-Based RL, and Model-Free RL, and calculates differences between their state values.
 
-    Outputs average differences and differences per cell to a CSV file.
+    Value iteration and model-based RL solutions are kept in a SolutionCache, so
+    repeated runs only recompute Q-learning.
+
+    Outputs average differences, and streams the differences per cell of each instance
+    in long format to a CSV file as soon as the instance is done (see ResultsWriter).
     """
 
-    grid_files = [
-        "data/tests/grid_t1_r-0.04.json",
-        "data/tests/grid_t2_r0.04.json",
-        "data/tests/grid_t3_r-1.json",
-        "data/tests/grid_t4_r-0.5.json",
-        "data/tests/grid_t5_r-0.25.json",
-        "data/tests/grid_t6_r-0.5.json",
-        "data/tests/grid_t7_r-0.25.json",
-        "data/tests/grid_t8_r-0.1.json",
-        "data/tests/grid_t8_r-0.3.json",
-        "data/tests/grid_t8_r-0.5.json",
-        "data/tests/grid_t9_r-0.2.json",
-        "data/tests/grid_t9_r-0.4.json",
-        "data/tests/grid_t9_r-0.6.json",
-        "data/tests/grid_t10_r-0.2.json",
-        "data/tests/grid_t10_r-0.4.json",
-        "data/tests/grid_t10_r-0.6.json",
-        "data/tests/grid_t11_r-0.1.json",
-        "data/tests/grid_t11_r-0.3.json",
-        "data/tests/grid_t11_r-0.5.json",
-        "data/tests/grid_t12_r-0.2.json",
-        "data/tests/grid_t12_r-0.4.json",
-        "data/tests/grid_t12_r-0.6.json",
-        "data/tests/grid_t13_r-0.1.json",
-        "data/tests/grid_t13_r-0.3.json",
-        "data/tests/grid_t13_r-0.5.json",
-        "data/tests/grid_t14_r-0.2.json",
-        "data/tests/grid_t14_r-0.4.json",
-        "data/tests/grid_t14_r-0.6.json",
-        "data/tests/grid_t15_r-0.2.json",
-        "data/tests/grid_t15_r-0.3.json",
-        "data/tests/grid_t15_r-0.4.json",
-    ]
-
-    cells_difference = []
-
-    for idx, filename in enumerate(grid_files):
-        grid = load_grid_from_json(filename)
+    store = InstanceStore("data/tests/generated")
+    cache = SolutionCache(cache_dir)
+    writer = ResultsWriter("data/results/gson_results.csv")
+
+    for idx in range(len(store)):
+        grid = store.grid(idx).tolist()
         H, W = len(grid), len(grid[0])
+        # Walls and terminals of the instance, which end the learners' episodes
+        cells = store[idx][2]
 
         print(f"---------------------- instance={idx + 1} ----------------------")
         print(f"W={W} | H={H} | grid={grid}\n")
@@ -79,28 +50,51 @@ def main():
                 else:
                     walls.append((y, x))
 
-        shape = (H, W)
-        gwa = GridWorldAdditive(
-            shape, prob=0.8, walls=walls, terminals=terminals, reward=0.0
+        # Keyed like Results.py instances, whose rows count from the bottom
+        instance = (
+            W,
+            H,
+            [(x, H - 1 - y, grid[y][x]) for y in range(H) for x in range(W)],
+            0.8,
+            0.0,
         )
-        vi = ValueIteration()
-        values_MDP = vi.valueIteration(gwa, discount, 100)
-
-        # Reshape values_MDP properly
-        values_MDP_array = np.zeros((H, W))
-        for x in range(H):
-            for y in range(W):
-                values_MDP_array[x, y] = values_MDP[(x, y)]
+        cached = cache.get(instance, discount, "MDP", tolerance)
+        if cached is not None:
+            values_MDP_array = cached["values"][::-1]
+        else:
+            shape = (H, W)
+            gwa = GridWorldAdditive(
+                shape, prob=0.8, walls=walls, terminals=terminals, reward=0.0
+            )
+            vi = ValueIteration()
+            values_MDP = vi.valueIteration(gwa, discount, 100, tolerance=tolerance)
+
+            # Reshape values_MDP properly
+            values_MDP_array = np.zeros((H, W))
+            for x in range(H):
+                for y in range(W):
+                    values_MDP_array[x, y] = values_MDP[(x, y)]
+            cache.put(instance, discount, "MDP", tolerance, values_MDP_array[::-1])
 
         # Model Based ------------------------------------------------------
 
-        gridworld_b = GridWorldBased(W, H, L=[], p=0.8, r=-0.04)
-        gridworld_b.value_iteration()
-        values_MBRL = gridworld_b.value
+        instance = (W, H, cells, 0.8, -0.04)
+        cached = cache.get(instance, discount, "MBRL", tolerance)
+        if cached is not None:
+            values_MBRL = cached["values"]
+        else:
+            gridworld_b = GridWorldBased(W, H, L=cells, p=0.8, r=-0.04)
+            gridworld_b.value_iteration(tolerance=tolerance)
+            values_MBRL = gridworld_b.value
+            cache.put(
+                instance, discount, "MBRL", tolerance, values_MBRL, gridworld_b.policy
+            )
 
         # Model Free -------------------------------------------------------
 
-        gridworld = GridWorldFree(W, H, L=[], p=0.8, r=-0.04)
+        gridworld = GridWorldFree(
+            W, H, terminal_states=cells, action_prob=0.8, reward=-0.04
+        )
         gridworld.q_learning(episodes=10000)
         values_MFRL = gridworld.get_state_values()
 
@@ -113,29 +107,15 @@ def main():
         print(f"average(d(MDP, MFRL))= {diff_mdp_mfrl}")
         print(f"average(d(MBRL, MFRL))= {diff_mbrl_mfrl}\n")
 
-        # Compute differences per cell and create a DataFrame
-        d = {}
-        for x in range(H):
-            for y in range(W):
-                d[f"({x}, {y})"] = [
-                    values_MDP_array[x, y] - values_MBRL[x][y],
-                    values_MDP_array[x, y] - values_MFRL[x][y],
-                    values_MBRL[x][y] - values_MFRL[x][y],
-                ]
-        df = pd.DataFrame(d)
-        print(df)
-
-        # Append DataFrame to cells_difference list
-        cells_difference.append(df)
-
-    # Write differences per cell to a CSV file
-    with open("data/results/results.csv", "a") as f:
-        i = 1
-        for df in cells_difference:
-            f.write(f"Test {i}\n")
-            df.to_csv(f, index=False)
-            f.write("\n")
-            i += 1
+        # Write differences per cell
+        print(
+            writer.write(
+                idx + 1,
+                {"MDP": values_MDP_array, "MBRL": values_MBRL, "MFRL": values_MFRL},
+            )
+        )
+
+    writer.close()
 
 
 if __name__ == "__main__":
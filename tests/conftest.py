@@ -0,0 +1,54 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "scripts"))
+
+from generateGrid import LAYOUTS  # noqa: E402
+from GridWorld import GridWorldAdditive  # noqa: E402
+
+
+def layout_grid(kind, w, h, seed=0, prob=0.8, reward=-0.04):
+    """
+    Builds a GridWorldAdditive from a generateGrid layout.
+    """
+    walls, terminals = LAYOUTS[kind](w, h, np.random.default_rng(seed))
+    rows, cols = np.nonzero(terminals)
+    return GridWorldAdditive(
+        (h, w),
+        prob,
+        list(zip(*np.nonzero(walls))),
+        dict(zip(zip(rows.tolist(), cols.tolist()), terminals[rows, cols].tolist())),
+        reward,
+    )
+
+
+LAYOUTS_UNDER_TEST = [
+    ("lecture", None),
+    ("maze", (9, 7)),
+    ("rooms", (23, 12)),
+    ("random", (15, 10)),
+]
+
+
+def make_grid(kind, size):
+    """
+    Builds the 4x3 lecture grid, or a generated layout of the given (w, h) size.
+    """
+    if kind == "lecture":
+        return GridWorldAdditive((3, 4), 0.8, [(1, 1)], {(0, 3): 1, (1, 3): -1}, -0.04)
+    return layout_grid(kind, *size)
+
+
+@pytest.fixture(params=LAYOUTS_UNDER_TEST, ids=lambda param: param[0])
+def gridworld(request):
+    """GridWorldAdditive: The 4x3 lecture grid and a few small generated layouts."""
+    return make_grid(*request.param)
+
+
+@pytest.fixture
+def gridworlds():
+    """list: One GridWorldAdditive of every layout of the ``gridworld`` fixture."""
+    return [make_grid(*param) for param in LAYOUTS_UNDER_TEST]
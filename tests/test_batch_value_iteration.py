@@ -0,0 +1,21 @@
+from BatchValueIteration import BatchValueIteration
+from ValueIteration import ValueIteration
+
+SETTINGS = [(None, 0.9), (-0.5, 0.5), (0.1, 0.7)]
+
+
+def test_matches_value_iteration_per_grid(gridworlds):
+    solver = BatchValueIteration()
+    batch = solver.valueIteration(gridworlds, SETTINGS, 1000, tolerance=1e-12)
+    assert len(batch) == len(SETTINGS)
+    assert (solver.residual < 1e-12).all()
+
+    for (reward, discount), results in zip(SETTINGS, batch):
+        for gridworld, values in zip(gridworlds, results):
+            if reward is not None:
+                gridworld.reward = reward
+            expected = ValueIteration().valueIteration(
+                gridworld, discount, 1000, tolerance=1e-12
+            )
+            for state in gridworld.compile().states:
+                assert abs(values[state] - expected[state]) < 1e-10
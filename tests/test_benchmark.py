@@ -0,0 +1,16 @@
+import json
+
+import Benchmark
+
+
+def test_main_runs_every_solver(tmp_path):
+    path = str(tmp_path / "bench.json")
+    sizes = [(4, 3), (30, 20)]
+    argv = ["--sizes", *(f"{w}x{h}" for w, h in sizes), "--episodes", "50"]
+    assert Benchmark.main(argv + ["--no-memory", "--json", path]) == 0
+
+    with open(path) as f:
+        records = json.load(f)
+    assert [(r["solver"], r["width"], r["height"]) for r in records] == [
+        (solver, w, h) for solver in Benchmark.SOLVERS for w, h in sizes
+    ]
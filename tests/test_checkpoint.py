@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from Instrument import Instrument
+from ModelFree import GridWorldFree
+from ReplayBuffer import ReplayBuffer
+from ValueIteration import ValueIteration
+
+LECTURE = (4, 3, [(1, 1, 0), (3, 2, 1), (3, 1, -1)], 0.8, -0.04)
+
+
+class Interrupted(Exception):
+    pass
+
+
+def interrupt_after(name, count):
+    """An instrument that kills the run at the ``count``-th event of a name."""
+
+    def callback(event):
+        if event["name"] == name:
+            seen[0] += 1
+            if seen[0] == count:
+                raise Interrupted
+
+    seen = [0]
+    return Instrument(callbacks=[callback])
+
+
+@pytest.mark.parametrize("mode", ["jacobi", "gauss-seidel"])
+def test_resumed_value_iteration_matches_uninterrupted(gridworld, tmp_path, mode):
+    options = dict(tolerance=1e-10, mode=mode, checkpointEvery=3)
+    solver = ValueIteration()
+    expected = solver.valueIteration(
+        gridworld, 0.9, 500, checkpoint=str(tmp_path / "full.npz"), **options
+    )
+    sweeps = solver.iterations
+
+    path = str(tmp_path / "interrupted.npz")
+    with pytest.raises(Interrupted):
+        ValueIteration().valueIteration(
+            gridworld,
+            0.9,
+            500,
+            checkpoint=path,
+            instrument=interrupt_after("sweep", 8),
+            **options,
+        )
+    resumed = ValueIteration()
+    values = resumed.resume(gridworld, path)
+
+    np.testing.assert_array_equal(values.array, expected.array)
+    assert resumed.iterations == sweeps
+    assert resumed.residual == solver.residual
+
+
+@pytest.mark.parametrize("replay", [False, True])
+def test_resumed_q_learning_matches_uninterrupted(tmp_path, replay):
+    def train(**options):
+        gridworld = GridWorldFree(*LECTURE, seed=0)
+        buffer = ReplayBuffer(500, prioritized=True) if replay else None
+        gridworld.q_learning(300, replay=buffer, checkpoint_every=50, **options)
+        return gridworld
+
+    expected = train(checkpoint=str(tmp_path / "full.npz"))
+
+    path = str(tmp_path / "interrupted.npz")
+    with pytest.raises(Interrupted):
+        train(checkpoint=path, instrument=interrupt_after("episode", 130))
+    gridworld = GridWorldFree(*LECTURE, seed=1)
+    gridworld.resume_q_learning(path)
+
+    np.testing.assert_array_equal(gridworld.q_values, expected.q_values)
+    assert gridworld.transitions == expected.transitions
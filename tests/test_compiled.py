@@ -0,0 +1,27 @@
+import numpy as np
+
+from GridWorld import GridWorld
+
+
+def test_transition_matrix_matches_gridworld(gridworld):
+    compiled = gridworld.compile()
+    matrix = compiled.transitionMatrix().toarray()
+    actions = len(GridWorld.DIRCS)
+    assert matrix.shape == (compiled.gameover * actions, compiled.gameover + 1)
+    np.testing.assert_allclose(matrix.sum(axis=1), 1)
+
+    for s, state in zip(compiled.stateIndices, compiled.states):
+        for a, action in enumerate(GridWorld.DIRCS):
+            expected = np.zeros(compiled.gameover + 1)
+            for landing, prob in gridworld.getTransitionStatesAndProbs(state, action):
+                expected[compiled.stateIndex(landing)] += prob
+            np.testing.assert_allclose(matrix[s * actions + a], expected)
+    for s in np.flatnonzero(compiled.wall):
+        assert (matrix[s * actions : (s + 1) * actions, -1] == 1).all()
+
+
+def test_transition_matrix_is_cached_until_edited(gridworld):
+    matrix = gridworld.compile().transitionMatrix()
+    assert gridworld.compile().transitionMatrix() is matrix
+    gridworld.walls.add((0, 0))
+    assert gridworld.compile().transitionMatrix() is not matrix
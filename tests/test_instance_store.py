@@ -0,0 +1,30 @@
+import os
+
+import numpy as np
+
+from generateGrid import generate_grid
+from InstanceStore import InstanceStore, read_text
+
+INSTANCES = os.path.join(os.path.dirname(__file__), os.pardir, "data", "tests")
+
+
+def test_write_read_round_trip(tmp_path):
+    instances, names = read_text(os.path.join(INSTANCES, "instances.txt"))
+    store = InstanceStore.write(str(tmp_path), instances, names)
+
+    reopened = InstanceStore(str(tmp_path))
+    assert len(reopened) == len(instances)
+    for i, instance in enumerate(instances):
+        assert reopened[i] == instance
+        assert reopened.name(i) == names[i]
+        np.testing.assert_array_equal(reopened.grid(i), generate_grid(*instance))
+    assert reopened[-1] == instances[-1]
+    assert reopened[1:3] == instances[1:3]
+    assert store[0] == instances[0]
+
+
+def test_checked_in_store_matches_text():
+    instances, names = read_text(os.path.join(INSTANCES, "instances.txt"))
+    store = InstanceStore(os.path.join(INSTANCES, "instances"))
+    assert list(store) == instances
+    assert [store.name(i) for i in range(len(store))] == names
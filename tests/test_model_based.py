@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from ModelBased import GridWorldBased
+
+INSTANCES = {
+    "lecture": (4, 3, [(1, 1, 0), (3, 2, 1), (3, 1, -1)], 0.8, -0.04),
+    "cliff": (12, 4, [(x, 0, -100) for x in range(1, 11)] + [(11, 0, 1)], 0.9, -1),
+    "walls": (7, 7, [(3, 1, 0), (3, 5, 0), (1, 1, -4), (5, 5, 4)], 0.8, -0.25),
+}
+
+
+@pytest.mark.parametrize("name", INSTANCES)
+def test_frontier_matches_value_iteration(name):
+    tolerance = 1e-10
+    expected = GridWorldBased(*INSTANCES[name])
+    expected.value_iteration(iterations=10000, tolerance=1e-13)
+
+    gridworld = GridWorldBased(*INSTANCES[name])
+    gridworld.frontier_sweeping(iterations=10000, tolerance=tolerance)
+    np.testing.assert_allclose(
+        gridworld.value,
+        expected.value,
+        rtol=0,
+        atol=tolerance / (1 - gridworld.discount),
+    )
+
+
+@pytest.mark.parametrize("name", INSTANCES)
+def test_blocked_frontier_matches_one_block(tmp_path, name):
+    expected = GridWorldBased(*INSTANCES[name])
+    expected.frontier_sweeping(iterations=10000, tolerance=1e-10)
+
+    gridworld = GridWorldBased(*INSTANCES[name], storage=str(tmp_path))
+    gridworld.frontier_sweeping(iterations=10000, tolerance=1e-10, block_rows=1)
+    assert isinstance(gridworld.value, np.memmap)
+    assert gridworld.backups == expected.backups
+    np.testing.assert_array_equal(gridworld.value, expected.value)
+    np.testing.assert_array_equal(gridworld.policy, expected.policy)
+
+
+@pytest.mark.parametrize("name", INSTANCES)
+def test_memmapped_gauss_seidel_matches_jacobi(tmp_path, name):
+    tolerance = 1e-10
+    expected = GridWorldBased(*INSTANCES[name])
+    expected.value_iteration(iterations=10000, tolerance=1e-13)
+
+    gridworld = GridWorldBased(*INSTANCES[name], storage=str(tmp_path))
+    gridworld.value_iteration(
+        iterations=10000, tolerance=tolerance, mode="gauss-seidel"
+    )
+    assert isinstance(gridworld.value, np.memmap)
+    np.testing.assert_allclose(
+        gridworld.value,
+        expected.value,
+        rtol=0,
+        atol=tolerance / (1 - gridworld.discount),
+    )
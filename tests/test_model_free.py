@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from ModelFree import GridWorldFree
+
+LECTURE = (4, 3, [(1, 1, 0), (3, 2, 1), (3, 1, -1)], 0.8, -0.04)
+
+
+@pytest.mark.parametrize("shared", [True, False])
+def test_vectorized_keeps_q_table_allocation(tmp_path, shared):
+    gridworld = GridWorldFree(*LECTURE, seed=0, storage=str(tmp_path), dtype=np.float32)
+    q_values = gridworld.q_values
+    gridworld.q_learning_vectorized(episodes=200, agents=8, shared=shared)
+
+    assert gridworld.q_values is q_values
+    assert isinstance(gridworld.q_values, np.memmap)
+    assert gridworld.q_values.dtype == np.float32
+    if not shared:
+        np.testing.assert_allclose(
+            gridworld.q_values, gridworld.agent_q_values.mean(axis=0), rtol=1e-6
+        )
+
+
+def test_episodes_only_start_where_a_terminal_is_reachable():
+    # The wall column x = 3 closes off x < 3, which holds no terminal
+    walls = [(3, y, 0) for y in range(3)]
+    gridworld = GridWorldFree(5, 3, walls + [(4, 0, 1)], 0.8, -0.04, seed=0)
+    np.testing.assert_array_equal(gridworld.start_states(), [1 * 5 + 4, 2 * 5 + 4])
+
+    gridworld.q_learning(episodes=50)
+    gridworld.q_learning_vectorized(episodes=50, agents=4)
+    assert gridworld.transitions > 0
+
+
+def test_no_reachable_terminal_is_an_error():
+    gridworld = GridWorldFree(3, 3, [(1, y, 0) for y in range(3)], 0.8, -0.04)
+    with pytest.raises(ValueError):
+        gridworld.start_states()
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from PolicyIteration import PolicyIteration
+from ValueIteration import ValueIteration
+
+DISCOUNT = 0.9
+
+
+def as_array(compiled, values):
+    return np.array([values[state] for state in compiled.states])
+
+
+@pytest.mark.parametrize("evaluationSweeps", [None, 5])
+def test_matches_value_iteration(gridworld, evaluationSweeps):
+    compiled = gridworld.compile()
+    expected = ValueIteration().valueIteration(
+        gridworld, DISCOUNT, 10000, tolerance=1e-12
+    )
+    solver = PolicyIteration()
+    values, policy = solver.policyIteration(
+        gridworld, DISCOUNT, 1000, evaluationSweeps, tolerance=1e-12
+    )
+
+    np.testing.assert_allclose(
+        as_array(compiled, values), as_array(compiled, expected), atol=1e-9
+    )
+    assert solver.residual < 1e-9
+    assert set(policy) == set(compiled.states)
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from ReplayBuffer import ReplayBuffer
+
+
+def filled(capacity, count, seed=0):
+    """A prioritized buffer after ``count`` adds and some priority updates."""
+    rng = np.random.default_rng(seed)
+    replay = ReplayBuffer(capacity, prioritized=True)
+    for i in range(count):
+        replay.add(i, i % 4, -0.04, i + 1, i % 7 == 0)
+        if i % 3 == 0:
+            indices = replay.sample(min(4, replay.size), rng)[0]
+            replay.update_priorities(indices, rng.normal(size=len(indices)))
+    return replay
+
+
+@pytest.mark.parametrize("capacity, count", [(1, 3), (5, 4), (8, 20), (1000, 2500)])
+def test_prioritized_sampling_matches_cumulative_sums(capacity, count):
+    replay = filled(capacity, count)
+    scaled = replay.priorities[: replay.size] ** replay.alpha
+
+    indices, *_, weights = replay.sample(256, np.random.default_rng(1))
+    draws = np.random.default_rng(1).random(256) * scaled.sum()
+    expected = np.searchsorted(np.cumsum(scaled), draws, side="right")
+    np.testing.assert_array_equal(indices, np.minimum(expected, replay.size - 1))
+
+    expected_weights = (replay.size * scaled[indices] / scaled.sum()) ** -replay.beta
+    np.testing.assert_allclose(weights, expected_weights / expected_weights.max())
+
+
+def test_state_round_trip():
+    replay = filled(64, 100)
+    restored = ReplayBuffer(1)
+    restored.set_state(*replay.get_state())
+
+    first = replay.sample(32, np.random.default_rng(2))
+    second = restored.sample(32, np.random.default_rng(2))
+    for a, b in zip(first, second):
+        np.testing.assert_array_equal(a, b)
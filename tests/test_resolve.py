@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from ValueIteration import ValueIteration
+
+DISCOUNT = 0.9
+TOLERANCE = 1e-10
+
+
+def free_cell(gridworld):
+    return next(
+        s
+        for s in gridworld.compile().states
+        if s not in gridworld.terms and s not in gridworld.walls
+    )
+
+
+EDITS = {
+    "add wall": lambda grid: grid.addWall(free_cell(grid)),
+    "remove wall": lambda grid: grid.removeWall(sorted(grid.walls)[0]),
+    "set terminal": lambda grid: grid.setTerminal(free_cell(grid), 2.0),
+    "remove terminal": lambda grid: grid.removeTerminal(sorted(grid.terms)[-1]),
+    "reward": lambda grid: setattr(grid, "reward", -0.3),
+}
+
+
+def solve(gridworld):
+    return ValueIteration().valueIteration(
+        gridworld, DISCOUNT, 10000, tolerance=TOLERANCE
+    )
+
+
+def as_array(gridworld, values):
+    return np.array([values[state] for state in gridworld.compile().states])
+
+
+@pytest.mark.parametrize("edit", EDITS)
+def test_resolve_matches_full_solve(gridworld, edit):
+    before = solve(gridworld)
+    EDITS[edit](gridworld)
+
+    solver = ValueIteration()
+    values = solver.resolve(gridworld, before, DISCOUNT, tolerance=TOLERANCE)
+    np.testing.assert_allclose(
+        as_array(gridworld, values),
+        as_array(gridworld, solve(gridworld)),
+        rtol=0,
+        atol=2 * TOLERANCE / (1 - DISCOUNT),
+    )
+
+
+def test_resolve_with_given_changes(gridworld):
+    before = dict(solve(gridworld))
+    cell = free_cell(gridworld)
+    gridworld.setTerminal(cell, -3.0)
+
+    values = ValueIteration().resolve(
+        gridworld, before, DISCOUNT, tolerance=TOLERANCE, changed=[cell]
+    )
+    np.testing.assert_allclose(
+        as_array(gridworld, values),
+        as_array(gridworld, solve(gridworld)),
+        rtol=0,
+        atol=2 * TOLERANCE / (1 - DISCOUNT),
+    )
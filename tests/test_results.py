@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from Results import discount, run_job, tolerance
+from SolutionCache import SolutionCache
+
+# Both a cold and a warm-started solve are this close to the exact values
+BOUND = tolerance * discount / (1 - discount)
+
+INSTANCE = (4, 3, [(1, 1, 0), (3, 2, 1), (3, 1, -1)], 0.8, -0.04)
+
+
+@pytest.mark.parametrize("algorithm", ["MDP", "MBRL"])
+def test_warm_start_within_tolerance(tmp_path, algorithm):
+    _, _, _, cold = run_job((0, algorithm, None, INSTANCE))
+
+    # Seed the cache with a neighbouring reward, so the next miss warm-starts from it
+    neighbour = INSTANCE[:4] + (-0.1,)
+    run_job((0, algorithm, None, neighbour), cache=str(tmp_path))
+    cache = SolutionCache(str(tmp_path))
+    assert cache.nearest(INSTANCE, discount, algorithm, tolerance) is not None
+
+    _, _, _, warm = run_job(
+        (0, algorithm, None, INSTANCE), cache=str(tmp_path), warm_start=True
+    )
+    np.testing.assert_allclose(warm, cold, rtol=0, atol=2 * BOUND)
+
+    # The warm result is now cached and returned as is
+    _, _, _, cached = run_job(
+        (0, algorithm, None, INSTANCE), cache=str(tmp_path), warm_start=True
+    )
+    np.testing.assert_array_equal(cached, warm)
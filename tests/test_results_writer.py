@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ResultsWriter import COLUMNS, ResultsWriter, long_format, read_results
+
+
+def results(count, seed=0):
+    rng = np.random.default_rng(seed)
+    shapes = [(3, 4), (6, 12), (5, 5)]
+    return [
+        {name: rng.normal(size=shapes[i % 3]) for name in ("MDP", "MBRL", "MFRL")}
+        for i in range(count)
+    ]
+
+
+@pytest.mark.parametrize("name", ["results.csv", "results"])
+def test_write_read_round_trip(tmp_path, name):
+    path = str(tmp_path / name)
+    instances = results(5)
+    with ResultsWriter(path) as writer:
+        written = [writer.write(i + 1, values) for i, values in enumerate(instances)]
+    assert writer.count == len(instances)
+
+    read = pd.concat(read_results(path, chunksize=7), ignore_index=True)
+    expected = pd.concat(written, ignore_index=True)
+    assert list(read.columns) == list(COLUMNS)
+    pd.testing.assert_frame_equal(read, expected, check_dtype=False)
+
+
+def test_long_format_cells():
+    values = results(1)[0]
+    frame = long_format(3, values)
+    assert len(frame) == 3 * values["MDP"].size
+    rows = frame[frame["pair"] == "MBRL-MFRL"]
+    for x, y, diff in zip(rows["x"], rows["y"], rows["diff"]):
+        assert diff == values["MBRL"][y, x] - values["MFRL"][y, x]
+    assert (frame["instance"] == 3).all()
+
+
+def test_rewriting_replaces_old_results(tmp_path):
+    path = str(tmp_path / "results")
+    with ResultsWriter(path) as writer:
+        for i, values in enumerate(results(3)):
+            writer.write(i + 1, values)
+    with ResultsWriter(path) as writer:
+        writer.write(1, results(1, seed=1)[0])
+    assert len(list(read_results(path))) == 1
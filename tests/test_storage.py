@@ -0,0 +1,32 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from Storage import load_checkpoint, save_checkpoint
+
+
+def test_checkpoint_round_trip(tmp_path):
+    path = str(tmp_path / "checkpoint.npz")
+    arrays = {"values": np.arange(12.0).reshape(3, 4), "seen": np.array([1, 0, 1])}
+    save_checkpoint(path, arrays, {"sweeps": 7, "mode": "jacobi"})
+
+    loaded, settings = load_checkpoint(path)
+    assert settings == {"sweeps": 7, "mode": "jacobi"}
+    assert loaded.keys() == arrays.keys()
+    for name, array in arrays.items():
+        np.testing.assert_array_equal(loaded[name], array)
+
+
+def test_concurrent_saves_to_one_path(tmp_path):
+    path = str(tmp_path / "checkpoint.npz")
+
+    def save(i):
+        save_checkpoint(path, {"values": np.full(1000, float(i))}, {"i": i})
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(save, range(64)))
+
+    arrays, settings = load_checkpoint(path)
+    np.testing.assert_array_equal(arrays["values"], settings["i"])
+    assert os.listdir(tmp_path) == ["checkpoint.npz"]
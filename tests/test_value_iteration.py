@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+from conftest import layout_grid
+from ValueIteration import ValueIteration
+
+DISCOUNT = 0.9
+
+
+def as_array(gridworld, values):
+    return np.array([values[state] for state in gridworld.compile().states])
+
+
+def solve(gridworld, tolerance=1e-12, **options):
+    """Converged values, by default of plain (jacobi, numpy) value iteration."""
+    values = ValueIteration().valueIteration(
+        gridworld, DISCOUNT, 10000, tolerance=tolerance, **options
+    )
+    return as_array(gridworld, values)
+
+
+@pytest.mark.parametrize("iterations", [1, 7, 30])
+def test_backends_agree(gridworld, iterations):
+    solver = ValueIteration()
+    python = solver.valueIteration(gridworld, DISCOUNT, iterations, backend="python")
+    numpy = solver.valueIteration(gridworld, DISCOUNT, iterations, backend="numpy")
+    np.testing.assert_allclose(
+        as_array(gridworld, numpy), as_array(gridworld, python), rtol=0, atol=1e-12
+    )
+
+
+def test_policies_agree(gridworld):
+    solver = ValueIteration()
+    values = solver.valueIteration(gridworld, DISCOUNT, 50)
+    python = solver.getPolicy(gridworld, values, DISCOUNT, backend="python")
+    numpy = solver.getPolicy(gridworld, values, DISCOUNT, backend="numpy")
+    assert {state: numpy[state] for state in python} == dict(python)
+
+
+@pytest.mark.parametrize("backend", ["numpy", "python"])
+def test_stops_within_tolerance(gridworld, backend):
+    tolerance = 1e-6
+    solver = ValueIteration()
+    values = solver.valueIteration(
+        gridworld, DISCOUNT, 10000, backend=backend, tolerance=tolerance
+    )
+    assert solver.iterations < 10000
+    assert solver.residual < tolerance
+    np.testing.assert_allclose(
+        as_array(gridworld, values),
+        solve(gridworld),
+        rtol=0,
+        atol=tolerance * DISCOUNT / (1 - DISCOUNT),
+    )
+
+
+@pytest.mark.parametrize("backend", ["numpy", "python"])
+@pytest.mark.parametrize("mode", ["gauss-seidel", "prioritized"])
+def test_modes_match_jacobi(gridworld, backend, mode):
+    tolerance = 1e-6
+    np.testing.assert_allclose(
+        solve(gridworld, tolerance, backend=backend, mode=mode),
+        solve(gridworld),
+        rtol=0,
+        atol=tolerance / (1 - DISCOUNT),
+    )
+
+
+@pytest.mark.parametrize("backend", ["numpy", "python"])
+def test_frontier_matches_jacobi(gridworld, backend):
+    tolerance = 1e-10
+    np.testing.assert_allclose(
+        solve(gridworld, tolerance, backend=backend, mode="frontier"),
+        solve(gridworld),
+        rtol=0,
+        atol=tolerance / (1 - DISCOUNT),
+    )
+
+
+@pytest.mark.parametrize("mode", ["jacobi", "gauss-seidel"])
+@pytest.mark.parametrize("coarsest", [2, 4, 16])
+def test_multigrid_matches_jacobi(gridworld, mode, coarsest):
+    tolerance = 1e-10
+    solver = ValueIteration()
+    values = solver.multigrid(
+        gridworld, DISCOUNT, tolerance=tolerance, mode=mode, coarsest=coarsest
+    )
+    assert solver.residual < tolerance
+    np.testing.assert_allclose(
+        as_array(gridworld, values),
+        solve(gridworld),
+        rtol=0,
+        atol=tolerance * DISCOUNT / (1 - DISCOUNT),
+    )
+
+
+def test_multigrid_on_a_large_grid():
+    gridworld = layout_grid("rooms", 90, 70, seed=3)
+    tolerance = 1e-8
+    values = ValueIteration().multigrid(gridworld, 0.99, tolerance=tolerance)
+    expected = ValueIteration().valueIteration(
+        gridworld, 0.99, 20000, tolerance=1e-12
+    )
+    np.testing.assert_allclose(
+        as_array(gridworld, values),
+        as_array(gridworld, expected),
+        rtol=0,
+        atol=tolerance * 0.99 / (1 - 0.99),
+    )